@@ -0,0 +1,56 @@
+import argparse
+import os
+import time
+
+from dotenv import load_dotenv
+
+from index.batch import evaluate_batch, read_topics, write_run_file
+from index.inverted_index import find_latest_files
+from index.loaded_index import LoadedIndex
+from index.processor import Processor
+from index.scorers import SCORERS, get_scorer
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse the command line arguments."""
+    parser = argparse.ArgumentParser(description="Run every query of a topics file.")
+    parser.add_argument("topics_file", help="An SGML file of <Q ID=...> blocks")
+    parser.add_argument("run_file", help="The TREC run file to write")
+    parser.add_argument("--dataset", default=os.getenv("DATASET"), help="The dataset name")
+    parser.add_argument("--directory", default="output_reports", help="The index directory")
+    parser.add_argument("--k", type=int, default=1000, help="The documents found per query")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Threads to use")
+    parser.add_argument("--processes", action="store_true", help="Use processes, not threads")
+    parser.add_argument("--model", default="cosine", choices=SCORERS, help="The ranking model")
+    parser.add_argument("--tag", default="text-retrieval-engine", help="The name of the run")
+
+    return parser.parse_args()
+
+
+def main():
+    load_dotenv()
+    args = parse_args()
+
+    _, files = find_latest_files(args.dataset, args.directory)
+
+    if not files:
+        raise FileNotFoundError(f"No index files of '{args.dataset}' in {args.directory}")
+
+    index = LoadedIndex(
+        files["LEXICON_FILE"], files["INVERTED_FILE"], files["DOCUMENT_LENGTH_FILE"]
+    )
+    queries = read_topics(args.topics_file, Processor())
+
+    start = time.perf_counter()
+    results = evaluate_batch(
+        index, queries, args.k, args.workers, args.processes, scorer=get_scorer(args.model)
+    )
+    elapsed = time.perf_counter() - start
+
+    write_run_file(args.run_file, results, args.tag)
+
+    print(f"Evaluated {len(queries)} queries in {elapsed:.2f}s ({len(queries) / elapsed:.1f} QPS)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,477 @@
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+from index.batch import read_topics
+from index.compact_index import CompactInvertedIndex
+from index.indexer import Indexer
+from index.inverted_index import InvertedIndex
+from index.loaded_index import LoadedIndex
+from index.positional_index import PositionalInvertedIndex
+from index.postings import (
+    IMPACT_8_ENCODING,
+    IMPACT_16_ENCODING,
+    RAW_ENCODING,
+    VBYTE_ENCODING,
+)
+from index.postings_cache import PostingsCache
+from index.processor import Processor
+from index.shard_broker import ShardBroker
+from index.sharding import build_shards
+from utils.doc_processing import yield_sgml_text
+from utils.synthetic_corpus import generate_corpus, generate_topics
+
+
+DATASET_NAME = "benchmark"
+
+INDEX_CLASSES = {
+    "inverted": InvertedIndex,
+    "compact": CompactInvertedIndex,
+    "positional": PositionalInvertedIndex,
+}
+
+ENCODINGS = [RAW_ENCODING, VBYTE_ENCODING, IMPACT_8_ENCODING, IMPACT_16_ENCODING]
+
+# The number of queries run before timing starts, to fill caches and page in the index
+WARMUP_QUERIES = 10
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse the command line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark building and querying an index of a synthetic corpus."
+    )
+    parser.add_argument("--output", default="benchmark.json", help="The JSON file to write")
+    parser.add_argument("--corpus", help="An SGML corpus to use instead of a synthetic one")
+    parser.add_argument("--topics", help="An SGML topics file to use instead of generated ones")
+    parser.add_argument("--docs", type=int, default=10000, help="The documents to generate")
+    parser.add_argument("--vocabulary", type=int, default=50000, help="The distinct words")
+    parser.add_argument("--skew", type=float, default=1.1, help="The Zipf exponent of words")
+    parser.add_argument("--mean-length", type=float, default=250, help="The mean document length")
+    parser.add_argument("--length-sigma", type=float, default=0.8, help="The log-length spread")
+    parser.add_argument("--queries", type=int, default=200, help="The queries to generate")
+    parser.add_argument("--seed", type=int, default=0, help="The seed of the generators")
+    parser.add_argument("--index-class", default="compact", choices=INDEX_CLASSES)
+    parser.add_argument("--encoding", default=VBYTE_ENCODING, choices=ENCODINGS)
+    parser.add_argument("--workers", type=int, default=1, help="Processes used to build")
+    parser.add_argument("--k", type=int, default=10, help="The documents found per query")
+    parser.add_argument("--simple", action="store_true", help="Process text without NLTK")
+    parser.add_argument("--skip-api", action="store_true", help="Do not benchmark /query")
+    parser.add_argument("--concurrency", type=int, default=16, help="Clients sending bursts")
+    parser.add_argument("--warm-up-terms", type=int, default=1000, help="Postings to warm up")
+    parser.add_argument("--shards", type=int, default=0, help="Shards to compare, 0 for none")
+    parser.add_argument("--work-directory", help="Where to keep the corpus and index files")
+
+    return parser.parse_args()
+
+
+def peak_rss_mb() -> Dict[str, float]:
+    """Find the peak resident memory of this process and its finished child processes.
+
+    :return: The peaks in megabytes
+    """
+    # Linux reports kilobytes and macOS reports bytes
+    unit = 1024**2 if sys.platform == "darwin" else 1024
+
+    return {
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit,
+        "peak_children_rss_mb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / unit,
+    }
+
+
+def latency_summary(latencies: List[float]) -> Dict[str, float]:
+    """Summarize the latencies of a sequence of queries.
+
+    :param latencies: The seconds taken by each query
+    :return: The number of queries, queries per second and latency statistics in
+        milliseconds
+    """
+    milliseconds = np.array(latencies) * 1000
+
+    return {
+        "queries": len(latencies),
+        "qps": len(latencies) / sum(latencies) if sum(latencies) > 0 else 0.0,
+        "mean_ms": float(milliseconds.mean()),
+        "p50_ms": float(np.percentile(milliseconds, 50)),
+        "p90_ms": float(np.percentile(milliseconds, 90)),
+        "p95_ms": float(np.percentile(milliseconds, 95)),
+        "p99_ms": float(np.percentile(milliseconds, 99)),
+        "max_ms": float(milliseconds.max()),
+    }
+
+
+def time_queries(run: Callable, queries: List) -> Dict[str, float]:
+    """Time a function over every query, after a few untimed warm-up queries.
+
+    :param run: The function evaluating a single query
+    :param queries: The queries
+    :return: A summary of the latencies
+    """
+    for query in queries[:WARMUP_QUERIES]:
+        run(query)
+
+    latencies = []
+
+    for query in queries:
+        start = time.perf_counter()
+        run(query)
+        latencies.append(time.perf_counter() - start)
+
+    return latency_summary(latencies)
+
+
+def benchmark_build(
+    args: argparse.Namespace, corpus_file: str, processor: Processor, output_directory: str
+) -> Tuple[Tuple[str, str, str], Dict]:
+    """Build an index of a corpus and measure its throughput.
+
+    :param args: The command line arguments
+    :param corpus_file: The name of the SGML corpus
+    :param processor: The document processor object
+    :param output_directory: The directory in which the index files are written
+    :return: A tuple of the index files and the build measurements
+    """
+    index = INDEX_CLASSES[args.index_class]()
+    indexer = Indexer(corpus_file, DATASET_NAME, processor, index, workers=args.workers)
+
+    start = time.perf_counter()
+    indexer.load_data()
+    loaded = time.perf_counter()
+    files = index.generate_file(
+        DATASET_NAME, encoding=args.encoding, output_directory=output_directory
+    )
+    end = time.perf_counter()
+
+    corpus_mb = os.path.getsize(corpus_file) / 1024**2
+
+    return files, {
+        "documents": indexer.documents_processed,
+        "words": indexer.words_processed,
+        "terms": index.num_terms,
+        "corpus_mb": corpus_mb,
+        "load_data_seconds": loaded - start,
+        "generate_file_seconds": end - loaded,
+        "total_seconds": end - start,
+        "docs_per_second": indexer.documents_processed / (end - start),
+        "mb_per_second": corpus_mb / (end - start),
+        **peak_rss_mb(),
+    }
+
+
+def index_size(output_directory: str) -> Dict[str, float]:
+    """Measure the size of the index files on disk.
+
+    :param output_directory: The directory holding the index files
+    :return: The size of each kind of file and their total in megabytes
+    """
+    sizes = {}
+
+    for file in sorted(os.listdir(output_directory)):
+        kind = file.replace(f"{DATASET_NAME}_", "").rsplit("_", 1)[0]
+        sizes[f"{kind}_mb"] = os.path.getsize(os.path.join(output_directory, file)) / 1024**2
+
+    sizes["total_mb"] = sum(sizes.values())
+
+    return sizes
+
+
+def time_first_query(
+    files: Tuple[str, str, str], query: List[str], k: int, warm_up_terms: int = 0
+) -> Dict[str, float]:
+    """Measure the time to load an index and answer its first query.
+
+    :param files: The lexicon, inverted and document length files
+    :param query: The tokenized query
+    :param k: The number of documents found
+    :param warm_up_terms: The number of terms whose postings are read before the query
+    :return: The seconds taken to load the index, warm it up and answer the query
+    """
+    start = time.perf_counter()
+    index = LoadedIndex(*files, postings_cache=PostingsCache(64 * 1024**2))
+    loaded = time.perf_counter()
+
+    if warm_up_terms > 0:
+        index.warm_up(warm_up_terms)
+
+    warmed_up = time.perf_counter()
+    index.top_k(query, k)
+    end = time.perf_counter()
+
+    return {
+        "load_seconds": loaded - start,
+        "warm_up_seconds": warmed_up - loaded,
+        "first_query_ms": (end - warmed_up) * 1000,
+    }
+
+
+def benchmark_queries(
+    files: Tuple[str, str, str], queries: List[List[str]], k: int, warm_up_terms: int
+) -> Dict[str, Dict[str, float]]:
+    """Measure the latency of queries against a resident index.
+
+    :param files: The lexicon, inverted and document length files
+    :param queries: The tokenized queries
+    :param k: The number of documents found per query
+    :param warm_up_terms: The number of terms whose postings are read ahead of a first
+        query, for comparison with a cold first query
+    :return: The load time, first query latencies and latency summaries of
+        cosine_similarity and top_k
+    """
+    start = time.perf_counter()
+    index = LoadedIndex(*files)
+    load_seconds = time.perf_counter() - start
+
+    return {
+        "load_index": {"seconds": load_seconds},
+        "first_query_cold": time_first_query(files, queries[0], k),
+        "first_query_warm": time_first_query(files, queries[0], k, warm_up_terms),
+        "cosine_similarity": time_queries(index.cosine_similarity, queries),
+        "top_k": time_queries(lambda query: index.top_k(query, k), queries),
+    }
+
+
+def time_burst(run: Callable, queries: List, concurrency: int) -> Dict[str, float]:
+    """Time a function over every query, sent at once by concurrent clients.
+
+    :param run: The function evaluating a single query
+    :param queries: The queries
+    :param concurrency: The number of clients sending queries at the same time
+    :return: A summary of the latencies, where the queries per second are those of the
+        whole burst
+    """
+
+    def timed_run(query) -> float:
+        start = time.perf_counter()
+        run(query)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(concurrency) as executor:
+        latencies = list(executor.map(timed_run, queries))
+
+    summary = latency_summary(latencies)
+    summary["qps"] = len(queries) / (time.perf_counter() - start)
+    summary["concurrency"] = concurrency
+
+    return summary
+
+
+def benchmark_api(
+    work_directory: str, queries: List[str], k: int, concurrency: int, use_nltk: bool = True
+) -> Dict[str, Dict[str, float]]:
+    """Measure the latency of the /query endpoint, without its result cache.
+
+    Queries are sent one at a time, and then in a burst by concurrent clients, whose tail
+    latency shows whether slow queries hold up the others.
+
+    :param work_directory: The directory holding the output_reports directory of the index
+    :param queries: The raw query strings
+    :param k: The number of documents found per query
+    :param concurrency: The number of clients sending the burst
+    :param use_nltk: Whether the index was built with NLTK, which the service's queries
+        must match
+    :return: The latency summaries of sequential and concurrent queries
+    """
+    os.environ["DATASET"] = DATASET_NAME
+    os.environ["USE_NLTK"] = str(use_nltk).lower()
+    os.environ["QUERY_CACHE_SIZE"] = "0"
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    cwd = os.getcwd()
+    os.chdir(work_directory)
+
+    try:
+        from fastapi.testclient import TestClient
+
+        import main
+
+        start = time.perf_counter()
+
+        with TestClient(main.app) as client:
+            startup_seconds = time.perf_counter() - start
+
+            def run(query_str: str) -> None:
+                response = client.post("/query", params={"query_str": query_str, "limit": k})
+                response.raise_for_status()
+
+            first_query_start = time.perf_counter()
+            run(queries[0])
+            first_query_ms = (time.perf_counter() - first_query_start) * 1000
+
+            return {
+                "api_startup": {"seconds": startup_seconds, "first_query_ms": first_query_ms},
+                "api": time_queries(run, queries),
+                "api_burst": time_burst(run, queries, concurrency),
+            }
+    finally:
+        os.chdir(cwd)
+
+
+def benchmark_shards(
+    args: argparse.Namespace,
+    corpus_file: str,
+    processor: Processor,
+    output_directory: str,
+    query_strs: List[str],
+) -> Tuple[Dict, Dict[str, Dict[str, float]]]:
+    """Build document-partitioned shards of a corpus and measure queries fanned out to them.
+
+    Each shard is held by a worker process of its own.
+
+    :param args: The command line arguments
+    :param corpus_file: The name of the SGML corpus
+    :param processor: The document processor object
+    :param output_directory: The directory in which the shard files are written
+    :param query_strs: The queries
+    :return: A tuple of the build measurements and the latency summaries of the queries
+    """
+    start = time.perf_counter()
+    manifest_file = build_shards(
+        yield_sgml_text(corpus_file),
+        processor,
+        args.shards,
+        DATASET_NAME,
+        output_directory,
+        INDEX_CLASSES[args.index_class],
+        encoding=args.encoding,
+    )
+    build_seconds = time.perf_counter() - start
+
+    broker = ShardBroker.from_manifest(manifest_file, processor, use_processes=True)
+
+    try:
+
+        def run(query_str: str) -> None:
+            broker.search(query_str, args.k)
+
+        queries = {
+            "sharded_top_k": time_queries(run, query_strs),
+            "sharded_burst": time_burst(run, query_strs, args.concurrency),
+        }
+    finally:
+        broker.close()
+
+    return {"shards": args.shards, "total_seconds": build_seconds}, queries
+
+
+def git_commit() -> str:
+    """Find the commit of the benchmarked code, if it is a git checkout."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def run_benchmark(args: argparse.Namespace, work_directory: str) -> Dict:
+    """Generate the data, build the index and query it.
+
+    :param args: The command line arguments
+    :param work_directory: The directory in which to keep the corpus and index files
+    :return: The benchmark results
+    """
+    corpus_file = args.corpus or os.path.join(work_directory, "corpus.txt")
+    topics_file = args.topics or os.path.join(work_directory, "topics.txt")
+    output_directory = os.path.join(work_directory, "output_reports")
+    os.makedirs(output_directory, exist_ok=True)
+
+    if not args.corpus:
+        generate_corpus(
+            corpus_file,
+            args.docs,
+            args.vocabulary,
+            args.skew,
+            args.mean_length,
+            args.length_sigma,
+            args.seed,
+        )
+
+    if not args.topics:
+        generate_topics(topics_file, args.queries, args.vocabulary, args.skew, seed=args.seed)
+
+    processor = Processor(use_nltk=not args.simple)
+
+    files, build = benchmark_build(args, corpus_file, processor, output_directory)
+    queries = [tokens for _, tokens in read_topics(topics_file, processor)]
+
+    results = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "cpu_count": os.cpu_count(),
+        },
+        "parameters": vars(args),
+        "build": build,
+        "index_size": index_size(output_directory),
+        "queries": benchmark_queries(files, queries, args.k, args.warm_up_terms),
+    }
+
+    query_strs = [text.strip() for _, text in yield_sgml_text(topics_file)]
+
+    if not args.skip_api:
+        results["queries"].update(
+            benchmark_api(
+                work_directory, query_strs, args.k, args.concurrency, use_nltk=not args.simple
+            )
+        )
+
+    if args.shards > 0:
+        shards_directory = os.path.join(output_directory, "shards")
+        results["sharded_build"], sharded_queries = benchmark_shards(
+            args, corpus_file, processor, shards_directory, query_strs
+        )
+        results["queries"].update(sharded_queries)
+
+    return results
+
+
+def main():
+    args = parse_args()
+
+    if args.work_directory:
+        os.makedirs(args.work_directory, exist_ok=True)
+        results = run_benchmark(args, args.work_directory)
+    else:
+        with tempfile.TemporaryDirectory(prefix="benchmark_") as work_directory:
+            results = run_benchmark(args, work_directory)
+
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=2)
+
+    build = results["build"]
+    print(
+        f"Built {build['documents']} documents in {build['total_seconds']:.2f}s "
+        f"({build['docs_per_second']:.0f} docs/s, {build['mb_per_second']:.2f} MB/s)"
+    )
+
+    for name, summary in results["queries"].items():
+        if "qps" in summary:
+            print(
+                f"{name}: {summary['qps']:.1f} QPS, p50 {summary['p50_ms']:.2f}ms, p99 {summary['p99_ms']:.2f}ms"
+            )
+
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from index.loaded_index import LoadedIndex
+from index.processor import Processor
+from index.scorers import Scorer
+from utils.doc_processing import yield_sgml_text
+
+
+logger = logging.getLogger(__name__)
+
+# The resident index of each worker process of a batch, which memory-maps the same files
+worker_index = None
+
+
+def init_worker(
+    lexicon_file: str, inverted_file: str, document_length_file: str, byte_order: str
+) -> None:
+    """Load the index within a worker process.
+
+    :param lexicon_file: The name of the lexicon file
+    :param inverted_file: The name of the inverted file
+    :param document_length_file: The name of the document length file
+    :param byte_order: The ordering of the bytes used within the inverted file
+    :return: None
+    """
+    global worker_index
+    worker_index = LoadedIndex(lexicon_file, inverted_file, document_length_file, byte_order)
+
+
+def read_topics(topics_file: str, processor: Processor) -> List[Tuple[str, List[str]]]:
+    """Read and tokenize the queries of a topics file.
+
+    :param topics_file: The name of an SGML file of <Q ID=...> blocks
+    :param processor: The document processor object
+    :return: A list of query IDs and their tokenized queries
+    """
+    topics = list(yield_sgml_text(topics_file))
+    tokenized = processor.process_lines([text for _, text in topics])
+
+    return [(str(query_id), tokens) for (query_id, _), tokens in zip(topics, tokenized)]
+
+
+def decode_shared_postings(
+    index: LoadedIndex, queries: List[Tuple[str, List[str]]]
+) -> Dict[int, Tuple[np.ndarray, Optional[np.ndarray], np.ndarray]]:
+    """Decode the postings of the terms that appear in more than one query.
+
+    :param index: The resident index
+    :param queries: A list of query IDs and their tokenized queries
+    :return: The document IDs, term frequencies and document weights of the decoded
+        postings lists, keyed by term ID
+    """
+    term_counts = Counter(term for _, query in queries for term in set(query))
+    decoded = {}
+
+    for term, count in term_counts.items():
+        if count < 2:
+            continue
+
+        entry = index.term_dictionary.lookup(term)
+
+        if entry is not None:
+            decoded[entry.term_id] = index.read_weighted_postings(entry)
+
+    return decoded
+
+
+def evaluate_queries(
+    index: LoadedIndex,
+    queries: List[Tuple[str, List[str]]],
+    k: int,
+    decoded: Optional[Dict[int, Tuple[np.ndarray, Optional[np.ndarray], np.ndarray]]] = None,
+    scorer: Optional[Scorer] = None,
+) -> List[Tuple[str, List[Tuple[int, float]]]]:
+    """Find the best documents for each query of a group.
+
+    :param index: The resident index
+    :param queries: A list of query IDs and their tokenized queries
+    :param k: The number of documents to find for each query
+    :param decoded: Postings lists that are already decoded, keyed by term ID; the postings
+        of terms shared by the group are decoded when they are not given
+    :param scorer: The ranking model, which defaults to cosine similarity
+    :return: A list of query IDs and their documents and scores, best first
+    """
+    if decoded is None:
+        decoded = decode_shared_postings(index, queries)
+
+    return [
+        (query_id, index.top_k(query, k, decoded=decoded, scorer=scorer))
+        for query_id, query in queries
+    ]
+
+
+def evaluate_worker_queries(
+    queries: List[Tuple[str, List[str]]], k: int, scorer: Optional[Scorer] = None
+) -> List[Tuple[str, List[Tuple[int, float]]]]:
+    """Find the best documents for each query of a group within a worker process.
+
+    :param queries: A list of query IDs and their tokenized queries
+    :param k: The number of documents to find for each query
+    :param scorer: The ranking model, which defaults to cosine similarity
+    :return: A list of query IDs and their documents and scores, best first
+    """
+    return evaluate_queries(worker_index, queries, k, scorer=scorer)
+
+
+def evaluate_batch(
+    index: LoadedIndex,
+    queries: List[Tuple[str, List[str]]],
+    k: int = 1000,
+    workers: int = 1,
+    use_processes: bool = False,
+    group_size: int = 64,
+    scorer: Optional[Scorer] = None,
+) -> List[Tuple[str, List[Tuple[int, float]]]]:
+    """Find the best documents for every query of a batch.
+
+    Threads share a single decoding of the postings of common terms, while each worker
+    process decodes the common terms of its own groups of queries. Processes reopen the
+    index files, whose memory maps share the same pages of the operating system's cache.
+
+    :param index: The resident index
+    :param queries: A list of query IDs and their tokenized queries
+    :param k: The number of documents to find for each query
+    :param workers: The number of threads or processes evaluating queries
+    :param use_processes: Whether to evaluate queries in processes rather than threads
+    :param group_size: The number of queries sent to a worker at once
+    :param scorer: The ranking model, which defaults to cosine similarity
+    :return: A list of query IDs and their documents and scores, in the order of the queries
+    """
+    if workers <= 1:
+        return evaluate_queries(index, queries, k, scorer=scorer)
+
+    groups = [queries[i : i + group_size] for i in range(0, len(queries), group_size)]
+    results = []
+
+    if use_processes:
+        files = (index.lexicon_file, index.inverted_file, index.document_length_file)
+
+        with ProcessPoolExecutor(
+            workers, initializer=init_worker, initargs=(*files, index.byte_order)
+        ) as executor:
+            for group_results in executor.map(
+                evaluate_worker_queries, groups, [k] * len(groups), [scorer] * len(groups)
+            ):
+                results.extend(group_results)
+    else:
+        decoded = decode_shared_postings(index, queries)
+
+        with ThreadPoolExecutor(workers) as executor:
+            futures = [
+                executor.submit(evaluate_queries, index, group, k, decoded, scorer)
+                for group in groups
+            ]
+
+            for future in futures:
+                results.extend(future.result())
+
+    return results
+
+
+def write_run_file(
+    run_file: str,
+    results: List[Tuple[str, List[Tuple[int, float]]]],
+    tag: str = "text-retrieval-engine",
+) -> None:
+    """Write the results of a batch as a TREC run file.
+
+    Each line holds a query ID, the literal Q0, a document ID, its rank, its score and the
+    run tag.
+
+    :param run_file: The name of the run file
+    :param results: A list of query IDs and their documents and scores, best first
+    :param tag: The name of the run
+    :return: None
+    """
+    with open(run_file, "w") as file:
+        for query_id, documents in results:
+            for rank, (doc_id, score) in enumerate(documents, start=1):
+                file.write(f"{query_id} Q0 {doc_id} {rank} {score:.6f} {tag}\n")
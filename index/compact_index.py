@@ -0,0 +1,104 @@
+from array import array
+from typing import List, Tuple
+
+import numpy as np
+
+from index.inverted_index import InvertedIndex
+
+
+class CompactInvertedIndex(InvertedIndex):
+    """Builds an inverted index in typed arrays rather than nested dictionaries.
+
+    Terms are interned to integer IDs, and each term's postings are appended to a pair of
+    growable arrays of 4-byte document IDs and frequencies. Words must be added one document
+    at a time, as they are by the Indexer, so a posting only ever needs to be compared with
+    the last one of its term. The generated files are the same as those of InvertedIndex.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the CompactInvertedIndex instance."""
+        self.num_docs = 0
+        self.num_terms = 0
+
+        # The IDs of the indexed documents, when they are not numbered from 1 to num_docs
+        self.doc_ids = None
+
+        # Each term's ID is its position within the following lists and arrays
+        self.term_ids = {}
+        self.terms = []
+        self.counts = array("Q")
+        self.postings_doc_ids = []
+        self.postings_frequencies = []
+
+    def __intern(self, word: str) -> int:
+        """Find the ID of a term, adding the term if it is new.
+
+        :param word: The term
+        :return: The ID of the term
+        """
+        term_id = self.term_ids.get(word)
+
+        if term_id is None:
+            term_id = len(self.terms)
+            self.term_ids[word] = term_id
+            self.terms.append(word)
+            self.counts.append(0)
+            self.postings_doc_ids.append(array("I"))
+            self.postings_frequencies.append(array("I"))
+            self.num_terms += 1
+
+        return term_id
+
+    def add_word(self, document_id: int, word: str) -> None:
+        """Add a word to the index.
+
+        :param document_id: The ID of the document being processed
+        :param word: The word to be added
+        :return: None
+        """
+        term_id = self.__intern(word)
+        doc_ids = self.postings_doc_ids[term_id]
+
+        if doc_ids and doc_ids[-1] == document_id:
+            self.postings_frequencies[term_id][-1] += 1
+        else:
+            doc_ids.append(document_id)
+            self.postings_frequencies[term_id].append(1)
+
+        self.counts[term_id] += 1
+
+    def merge(self, other: InvertedIndex) -> None:
+        """Merge the index of the next batch of documents into this index.
+
+        :param other: An index of documents following those already added, built with any
+            index class
+        :return: None
+        """
+        for term, count, doc_ids, frequencies in other.yield_postings():
+            term_id = self.__intern(term)
+
+            self.counts[term_id] += count
+            self.postings_doc_ids[term_id].frombytes(doc_ids.astype(np.uintc).tobytes())
+            self.postings_frequencies[term_id].frombytes(frequencies.astype(np.uintc).tobytes())
+
+        self.num_docs += other.num_docs
+
+    def yield_postings(self) -> Tuple[str, int, np.ndarray, np.ndarray]:
+        """Yields every term and its postings in the order the terms were added.
+
+        :return: A tuple of a term, its collection count, document IDs and term frequencies
+        """
+        for term_id, term in enumerate(self.terms):
+            doc_ids = np.frombuffer(self.postings_doc_ids[term_id], dtype=np.uintc)
+            frequencies = np.frombuffer(self.postings_frequencies[term_id], dtype=np.uintc)
+
+            yield term, self.counts[term_id], doc_ids.astype(np.int64), frequencies.astype(np.int64)
+
+    def term_statistics(self) -> Tuple[List[str], List[int], List[int]]:
+        """Find the collection and document frequency of every term.
+
+        :return: A tuple of the terms, their collection counts and document frequencies
+        """
+        doc_frequencies = [len(doc_ids) for doc_ids in self.postings_doc_ids]
+
+        return list(self.terms), self.counts.tolist(), doc_frequencies
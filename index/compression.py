@@ -0,0 +1,218 @@
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+# The number of postings compressed together behind a single skip entry
+BLOCK_SIZE = 128
+
+
+def vbyte_encode(values: np.ndarray) -> np.ndarray:
+    """Encode non-negative integers with variable-byte compression.
+
+    Each integer is split into 7-bit groups, least significant first, and the high bit is
+    set on the last byte of every integer.
+
+    :param values: The integers to encode, each smaller than 2^35
+    :return: The encoded bytes
+    """
+    values = np.asarray(values, dtype=np.uint64)
+
+    num_bytes = np.ones((len(values),), dtype=np.int64)
+    for shift in range(7, 35, 7):
+        num_bytes += values >= (1 << shift)
+
+    ends = np.cumsum(num_bytes)
+    starts = ends - num_bytes
+
+    encoded = np.zeros((int(ends[-1]) if len(values) > 0 else 0,), dtype=np.uint8)
+
+    for group in range(5):
+        has_group = num_bytes > group
+        encoded[starts[has_group] + group] = (values[has_group] >> np.uint64(7 * group)) & 0x7F
+
+    encoded[ends - 1] |= 0x80
+
+    return encoded
+
+
+def vbyte_decode(buffer) -> np.ndarray:
+    """Decode variable-byte compressed integers without a per-integer Python loop.
+
+    :param buffer: The encoded bytes
+    :return: The decoded integers
+    """
+    encoded = np.frombuffer(buffer, dtype=np.uint8)
+
+    ends = np.flatnonzero(encoded & 0x80)
+
+    if len(ends) == 0:
+        return np.zeros((0,), dtype=np.int64)
+
+    starts = np.concatenate(([0], ends[:-1] + 1))
+
+    # The position of every byte within the integer it belongs to
+    groups = np.repeat(np.arange(len(starts)), ends - starts + 1)
+    positions = np.arange(len(encoded)) - starts[groups]
+
+    parts = (encoded & 0x7F).astype(np.uint64) << (7 * positions).astype(np.uint64)
+
+    return np.add.reduceat(parts, starts).astype(np.int64)
+
+
+def header_dtype(byte_order: str = "big") -> np.dtype:
+    """Build the record type of a compressed postings list header.
+
+    :param byte_order: The ordering of the bytes used within the inverted file
+        (either big or little)
+    :return: A structured dtype of the number of postings and the block size
+    """
+    prefix = ">" if byte_order == "big" else "<"
+    return np.dtype([("num_postings", f"{prefix}u4"), ("block_size", f"{prefix}u4")])
+
+
+def skip_dtype(byte_order: str = "big") -> np.dtype:
+    """Build the record type of a skip entry.
+
+    :param byte_order: The ordering of the bytes used within the inverted file
+        (either big or little)
+    :return: A structured dtype of a block's largest document ID, its largest normalized
+        term weight and the offset at which the block's data ends
+    """
+    prefix = ">" if byte_order == "big" else "<"
+    return np.dtype(
+        [
+            ("max_doc_id", f"{prefix}u4"),
+            ("max_weight", f"{prefix}f4"),
+            ("end", f"{prefix}u4"),
+        ]
+    )
+
+
+def encode_blocks(
+    doc_ids: np.ndarray,
+    frequencies: np.ndarray,
+    weights: np.ndarray,
+    byte_order: str = "big",
+    block_size: int = BLOCK_SIZE,
+) -> bytes:
+    """Encode a postings list as delta and variable-byte compressed blocks.
+
+    The list starts with a header and a table of one skip entry per block, followed by
+    the blocks. Each block holds the gaps between its document IDs, the first relative to
+    the previous block's last document ID, followed by the frequencies.
+
+    :param doc_ids: The document IDs of the postings
+    :param frequencies: The term frequency of each posting
+    :param weights: The normalized term weight of each posting
+    :param byte_order: The ordering of the bytes to use within the inverted file
+        (either big or little)
+    :param block_size: The number of postings in each block
+    :return: The bytes of the postings list
+    """
+    order = np.argsort(doc_ids, kind="stable")
+    doc_ids = np.asarray(doc_ids, dtype=np.int64)[order]
+    frequencies = np.asarray(frequencies, dtype=np.int64)[order]
+    weights = np.asarray(weights, dtype=np.float64)[order]
+
+    block_starts = np.arange(0, len(doc_ids), block_size)
+    gaps = np.diff(doc_ids, prepend=0)
+
+    skip_entries = np.zeros((len(block_starts),), dtype=skip_dtype(byte_order))
+    blocks = []
+    end = 0
+
+    for i, start in enumerate(block_starts):
+        stop = start + block_size
+        block = vbyte_encode(np.concatenate((gaps[start:stop], frequencies[start:stop])))
+        blocks.append(block.tobytes())
+        end += len(block)
+
+        skip_entries[i] = (doc_ids[start:stop][-1], weights[start:stop].max(), end)
+
+    header = np.array([(len(doc_ids), block_size)], dtype=header_dtype(byte_order))
+
+    return header.tobytes() + skip_entries.tobytes() + b"".join(blocks)
+
+
+def decode_blocks(
+    buffer, byte_order: str = "big", candidates: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Decode a postings list encoded by encode_blocks.
+
+    :param buffer: The bytes of the postings list, e.g. a slice of a memory map
+    :param byte_order: The ordering of the bytes used within the inverted file
+        (either big or little)
+    :param candidates: Sorted document IDs of interest; when given, only the blocks whose
+        document ID range may contain a candidate are decoded, so the result can include
+        other documents from those blocks
+    :return: A tuple of document IDs and term frequencies
+    """
+    doc_ids, frequencies, _ = decode_indexed_blocks(buffer, byte_order, candidates)
+    return doc_ids, frequencies
+
+
+def decode_indexed_blocks(
+    buffer, byte_order: str = "big", candidates: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Decode a postings list encoded by encode_blocks, with the index of each posting.
+
+    Skipped blocks leave gaps in the decoded postings, so the index of each posting within
+    the whole list is returned alongside it, e.g. to find its positions.
+
+    :param buffer: The bytes of the postings list, e.g. a slice of a memory map
+    :param byte_order: The ordering of the bytes used within the inverted file
+        (either big or little)
+    :param candidates: Sorted document IDs of interest, see decode_blocks
+    :return: A tuple of document IDs, term frequencies and posting indices
+    """
+    header_type = header_dtype(byte_order)
+    header = np.frombuffer(buffer, dtype=header_type, count=1)[0]
+    num_postings = int(header["num_postings"])
+    block_size = int(header["block_size"])
+
+    num_blocks = -(-num_postings // block_size)
+    skip_entries = np.frombuffer(
+        buffer, dtype=skip_dtype(byte_order), count=num_blocks, offset=header_type.itemsize
+    )
+    data_start = header_type.itemsize + skip_entries.nbytes
+
+    block_ends = skip_entries["end"].astype(np.int64)
+    block_starts = np.concatenate(([0], block_ends[:-1]))
+    block_counts = np.full((num_blocks,), block_size, dtype=np.int64)
+    if num_blocks > 0:
+        block_counts[-1] = num_postings - block_size * (num_blocks - 1)
+
+    # Each block continues from the largest document ID of the block before it
+    max_doc_ids = skip_entries["max_doc_id"].astype(np.int64)
+    bases = np.concatenate(([0], max_doc_ids[:-1]))
+
+    selected = np.arange(num_blocks)
+
+    if candidates is not None:
+        first = np.searchsorted(candidates, bases, side="right")
+        last = np.searchsorted(candidates, max_doc_ids, side="right")
+        selected = selected[last > first]
+
+    if len(selected) == 0:
+        empty = np.zeros((0,), dtype=np.int64)
+        return empty, empty, empty
+
+    data = np.frombuffer(buffer, dtype=np.uint8, offset=data_start)
+    values = vbyte_decode(np.concatenate([data[block_starts[i] : block_ends[i]] for i in selected]))
+
+    counts = block_counts[selected]
+    value_starts = np.repeat(np.cumsum(2 * counts) - 2 * counts, counts)
+    within_block = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+    gaps = values[value_starts + within_block]
+    frequencies = values[value_starts + within_block + np.repeat(counts, counts)]
+
+    # Restart the running sum of the gaps at every selected block's base document ID
+    gaps[np.cumsum(counts) - counts] += bases[selected]
+    running = np.cumsum(gaps)
+    previous = np.concatenate(([0], running[np.cumsum(counts)[:-1] - 1]))
+    doc_ids = running - np.repeat(previous, counts)
+    posting_indices = np.repeat(selected * block_size, counts) + within_block
+
+    return doc_ids, frequencies, posting_indices
@@ -0,0 +1,114 @@
+from typing import Tuple
+
+import numpy as np
+
+from index.compression import vbyte_decode, vbyte_encode
+
+
+# The quantized impacts are stored as unsigned integers of the given number of bits
+IMPACT_DTYPES = {8: "u1", 16: "u2"}
+
+
+def impact_header_dtype(byte_order: str = "big") -> np.dtype:
+    """Build the record type of an impact-scored postings list header.
+
+    :param byte_order: The ordering of the bytes used within the inverted file
+        (either big or little)
+    :return: A structured dtype of the number of postings and the largest impact
+    """
+    prefix = ">" if byte_order == "big" else "<"
+    return np.dtype([("num_postings", f"{prefix}u4"), ("max_impact", f"{prefix}f4")])
+
+
+def impact_dtype(bits: int, byte_order: str = "big") -> np.dtype:
+    """Build the type of a quantized impact.
+
+    :param bits: The number of bits of each impact, either 8 or 16
+    :param byte_order: The ordering of the bytes used within the inverted file
+        (either big or little)
+    :return: An unsigned integer dtype
+    """
+    prefix = ">" if byte_order == "big" else "<"
+    return np.dtype(f"{prefix}{IMPACT_DTYPES[bits]}")
+
+
+def quantize_impacts(weights: np.ndarray, bits: int) -> Tuple[np.ndarray, np.float32]:
+    """Quantize the weights of a postings list relative to its largest weight.
+
+    :param weights: The normalized term weight of each posting
+    :param bits: The number of bits of each impact, either 8 or 16
+    :return: A tuple of the quantized impacts and the largest weight they are scaled to
+    """
+    levels = (1 << bits) - 1
+    max_impact = np.float32(weights.max()) if len(weights) > 0 else np.float32(0)
+
+    if max_impact <= 0:
+        return np.zeros((len(weights),), dtype=np.int64), max_impact
+
+    quantized = np.rint(np.asarray(weights) / np.float64(max_impact) * levels)
+
+    return np.clip(quantized, 0, levels).astype(np.int64), max_impact
+
+
+def dequantize_impacts(quantized: np.ndarray, max_impact: np.float32, bits: int) -> np.ndarray:
+    """Restore approximate weights from quantized impacts.
+
+    :param quantized: The quantized impacts
+    :param max_impact: The largest weight the impacts are scaled to
+    :param bits: The number of bits of each impact, either 8 or 16
+    :return: The approximate normalized term weights
+    """
+    return quantized * (np.float64(max_impact) / ((1 << bits) - 1))
+
+
+def encode_impacts(
+    doc_ids: np.ndarray, weights: np.ndarray, bits: int, byte_order: str = "big"
+) -> bytes:
+    """Encode a postings list as document ID gaps and quantized impacts.
+
+    The list starts with a header, followed by the variable-byte compressed gaps between
+    the sorted document IDs and then a fixed-width impact per posting. Term frequencies are
+    not stored, since a document's score is the sum of its impacts.
+
+    :param doc_ids: The document IDs of the postings
+    :param weights: The normalized term weight of each posting
+    :param bits: The number of bits of each impact, either 8 or 16
+    :param byte_order: The ordering of the bytes to use within the inverted file
+        (either big or little)
+    :return: The bytes of the postings list
+    """
+    order = np.argsort(doc_ids, kind="stable")
+    doc_ids = np.asarray(doc_ids, dtype=np.int64)[order]
+    weights = np.asarray(weights, dtype=np.float64)[order]
+
+    quantized, max_impact = quantize_impacts(weights, bits)
+    header = np.array([(len(doc_ids), max_impact)], dtype=impact_header_dtype(byte_order))
+    gaps = vbyte_encode(np.diff(doc_ids, prepend=0))
+
+    return (
+        header.tobytes()
+        + gaps.tobytes()
+        + quantized.astype(impact_dtype(bits, byte_order)).tobytes()
+    )
+
+
+def decode_impacts(buffer, bits: int, byte_order: str = "big") -> Tuple[np.ndarray, np.ndarray]:
+    """Decode a postings list encoded by encode_impacts.
+
+    :param buffer: The bytes of the postings list, e.g. a slice of a memory map
+    :param bits: The number of bits of each impact, either 8 or 16
+    :param byte_order: The ordering of the bytes used within the inverted file
+        (either big or little)
+    :return: A tuple of document IDs and approximate normalized term weights
+    """
+    header_type = impact_header_dtype(byte_order)
+    header = np.frombuffer(buffer, dtype=header_type, count=1)[0]
+    num_postings = int(header["num_postings"])
+
+    impact_type = impact_dtype(bits, byte_order)
+    impacts_start = len(buffer) - num_postings * impact_type.itemsize
+
+    gaps = vbyte_decode(buffer[header_type.itemsize : impacts_start])
+    quantized = np.frombuffer(buffer, dtype=impact_type, offset=impacts_start)
+
+    return np.cumsum(gaps), dequantize_impacts(quantized, header["max_impact"], bits)
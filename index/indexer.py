@@ -1,15 +1,123 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 import logging
+import os
+from typing import Iterable, List, Optional, Tuple
 
 import numpy as np
 import pandas as pd
 
-from inverted_index import InvertedIndex
-from processor import Processor
-from utils.doc_processing import yield_sgml_text
+from index.inverted_index import InvertedIndex
+from index.positional_index import PositionalInvertedIndex
+from index.processor import Processor
+from logging_tools.metrics import metrics
+from logging_tools.progress import ProgressLogger
+from utils.doc_processing import split_sgml_file, yield_sgml_text
 
 
 logger = logging.getLogger(__name__)
 
+# The processor, index class, dataset and batch size used by each worker process of a
+# parallel build
+worker_processor = None
+worker_index_class = InvertedIndex
+worker_dataset_path = None
+worker_batch_size = 1000
+
+
+def init_worker(
+    processor: Processor,
+    index_class: type = InvertedIndex,
+    dataset_path: Optional[str] = None,
+    batch_size: int = 1000,
+) -> None:
+    """Store the document processor, index class and dataset within a worker process.
+
+    :param processor: The document processor object
+    :param index_class: The class of the partial indexes built by the worker
+    :param dataset_path: The path to the dataset file, whose byte ranges the worker reads
+    :param batch_size: The number of documents whose tokens are cleaned together
+    :return: None
+    """
+    global worker_processor, worker_index_class, worker_dataset_path, worker_batch_size
+    worker_processor = processor
+    worker_index_class = index_class
+    worker_dataset_path = dataset_path
+    worker_batch_size = batch_size
+
+
+def index_batch(index: InvertedIndex, batch: List[Tuple[int, str]]) -> int:
+    """Add a batch of documents to a partial inverted index within a worker process.
+
+    :param index: The partial index
+    :param batch: A list of document IDs and their text
+    :return: The number of words processed
+    """
+    words_processed = 0
+
+    # Each distinct surface form within the batch is only cleaned once
+    batch_tokens = worker_processor.process_lines([text for _, text in batch])
+
+    for (document_id, _), tokens in zip(batch, batch_tokens):
+        add_tokens(index, document_id, tokens)
+
+        words_processed += len(tokens)
+        index.num_docs += 1
+
+    return words_processed
+
+
+def index_range(byte_range: Tuple[int, int]) -> Tuple[InvertedIndex, int]:
+    """Build a partial inverted index of the documents within a byte range of the dataset.
+
+    The worker reads its own range of the memory-mapped dataset file, so document text is
+    never sent between processes.
+
+    :param byte_range: The start and end offsets of the range, aligned to documents
+    :return: A tuple of the partial index and the number of words processed
+    """
+    index = worker_index_class()
+    words_processed = 0
+
+    documents = yield_sgml_text(worker_dataset_path, *byte_range)
+
+    for batch in yield_batches(documents, worker_batch_size):
+        words_processed += index_batch(index, batch)
+
+    return index, words_processed
+
+
+def add_tokens(index: InvertedIndex, document_id: int, tokens: List[str]) -> None:
+    """Add the tokens of a document to an index, with their positions if it records them.
+
+    :param index: The index being built
+    :param document_id: The ID of the document
+    :param tokens: The clean tokens of the document, in order
+    :return: None
+    """
+    if isinstance(index, PositionalInvertedIndex):
+        for position, token in enumerate(tokens):
+            index.add_word(document_id, token, position)
+    else:
+        for token in tokens:
+            index.add_word(document_id, token)
+
+
+def yield_batches(documents: Iterable[Tuple[int, str]], batch_size: int) -> List[Tuple[int, str]]:
+    """Group documents into batches.
+
+    :param documents: An iterable of document IDs and their text
+    :param batch_size: The number of documents in each batch
+    :return: A list of document IDs and their text
+    """
+    iterator = iter(documents)
+    batch = list(islice(iterator, batch_size))
+
+    while batch:
+        yield batch
+        batch = list(islice(iterator, batch_size))
+
 
 class Indexer:
     """Parses text data and constructs an inverted index."""
@@ -20,6 +128,10 @@ class Indexer:
         dataset_name: str,
         processor: Processor,
         index: InvertedIndex,
+        workers: int = 1,
+        batch_size: int = 1000,
+        range_size: int = 16 * 1024**2,
+        progress_interval: float = 10.0,
     ) -> None:
         """Initialize the Indexer instance.
 
@@ -27,6 +139,13 @@ class Indexer:
         :param dataset_name: The name of the dataset
         :param index: The inverted index that will be populated
         :param processor: The document processor object
+        :param workers: The number of processes used to tokenize documents; a single
+            worker processes documents within the current process
+        :param batch_size: The number of documents whose tokens a worker process cleans
+            together
+        :param range_size: The approximate number of bytes of the dataset file each task of
+            a worker process reads
+        :param progress_interval: The least number of seconds between two progress messages
         """
         self.index = index
         self.documents_processed = 0
@@ -34,35 +153,101 @@ class Indexer:
         self.dataset_path = dataset_path
         self.dataset_name = dataset_name
         self.processor = processor
+        self.workers = workers
+        self.batch_size = batch_size
+        self.range_size = range_size
+        self.progress_interval = progress_interval
 
     def load_data(self) -> None:
         """Load data from a text file."""
         logger.info(f"Starting {self.dataset_name} processing...")
 
-        for document_id, text in yield_sgml_text(self.dataset_path):
-            self.__process_line(document_id, text)
-            self.documents_processed += 1
-            self.index.num_docs += 1
-            logger.info(f"{self.documents_processed} documents processed")
+        # Progress is logged at most once per interval, since a message per document slows
+        # down large builds
+        progress = ProgressLogger(
+            logger, self.progress_interval, os.path.getsize(self.dataset_path)
+        )
+
+        if self.workers > 1:
+            self.__load_data_parallel(progress)
+        else:
+            for document_id, text in yield_sgml_text(self.dataset_path):
+                words_processed = self.__process_line(document_id, text)
+                self.documents_processed += 1
+                self.index.num_docs += 1
+                progress.update(1, words_processed)
 
+        progress.finish()
+        metrics.increment("documents_indexed", progress.documents)
+        metrics.increment("words_indexed", progress.words)
         logger.info(f"Finished processing {self.dataset_name}\n")
 
-    def __process_line(self, document_id: int, line: str) -> None:
+    def __load_data_parallel(self, progress: ProgressLogger) -> None:
+        """Load data from a text file, indexing byte ranges of the file in worker processes.
+
+        Partial indexes are merged in the order of their ranges, so the result is the same
+        as that of a serial build.
+
+        :param progress: The logger of the build's progress
+        :return: None
+        """
+        byte_ranges = split_sgml_file(self.dataset_path, self.range_size)
+
+        # Partial indexes are built with the same class as the index they are merged into,
+        # except for indexes that spill to disk, which merge ordinary in-memory indexes
+        index_class = type(self.index) if isinstance(self.index, InvertedIndex) else InvertedIndex
+
+        with ProcessPoolExecutor(
+            self.workers,
+            initializer=init_worker,
+            initargs=(self.processor, index_class, self.dataset_path, self.batch_size),
+        ) as executor:
+            # Only a few ranges are in flight at once to bound memory use
+            pending = deque()
+
+            for byte_range in byte_ranges:
+                pending.append(executor.submit(index_range, byte_range))
+
+                if len(pending) >= 2 * self.workers:
+                    self.__merge_partial_index(*pending.popleft().result(), progress)
+
+            while pending:
+                self.__merge_partial_index(*pending.popleft().result(), progress)
+
+    def __merge_partial_index(
+        self, partial_index: InvertedIndex, words_processed: int, progress: ProgressLogger
+    ) -> None:
+        """Merge a partial index built by a worker process.
+
+        :param partial_index: The partial index of a batch of documents
+        :param words_processed: The number of words processed within the batch
+        :param progress: The logger of the build's progress
+        :return: None
+        """
+        with metrics.timer("index_merge"):
+            self.index.merge(partial_index)
+
+        self.documents_processed += partial_index.num_docs
+        self.words_processed += words_processed
+        progress.update(partial_index.num_docs, words_processed)
+
+    def __process_line(self, document_id: int, line: str) -> int:
         """Process a single line in a text file.
 
         :param document_id: The ID of the document being processed
         :param line: The line to be processed
-        :return: None
+        :return: The number of words processed
         """
         tokens = self.processor.process_line(line)
 
-        for token in tokens:
-            self.words_processed += 1
-            self.index.add_word(document_id, token)
+        self.words_processed += len(tokens)
+        add_tokens(self.index, document_id, tokens)
+
+        return len(tokens)
 
     def calculate_metrics(self) -> None:
         """Calculate metrics for reporting purposes."""
-        unique_words = len(list(self.index.index.keys()))
+        unique_words = self.index.num_terms
 
         with open(f"./output_reports/{self.dataset_name}_metric_report.txt", "w") as file:
             file.write(f"Documents processed: {self.documents_processed}\n")
@@ -71,14 +256,12 @@ class Indexer:
 
     def find_singleton_words(self) -> None:
         """Find words that only appear in the corpus once."""
-        words = list(self.index.index.keys())
+        words, counts, doc_counts = self.index.term_statistics()
 
         singletons = []
 
-        for word in words:
-            index = self.index.index[word]
-
-            if index["count"] == 1 and index["num_docs"] == 1:
+        for word, count, doc_count in zip(words, counts, doc_counts):
+            if count == 1 and doc_count == 1:
                 singletons.append(word)
 
         with open(f"./output_reports/{self.dataset_name}_singleton_report.txt", "w") as file:
@@ -89,10 +272,9 @@ class Indexer:
 
     def find_frequencies(self) -> None:
         """Find the collection and document frequency of each word."""
-        words = list(self.index.index.keys())
+        words, counts, doc_counts = self.index.term_statistics()
 
         # Find collection frequency
-        counts = [self.index.index[word]["count"] for word in words]
         sorted_counts = sorted(counts)
         sorted_count_indices = np.argsort(counts)
 
@@ -100,7 +282,6 @@ class Indexer:
         sorted_words = np.array(words)[sorted_count_indices]
 
         # Find document frequency
-        doc_counts = [self.index.index[word]["num_docs"] for word in words]
         sorted_doc_counts = np.array(doc_counts)[sorted_count_indices]
 
         # Put the most frequent words in a DataFrame to make it easy to print
@@ -1,16 +1,101 @@
 from collections import Counter
 from datetime import datetime
 import logging
-from typing import Dict, List, Tuple
+import os
+import re
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 
 import numpy as np
-import pandas as pd
 
+from index.postings import RAW_ENCODING, decode_postings, encode_postings_list, stored_weights
 from index.processor import Processor
+from index.scoring import cosine_scores
+from index.statistics_file import statistics_file_name, write_statistics_file
+from index.term_dictionary import TermDictionary, TermEntry
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+    from index.sharding import GlobalStatistics
 
 
 logger = logging.getLogger(__name__)
 
+# The timestamp ending the name of every index file, e.g. _31122022-235959.csv, which is
+# matched rather than parsed with strptime, since strptime is slow
+TIMESTAMP_PATTERN = re.compile(r"_(\d{2})(\d{2})(\d{4})-(\d{2})(\d{2})(\d{2})\.(?:csv|bin)$")
+
+
+def generate_file_names(
+    dataset_name: str, output_directory: str = "./output_reports"
+) -> Tuple[str, str, str]:
+    """Generate timestamped names for the lexicon, inverted and document length files.
+
+    :param dataset_name: The name of the dataset
+    :param output_directory: The directory in which the files are written
+    :return: A tuple containing the names of the lexicon, inverted and document length files
+    """
+    now = datetime.now()
+    now_str = datetime.strftime(now, "%d%m%Y-%H%M%S")
+
+    lexicon_file = f"{output_directory}/{dataset_name}_lexicon_{now_str}.csv"
+    inverted_file = f"{output_directory}/{dataset_name}_index_{now_str}.bin"
+    document_length_file = f"{output_directory}/{dataset_name}_document_length_{now_str}.csv"
+
+    return lexicon_file, inverted_file, document_length_file
+
+
+def find_latest_files(
+    dataset_name: str, directory: str = "output_reports"
+) -> Tuple[datetime, Dict]:
+    """Find the most recent complete set of generated index files.
+
+    :param dataset_name: The name of the dataset
+    :param directory: The directory containing the index files
+    :return: A tuple of the timestamp of the latest files and a dictionary of their names,
+        keyed by LEXICON_FILE, INVERTED_FILE and DOCUMENT_LENGTH_FILE
+    """
+    file_sets = {}
+
+    for file in os.listdir(directory):
+        match = TIMESTAMP_PATTERN.search(file)
+
+        if dataset_name in file and match is not None:
+            # The fields are reordered from year to second, so their strings sort by time
+            day, month, year, hour, minute, second = match.groups()
+            file_set = file_sets.setdefault((year, month, day, hour, minute, second), {})
+
+            if "document_length" in file:
+                file_set["DOCUMENT_LENGTH_FILE"] = f"{directory}/{file}"
+            elif "index" in file:
+                file_set["INVERTED_FILE"] = f"{directory}/{file}"
+            elif "lexicon" in file:
+                file_set["LEXICON_FILE"] = f"{directory}/{file}"
+
+    for timestamp in sorted(file_sets.keys(), reverse=True):
+        if len(file_sets[timestamp]) == 3:
+            return datetime(*map(int, timestamp)), file_sets[timestamp]
+
+    return datetime.min, {}
+
+
+def find_collection_doc_ids(postings_doc_ids: List[np.ndarray], num_docs: int) -> np.ndarray:
+    """Find the IDs of the documents in a collection.
+
+    Collections numbered from 1 to num_docs keep documents without any indexed words, while
+    the IDs of any other collection are taken from its postings.
+
+    :param postings_doc_ids: The document IDs of each postings list
+    :param num_docs: The total number of documents in the collection
+    :return: The sorted document IDs
+    """
+    max_doc_id = max((doc_ids.max() for doc_ids in postings_doc_ids if len(doc_ids)), default=0)
+
+    if max_doc_id <= num_docs:
+        return np.arange(1, num_docs + 1)
+
+    return np.unique(np.concatenate(postings_doc_ids))
+
 
 class InvertedIndex:
     def __init__(self) -> None:
@@ -19,6 +104,9 @@ class InvertedIndex:
         self.num_docs = 0
         self.num_terms = 0
 
+        # The IDs of the indexed documents, when they are not numbered from 1 to num_docs
+        self.doc_ids = None
+
     def add_word(self, document_id: int, word: str) -> None:
         """Add a word to the index."""
         if word in self.index.keys():
@@ -55,80 +143,223 @@ class InvertedIndex:
         self.index[word] = {"count": 1, "num_docs": 1, "postings_list": postings_list}
         self.num_terms += 1
 
+    def merge(self, other: "InvertedIndex") -> None:
+        """Merge another index of a disjoint set of documents into this index.
+
+        Terms and postings keep the order in which they were added, so merging the indexes
+        of consecutive batches of documents in order gives the same index as adding every
+        document to a single index.
+
+        :param other: The index to merge into this index
+        :return: None
+        """
+        for word, other_entry in other.index.items():
+            entry = self.index.get(word)
+
+            if entry is None:
+                self.index[word] = other_entry
+                self.num_terms += 1
+                continue
+
+            postings_list = entry["postings_list"]
+
+            for posting, frequency in other_entry["postings_list"].items():
+                if posting != "size":
+                    postings_list[posting] = frequency
+
+            entry["count"] += other_entry["count"]
+            entry["num_docs"] += other_entry["num_docs"]
+
+        self.num_docs += other.num_docs
+
+    def yield_postings(self) -> Tuple[str, int, np.ndarray, np.ndarray]:
+        """Yields every term and its postings in the order the terms were added.
+
+        :return: A tuple of a term, its collection count, document IDs and term frequencies
+        """
+        for term, entry in self.index.items():
+            postings_list = entry["postings_list"]
+            doc_frequency = len(postings_list) - 1
+
+            doc_ids = np.fromiter(
+                (posting for posting in postings_list if posting != "size"),
+                dtype=np.int64,
+                count=doc_frequency,
+            )
+            frequencies = np.fromiter(
+                (postings_list[doc_id] for doc_id in doc_ids.tolist()),
+                dtype=np.int64,
+                count=doc_frequency,
+            )
+
+            yield term, entry["count"], doc_ids, frequencies
+
+    def term_statistics(self) -> Tuple[List[str], List[int], List[int]]:
+        """Find the collection and document frequency of every term.
+
+        :return: A tuple of the terms, their collection counts and document frequencies
+        """
+        terms = list(self.index.keys())
+        counts = [self.index[term]["count"] for term in terms]
+        doc_frequencies = [self.index[term]["num_docs"] for term in terms]
+
+        return terms, counts, doc_frequencies
+
     def generate_file(
         self,
         dataset_name: str,
         byte_order: str = "big",
+        encoding: str = RAW_ENCODING,
+        output_directory: str = "./output_reports",
+        global_statistics: Optional["GlobalStatistics"] = None,
     ) -> Tuple[str, str, str]:
         """Generate lexicon and inverted files.
 
         :param dataset_name: The name of the dataset
         :param byte_order: The ordering of the bytes to use within the inverted file
             (either big or little)
+        :param encoding: The encoding of the postings lists, either raw fixed-width
+            postings or compressed blocks with skip entries
+        :param output_directory: The directory in which the files are written
+        :param global_statistics: The statistics of the whole collection, when this index is
+            a shard of it, whose document and collection frequencies are recorded and used
+            to weight the postings instead of the shard's own
         :return: A tuple containing the names of the generated files
         """
-        now = datetime.now()
-        now_str = datetime.strftime(now, "%d%m%Y-%H%M%S")
-
         # These lists will be used to generate the lexicon file
-        terms = list(self.index.keys())
+        terms = []
         doc_frequencies = []
+        collection_frequencies = []
         offsets = []
         idfs = []
 
+        # The decoded postings are kept until the document lengths needed to normalize
+        # their weights are known
+        postings = []
+
+        lexicon_file, inverted_file, document_length_file = generate_file_names(
+            dataset_name, output_directory
+        )
+
+        for term, count, doc_ids, frequencies in self.yield_postings():
+            terms.append(term)
+
+            if global_statistics is not None:
+                entry = global_statistics.term_dictionary.lookup(term)
+                doc_frequencies.append(entry.document_frequency)
+                collection_frequencies.append(entry.collection_frequency)
+                idf = entry.inverse_document_frequency
+            else:
+                doc_frequencies.append(len(doc_ids))
+                collection_frequencies.append(count)
+                idf = np.log2(self.num_docs / len(doc_ids))
+
+            idfs.append(idf)
+
+            postings.append((doc_ids, frequencies))
+
         # These variables will be used to generate the document vector length file
-        doc_vector_lengths = np.zeros((self.num_docs,))
+        if self.doc_ids is not None:
+            collection_doc_ids = np.unique(np.array(self.doc_ids, dtype=np.int64))
+        else:
+            collection_doc_ids = find_collection_doc_ids(
+                [doc_ids for doc_ids, _ in postings], self.num_docs
+            )
+        doc_vector_lengths = np.zeros((len(collection_doc_ids),))
+        doc_token_lengths = np.zeros((len(collection_doc_ids),), dtype=np.int64)
 
-        lexicon_file = f"./output_reports/{dataset_name}_lexicon_{now_str}.csv"
-        inverted_file = f"./output_reports/{dataset_name}_index_{now_str}.bin"
-        document_length_file = f"./output_reports/{dataset_name}_document_length_{now_str}.csv"
+        for (doc_ids, frequencies), idf in zip(postings, idfs):
+            positions = np.searchsorted(collection_doc_ids, doc_ids)
+            np.add.at(doc_vector_lengths, positions, np.square(frequencies * idf))
+            np.add.at(doc_token_lengths, positions, frequencies)
+
+        doc_vector_lengths = np.sqrt(doc_vector_lengths)
+
+        # The largest normalized weight of a term bounds its contribution to any document's
+        # score, which lets top-k retrieval stop scoring early
+        max_scores = []
 
         with open(inverted_file, "wb") as f:
             # This variable tracks the offset within the index file
             offset = 0
 
-            for i in range(len(terms)):
-                term = terms[i]
-
-                terms.append(term)
-                doc_frequencies.append(self.index[term]["num_docs"])
+            for (doc_ids, frequencies), idf in zip(postings, idfs):
                 offsets.append(offset)
 
-                postings_list = self.index[term]["postings_list"]
-                doc_frequency = len(postings_list) - 1
-                idf = np.log2(self.num_docs / doc_frequency)
-                idfs.append(idf)
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    lengths = doc_vector_lengths[np.searchsorted(collection_doc_ids, doc_ids)]
+                    weights = frequencies * idf / lengths
+                weights = stored_weights(np.nan_to_num(weights), encoding)
+                max_scores.append(weights.max())
 
-                for posting in postings_list.keys():
-                    if posting == "size":
-                        continue
+                buffer = encode_postings_list(doc_ids, frequencies, weights, byte_order, encoding)
+                f.write(buffer)
 
-                    doc_id = int(posting)
+                offset += len(buffer)
 
-                    frequency = postings_list[posting]
-                    doc_vector_lengths[doc_id - 1] += np.square(frequency * idf)
-
-                    f.write(doc_id.to_bytes(4, byte_order))
-                    f.write(frequency.to_bytes(4, byte_order))
-
-                    offset += 8
-
-        doc_vector_lengths = np.sqrt(doc_vector_lengths)
+        import pandas as pd
 
         doc_lengths_df = pd.DataFrame(
-            zip(list(range(1, self.num_docs + 1)), doc_vector_lengths),
-            columns=["doc_id", "euclidean_length"],
+            zip(collection_doc_ids, doc_vector_lengths, doc_token_lengths),
+            columns=["doc_id", "euclidean_length", "token_length"],
         )
         doc_lengths_df.to_csv(document_length_file, index=False)
 
         df = pd.DataFrame(
-            zip(terms, doc_frequencies, idfs, offsets),
-            columns=["term", "document_frequency", "inverse_document_frequency", "offset"],
+            zip(terms, doc_frequencies, idfs, offsets, max_scores, collection_frequencies),
+            columns=[
+                "term",
+                "document_frequency",
+                "inverse_document_frequency",
+                "offset",
+                "max_score",
+                "collection_frequency",
+            ],
         )
+        df["encoding"] = encoding
         df.to_csv(lexicon_file, index=False)
 
+        # A binary copy of the lexicon and document statistics lets the index load quickly
+        term_dictionary = TermDictionary(
+            terms,
+            doc_frequencies,
+            idfs,
+            offsets,
+            np.diff(offsets, append=offset),
+            max_scores,
+            [encoding] * len(terms),
+            collection_frequencies,
+        )
+        write_statistics_file(
+            statistics_file_name(lexicon_file),
+            term_dictionary,
+            collection_doc_ids,
+            doc_vector_lengths,
+            doc_token_lengths,
+        )
+
         return lexicon_file, inverted_file, document_length_file
 
+    @staticmethod
+    def read_postings(
+        index_file: str,
+        entry: TermEntry,
+        byte_order: str = "big",
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Read the postings list of a term from an inverted file.
+
+        :param index_file: The name of the index file
+        :param entry: The lexicon entry of the term
+        :param byte_order: The ordering of the bytes used within the inverted file
+            (either big or little)
+        :return: A tuple of document IDs and term frequencies
+        """
+        with open(index_file, "rb") as f:
+            f.seek(entry.offset)
+            buffer = f.read(entry.length)
+
+        return decode_postings(buffer, byte_order, entry.encoding)
+
     @staticmethod
     def extract_information(
         lexicon_file: str,
@@ -136,7 +367,7 @@ class InvertedIndex:
         terms: List[str],
         processor: Processor,
         byte_order: str = "big",
-    ) -> Dict[str, pd.DataFrame]:
+    ) -> Dict[str, "pd.DataFrame"]:
         """Extract information about a term or terms.
 
         :param lexicon_file: The name of the lexicon file
@@ -148,7 +379,9 @@ class InvertedIndex:
         :return: A dictionary of terms as keys and DataFrames of document IDs and their
             term frequencies as values
         """
-        lexicon = pd.read_csv(lexicon_file)
+        import pandas as pd
+
+        term_dictionary = TermDictionary.from_files(lexicon_file, index_file)
 
         results = {}
 
@@ -159,33 +392,13 @@ class InvertedIndex:
             if processed_word is None:
                 continue
 
-            # These variables are used to generate summary DataFrames for each term
-            doc_ids = []
-            frequencies = []
+            entry = term_dictionary.lookup(processed_word)
 
-            row = lexicon[lexicon["term"] == processed_word]
-
-            if row.shape[0] == 0:
+            if entry is None:
                 logger.info(f"The term '{term}' was not found in the index")
                 continue
 
-            next_row = lexicon.loc[row.index + 1]
-
-            offset = row.iloc[0, 2]
-            num_bytes = next_row.iloc[0, 2] - row.iloc[0, 2]
-
-            with open(index_file, "rb") as f:
-                f.seek(offset)
-
-                for _ in range(int(num_bytes / 8)):
-                    doc_id_raw = f.read(4)
-                    doc_id = int.from_bytes(doc_id_raw, byte_order)
-
-                    frequency_raw = f.read(4)
-                    frequency = int.from_bytes(frequency_raw, byte_order)
-
-                    doc_ids.append(doc_id)
-                    frequencies.append(frequency)
+            doc_ids, frequencies = InvertedIndex.read_postings(index_file, entry, byte_order)
 
             df = pd.DataFrame(zip(doc_ids, frequencies), columns=["doc_id", "frequency"])
             results[term] = df
@@ -199,6 +412,7 @@ class InvertedIndex:
         query_terms: List[str],
         num_docs: int,
         byte_order: str = "big",
+        doc_ids: Optional[np.ndarray] = None,
     ) -> Tuple[np.array, np.array]:
         """Calculate the tf-idf matrix for a given set of documents and query terms.
 
@@ -208,44 +422,33 @@ class InvertedIndex:
         :param num_docs: The total number of documents in the collection
         :param byte_order: The ordering of the bytes used within the inverted file
             (either big or little)
+        :param doc_ids: The sorted IDs of the documents, one per column, which default to
+            1 to num_docs
 
         :return: A tuple of the calculated tf-idf matrix and the idf weights for each document
         """
-        lexicon = pd.read_csv(lexicon_file)
+        term_dictionary = TermDictionary.from_files(lexicon_file, index_file)
         num_terms = len(query_terms)
 
-        tf_idfs = np.zeros((num_terms, num_docs))
+        if doc_ids is None:
+            doc_ids = np.arange(1, num_docs + 1)
+
+        tf_idfs = np.zeros((num_terms, len(doc_ids)))
         idfs = np.zeros((1, num_terms))
 
         for i in range(len(query_terms)):
             term = query_terms[i]
 
-            row = lexicon[lexicon["term"] == term]
+            entry = term_dictionary.lookup(term)
 
-            if row.shape[0] == 0:
+            if entry is None:
                 logger.info(f"The term '{term}' was not found in the index")
                 continue
 
-            next_row = lexicon.loc[row.index + 1]
-
-            offset = row.iloc[0, 3]
-            num_bytes = next_row.iloc[0, 3] - row.iloc[0, 3]
-
-            doc_frequency = 0
-            with open(index_file, "rb") as f:
-                f.seek(offset)
+            postings_doc_ids, tfs = InvertedIndex.read_postings(index_file, entry, byte_order)
+            tf_idfs[i, np.searchsorted(doc_ids, postings_doc_ids)] = tfs
 
-                for _ in range(int(num_bytes / 8)):
-                    doc_id_raw = f.read(4)
-                    doc_id = int.from_bytes(doc_id_raw, byte_order)
-
-                    frequency_raw = f.read(4)
-                    tf = int.from_bytes(frequency_raw, byte_order)
-
-                    doc_frequency += 1
-                    tf_idfs[i, doc_id - 1] = tf
-
-            idf = lexicon[lexicon["term"] == term]["inverse_document_frequency"].values[0]
+            idf = entry.inverse_document_frequency
 
             idfs[0][i] = idf
             tf_idfs[i] = tf_idfs[i] * idf
@@ -260,11 +463,12 @@ class InvertedIndex:
         query: List[str],
         byte_order: str = "big",
         verbose: bool = False,
-    ) -> pd.DataFrame:
+    ) -> "pd.DataFrame":
         """Calculate cosine similarity.
 
         This method calculates cosine similarity between a given query and documents in a
-        pre-computed index file.
+        pre-computed index file. Scores are only accumulated for documents that appear in
+        the postings of at least one query term.
 
         :param lexicon_file: The name of the lexicon file
         :param index_file: The name of the index file
@@ -273,40 +477,47 @@ class InvertedIndex:
         :param byte_order: The ordering of the bytes used within the inverted file
             (either big or little)
         :param verbose: Whether or not to print the query weights
-        :return: A DataFrame of cosine similarity scores
+        :return: A DataFrame of cosine similarity scores for the documents containing at
+            least one query term
         """
+        import pandas as pd
+
         # Calculate unique terms and their frequencies in the query
         query_counter = Counter(query)
-        num_terms = len(query_counter.keys())
 
-        # Calculate total number of documents in the collection
+        term_dictionary = TermDictionary.from_files(lexicon_file, index_file)
         doc_lengths = pd.read_csv(doc_length_file)
-        num_docs = doc_lengths["doc_id"].max()
 
-        # Calculate tf-idf for collection
-        query_terms = list(query_counter.keys())
-        tf_idfs, idfs = self.tf_idf(lexicon_file, index_file, query_terms, num_docs, byte_order)
+        query_terms = []
+        postings = []
+        idfs = []
+        query_tfs = []
+
+        for term, query_tf in query_counter.items():
+            entry = term_dictionary.lookup(term)
 
-        # Calculate query tf-idf
-        query_tf_idf = np.array(list(query_counter.values())).reshape((num_terms, 1))
-        query_tf_idf = idfs.T * query_tf_idf
-        query_tf_idf = query_tf_idf.reshape((num_terms,))
+            if entry is None:
+                logger.info(f"The term '{term}' was not found in the index")
+                continue
+
+            query_terms.append(term)
+            postings.append(self.read_postings(index_file, entry, byte_order))
+            idfs.append(entry.inverse_document_frequency)
+            query_tfs.append(query_tf)
 
         if verbose:
             query_df = pd.DataFrame(
-                zip(query_terms, query_tf_idf), columns=["term", "tf_idf_weight"]
+                zip(query_terms, np.array(idfs) * np.array(query_tfs)),
+                columns=["term", "tf_idf_weight"],
             )
             logger.info(query_df)
 
-        # Calculate query vector length
-        query_length = np.linalg.norm(query_tf_idf)
-
-        # Transform document vector lengths
-        doc_lengths_vector = doc_lengths["euclidean_length"].values
-
-        # Finally, calculate cosine similarity
-        similarity = np.dot(query_tf_idf.T, tf_idfs) / (query_length * doc_lengths_vector)
-        similarity[np.isnan(similarity)] = 0
+        doc_ids, scores = cosine_scores(
+            postings,
+            np.array(idfs),
+            np.array(query_tfs),
+            doc_lengths["doc_id"].values,
+            doc_lengths["euclidean_length"].values,
+        )
 
-        ids = np.array(range(len(similarity))) + 1
-        return pd.DataFrame(zip(ids, similarity), columns=["doc_id", "cosine_score"])
+        return pd.DataFrame(zip(doc_ids, scores), columns=["doc_id", "cosine_score"])
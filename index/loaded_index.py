@@ -0,0 +1,664 @@
+from collections import Counter
+from datetime import datetime
+import logging
+import mmap
+import os
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from index.positions import (
+    intersect_doc_ids,
+    phrase_starts,
+    positions_file_name,
+    read_positions_file,
+    within_distance,
+)
+from index.postings import (
+    IMPACT_BITS,
+    RAW_ENCODING,
+    decode_indexed_doc_ids,
+    decode_postings,
+    decode_weighted_postings,
+)
+from index.postings_cache import PostingsCache
+from index.query_parser import And, BooleanQuery, Not, Or, ParsedQuery, Phrase, Term
+from index.scoring import (
+    accumulate_scores,
+    lookup_doc_lengths,
+    max_score_top_k,
+    normalized_weights,
+    select_top_k,
+)
+from index.scorers import CollectionStatistics, CosineScorer, Scorer
+from index.statistics_file import read_statistics, statistics_file_name
+from index.term_dictionary import TermDictionary, TermEntry, read_lexicon
+from logging_tools.metrics import metrics
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+    from index.sharding import GlobalStatistics
+
+
+logger = logging.getLogger(__name__)
+
+
+def touch_pages(array: np.ndarray) -> int:
+    """Read a byte of every page of an array, which pages in a memory-mapped array.
+
+    :param array: A contiguous array
+    :return: The number of bytes of the array
+    """
+    data = array.reshape(-1).view(np.uint8)
+
+    if len(data) > 0:
+        int(data[:: mmap.PAGESIZE].sum())
+
+    return len(data)
+
+
+class LoadedIndex:
+    """A pre-computed index held resident in memory for repeated querying.
+
+    The lexicon, inverse document frequencies and document lengths are parsed once when
+    the instance is created, while the inverted file is memory-mapped so that a query
+    only touches the pages holding the postings of its own terms.
+    """
+
+    def __init__(
+        self,
+        lexicon_file: str,
+        inverted_file: str,
+        document_length_file: str,
+        byte_order: str = "big",
+        timestamp: Optional[datetime] = None,
+        postings_cache: Optional[PostingsCache] = None,
+        global_statistics: Optional["GlobalStatistics"] = None,
+    ) -> None:
+        """Initialize the LoadedIndex instance.
+
+        :param lexicon_file: The name of the lexicon file
+        :param inverted_file: The name of the inverted file
+        :param document_length_file: The name of the document length file
+        :param byte_order: The ordering of the bytes used within the inverted file
+            (either big or little)
+        :param timestamp: The timestamp of the index files, used to detect newer indexes
+        :param postings_cache: A cache of the decoded postings lists of frequently queried
+            terms, shared by concurrent queries
+        :param global_statistics: The statistics of the whole collection, when the index is
+            a shard of it, which rank the shard's documents as they would be ranked within
+            a single index of the collection
+        """
+        self.lexicon_file = lexicon_file
+        self.inverted_file = inverted_file
+        self.document_length_file = document_length_file
+        self.byte_order = byte_order
+        self.timestamp = timestamp
+        self.postings_cache = postings_cache
+        self.global_statistics = global_statistics
+
+        inverted_file_size = os.path.getsize(inverted_file)
+        statistics_file = statistics_file_name(lexicon_file)
+
+        # The binary statistics file is mapped in place rather than parsed, when it exists
+        if os.path.exists(statistics_file):
+            self.term_dictionary, documents = read_statistics(statistics_file)
+            self.doc_ids = documents.doc_ids
+            self.doc_lengths = documents.euclidean_lengths
+            token_lengths = documents.token_lengths
+            total_tokens = documents.total_tokens
+        else:
+            # pandas is only imported to parse the CSV files of older indexes, since it is
+            # slow to import
+            import pandas as pd
+
+            self.term_dictionary = TermDictionary.from_dataframe(
+                read_lexicon(lexicon_file), inverted_file_size
+            )
+
+            doc_lengths = pd.read_csv(document_length_file)
+            self.doc_ids = doc_lengths["doc_id"].values.astype(np.int64)
+            self.doc_lengths = doc_lengths["euclidean_length"].values.astype(np.float64)
+
+            # Document token lengths are only recorded by newer builds
+            if "token_length" in doc_lengths.columns:
+                token_lengths = doc_lengths["token_length"].values.astype(np.int64)
+                total_tokens = int(token_lengths.sum())
+            else:
+                token_lengths = None
+                total_tokens = 0
+
+        self.num_docs = len(self.doc_ids)
+
+        # A shard's documents are ranked with the statistics of the whole collection
+        if global_statistics is not None:
+            collection_docs = global_statistics.num_docs
+            total_tokens = global_statistics.total_tokens
+        else:
+            collection_docs = self.num_docs
+
+        self.statistics = CollectionStatistics(
+            collection_docs,
+            self.doc_ids,
+            token_lengths,
+            total_tokens,
+            total_tokens / collection_docs if collection_docs > 0 else 0.0,
+        )
+
+        # Only indexes built with a PositionalInvertedIndex have positions
+        self.positions_file = read_positions_file(positions_file_name(lexicon_file), byte_order)
+
+        # An empty file cannot be memory-mapped
+        if inverted_file_size > 0:
+            self.postings_map = np.memmap(inverted_file, dtype=np.uint8, mode="r")
+        else:
+            self.postings_map = np.zeros((0,), dtype=np.uint8)
+
+        logger.info(
+            "Loaded index with %d terms and %d documents", len(self.term_dictionary), self.num_docs
+        )
+
+    def warm_up(self, num_terms: int) -> Dict[str, float]:
+        """Read the term dictionary and the most frequent postings before the first queries.
+
+        Pages of the memory-mapped files are otherwise read from disk by the first queries
+        that touch them. Postings are decoded into the postings cache, if there is one.
+
+        :param num_terms: The number of terms, by descending document frequency, whose
+            postings are read
+        :return: The number of terms read, the bytes touched and the seconds taken
+        """
+        start = time.perf_counter()
+
+        arrays = self.term_dictionary.arrays() + [self.doc_ids, self.doc_lengths]
+        touched = sum(touch_pages(array) for array in arrays)
+
+        doc_frequencies = np.asarray(self.term_dictionary.doc_frequencies)
+        most_frequent = np.argsort(-doc_frequencies, kind="stable")[:num_terms]
+
+        for position in most_frequent.tolist():
+            entry = self.term_dictionary.entry(position)
+            self.read_weighted_postings(entry)
+            touched += entry.length
+
+        seconds = time.perf_counter() - start
+        metrics.observe("warm_up", seconds)
+        logger.info(
+            "Warmed up %d terms and %d bytes in %.2fs", len(most_frequent), touched, seconds
+        )
+
+        return {"terms": len(most_frequent), "bytes": touched, "seconds": seconds}
+
+    def lookup(self, term: str) -> Optional[TermEntry]:
+        """Look up a query term, including terms of the collection missing from a shard.
+
+        A term found elsewhere in the collection has an entry with an empty postings list,
+        so it still counts towards the query's weights as it would in a single index.
+
+        :param term: The processed term to look up
+        :return: The term's lexicon entry, or None if the term is not in the collection
+        """
+        entry = self.term_dictionary.lookup(term)
+
+        if entry is not None or self.global_statistics is None:
+            return entry
+
+        entry = self.global_statistics.term_dictionary.lookup(term)
+
+        if entry is None:
+            return None
+
+        # Negative term IDs keep the empty postings apart from the shard's own in the cache
+        return entry._replace(
+            term_id=-1 - entry.term_id, offset=0, length=0, max_score=0.0, encoding=RAW_ENCODING
+        )
+
+    def postings(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Read the postings list of a processed term.
+
+        :param term: The processed term to look up
+        :return: A tuple of document IDs and term frequencies, or None if the term is not
+            in the index
+        """
+        entry = self.term_dictionary.lookup(term)
+
+        if entry is None:
+            return None
+
+        return self.read_postings(entry)
+
+    def read_postings(
+        self, entry: TermEntry, candidates: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Read the postings list of a term from the memory-mapped inverted file.
+
+        :param entry: The lexicon entry of the term
+        :param candidates: Sorted document IDs of interest, which lets compressed postings
+            skip blocks that cannot contain them; other documents may still be returned
+        :return: A tuple of document IDs and term frequencies
+        """
+        buffer = self.postings_map[entry.offset : entry.offset + entry.length]
+
+        with metrics.timer("postings_decode", encoding=entry.encoding):
+            doc_ids, tfs = decode_postings(buffer, self.byte_order, entry.encoding, candidates)
+
+        metrics.increment("postings_decoded", len(doc_ids))
+
+        return doc_ids, tfs
+
+    def document_weights(
+        self, entry: TermEntry, doc_ids: np.ndarray, tfs: np.ndarray
+    ) -> np.ndarray:
+        """Calculate the normalized weight of a term within the documents of its postings.
+
+        :param entry: The lexicon entry of the term
+        :param doc_ids: The document IDs of the postings
+        :param tfs: The term frequency of each posting
+        :return: The tf-idf weight of the term in each document, divided by the document's
+            Euclidean length
+        """
+        with metrics.timer("document_weights"):
+            doc_lengths = lookup_doc_lengths(doc_ids, self.doc_ids, self.doc_lengths)
+            return normalized_weights(tfs, entry.inverse_document_frequency, doc_lengths)
+
+    def read_weighted_postings(
+        self, entry: TermEntry, candidates: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, Optional[np.ndarray], np.ndarray]:
+        """Read the postings list of a term along with its normalized document weights.
+
+        Complete lists are kept in the postings cache, if there is one, in which case the
+        candidates are ignored.
+
+        :param entry: The lexicon entry of the term
+        :param candidates: Sorted document IDs of interest, which lets compressed postings
+            skip blocks that cannot contain them; other documents may still be returned
+        :return: A tuple of document IDs, term frequencies and document weights, where the
+            term frequencies are None for impact-scored postings
+        """
+        if self.postings_cache is None:
+            return self.__decode_weighted_postings(entry, candidates)
+
+        def load() -> Tuple[np.ndarray, Optional[np.ndarray], np.ndarray]:
+            weighted_postings = self.__decode_weighted_postings(entry)
+
+            # Cached arrays are shared by concurrent queries
+            for array in weighted_postings:
+                if array is not None:
+                    array.flags.writeable = False
+
+            return weighted_postings
+
+        return self.postings_cache.get_or_load(entry.term_id, load)
+
+    def __decode_weighted_postings(
+        self, entry: TermEntry, candidates: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, Optional[np.ndarray], np.ndarray]:
+        """Decode a postings list and find its normalized document weights.
+
+        :param entry: The lexicon entry of the term
+        :param candidates: Sorted document IDs of interest
+        :return: A tuple of document IDs, term frequencies and document weights
+        """
+        if entry.encoding in IMPACT_BITS:
+            doc_ids, weights = self.read_impacts(entry)
+            return doc_ids, None, weights
+
+        doc_ids, tfs = self.read_postings(entry, candidates)
+        return doc_ids, tfs, self.document_weights(entry, doc_ids, tfs)
+
+    def read_doc_ids(self, entry: TermEntry, candidates: Optional[np.ndarray] = None) -> np.ndarray:
+        """Read the document IDs of a term's postings without finding their weights.
+
+        :param entry: The lexicon entry of the term
+        :param candidates: Sorted document IDs of interest, which lets compressed postings
+            skip blocks that cannot contain them; other documents may still be returned
+        :return: The sorted document IDs
+        """
+        if entry.encoding in IMPACT_BITS:
+            return self.read_impacts(entry)[0]
+
+        return self.read_postings(entry, candidates)[0]
+
+    def read_indexed_doc_ids(
+        self, entry: TermEntry, candidates: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Read the document IDs of a term's postings with their indices within the list.
+
+        :param entry: The lexicon entry of the term
+        :param candidates: Sorted document IDs of interest, see read_doc_ids
+        :return: A tuple of the sorted document IDs and their indices within the postings
+        """
+        buffer = self.postings_map[entry.offset : entry.offset + entry.length]
+
+        with metrics.timer("postings_decode", encoding=entry.encoding):
+            doc_ids, posting_indices = decode_indexed_doc_ids(
+                buffer, self.byte_order, entry.encoding, candidates
+            )
+
+        metrics.increment("postings_decoded", len(doc_ids))
+
+        return doc_ids, posting_indices
+
+    def read_impacts(self, entry: TermEntry) -> Tuple[np.ndarray, np.ndarray]:
+        """Read the impact-scored postings list of a term from the memory-mapped inverted file.
+
+        :param entry: The lexicon entry of the term
+        :return: A tuple of document IDs and their dequantized weights
+        """
+        buffer = self.postings_map[entry.offset : entry.offset + entry.length]
+
+        with metrics.timer("postings_decode", encoding=entry.encoding):
+            doc_ids, weights = decode_weighted_postings(buffer, self.byte_order, entry.encoding)
+
+        metrics.increment("postings_decoded", len(doc_ids))
+
+        return doc_ids, weights
+
+    def boolean_documents(
+        self, query: Optional[BooleanQuery], candidates: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """Find the documents matching a Boolean query.
+
+        The operands of AND are evaluated from the rarest to the most common, and each
+        operand only looks for the documents that matched the operands before it, which
+        lets compressed postings skip the blocks holding none of them.
+
+        :param query: The parsed Boolean query, where None matches no documents
+        :param candidates: Sorted document IDs to which the result is restricted
+        :return: The sorted IDs of the matching documents
+        """
+        if query is None:
+            return np.zeros((0,), dtype=np.int64)
+
+        if isinstance(query, Term):
+            entry = self.term_dictionary.lookup(query.term)
+
+            if entry is None:
+                return np.zeros((0,), dtype=np.int64)
+
+            doc_ids = self.read_doc_ids(entry, candidates)
+            return doc_ids if candidates is None else intersect_doc_ids([candidates, doc_ids])
+
+        if isinstance(query, Phrase):
+            matches = self.matching_documents(ParsedQuery(query.terms, [query.terms], []))
+            return matches if candidates is None else intersect_doc_ids([candidates, matches])
+
+        if isinstance(query, Or):
+            operands = [self.boolean_documents(operand, candidates) for operand in query.operands]
+            return np.unique(np.concatenate(operands))
+
+        if isinstance(query, Not):
+            universe = self.doc_ids if candidates is None else candidates
+            excluded = self.boolean_documents(query.operand, universe)
+            return np.setdiff1d(universe, excluded, assume_unique=True)
+
+        positive = [operand for operand in query.operands if not isinstance(operand, Not)]
+        negative = [operand.operand for operand in query.operands if isinstance(operand, Not)]
+
+        for operand in sorted(positive, key=self.estimate_matches):
+            candidates = self.boolean_documents(operand, candidates)
+
+            if len(candidates) == 0:
+                return candidates
+
+        if candidates is None:
+            candidates = self.doc_ids
+
+        for operand in negative:
+            excluded = self.boolean_documents(operand, candidates)
+            candidates = np.setdiff1d(candidates, excluded, assume_unique=True)
+
+        return candidates
+
+    def estimate_matches(self, query: BooleanQuery) -> int:
+        """Estimate the number of documents matching a Boolean query from its terms.
+
+        :param query: The parsed Boolean query
+        :return: An upper bound of the number of matching documents
+        """
+        if isinstance(query, (Term, Phrase)):
+            terms = [query.term] if isinstance(query, Term) else query.terms
+            entries = [self.term_dictionary.lookup(term) for term in terms]
+
+            return min(0 if entry is None else entry.document_frequency for entry in entries)
+
+        if isinstance(query, Or):
+            return sum(self.estimate_matches(operand) for operand in query.operands)
+
+        if isinstance(query, And):
+            return min(self.estimate_matches(operand) for operand in query.operands)
+
+        return len(self.doc_ids)
+
+    def matching_documents(self, parsed_query: ParsedQuery) -> np.ndarray:
+        """Find the documents satisfying the phrases and proximity operators of a query.
+
+        The document IDs of the constrained terms are intersected first, from the rarest
+        term to the most common, and each term only looks for the documents containing the
+        terms before it, which lets compressed postings skip blocks. Positions are then only
+        decoded for the documents containing every term.
+
+        :param parsed_query: The parsed query
+        :return: The sorted IDs of the matching documents
+        """
+        if self.positions_file is None:
+            raise ValueError("Phrase and proximity queries need an index built with positions")
+
+        constrained_terms = {term for phrase in parsed_query.phrases for term in phrase}
+        for proximity in parsed_query.proximities:
+            constrained_terms.update(proximity.left + proximity.right)
+
+        entries = {term: self.term_dictionary.lookup(term) for term in constrained_terms}
+
+        if not entries or any(entry is None for entry in entries.values()):
+            return np.zeros((0,), dtype=np.int64)
+
+        candidates = None
+        postings = {}
+
+        for term, entry in sorted(entries.items(), key=lambda item: item[1].document_frequency):
+            doc_ids, posting_indices = self.read_indexed_doc_ids(entry, candidates)
+            postings[term] = (doc_ids, posting_indices)
+
+            if candidates is None:
+                candidates = doc_ids
+            else:
+                candidates = intersect_doc_ids([candidates, doc_ids])
+
+            if len(candidates) == 0:
+                return candidates
+
+        # The positions of each term within each candidate document, found by the index of
+        # the candidate within the term's postings, as blocks may have been skipped
+        with metrics.timer("positions_decode"):
+            positions = {}
+
+            for term, entry in entries.items():
+                doc_ids, posting_indices = postings[term]
+                posting_indices = posting_indices[np.searchsorted(doc_ids, candidates)]
+                positions[term] = self.positions_file.positions(entry.term_id, posting_indices)
+
+        def starts(phrase: List[str], position: int) -> np.ndarray:
+            return phrase_starts([positions[term][position] for term in phrase])
+
+        matches = []
+
+        for position, doc_id in enumerate(candidates.tolist()):
+            if any(len(starts(phrase, position)) == 0 for phrase in parsed_query.phrases):
+                continue
+
+            if all(
+                within_distance(
+                    starts(proximity.left, position),
+                    len(proximity.left),
+                    starts(proximity.right, position),
+                    len(proximity.right),
+                    proximity.distance,
+                )
+                for proximity in parsed_query.proximities
+            ):
+                matches.append(doc_id)
+
+        return np.array(matches, dtype=np.int64)
+
+    def idf(self, term: str) -> float:
+        """Find the inverse document frequency of a processed term.
+
+        :param term: The processed term to look up
+        :return: The inverse document frequency, or 0 if the term is not in the index
+        """
+        entry = self.lookup(term)
+        return 0.0 if entry is None else entry.inverse_document_frequency
+
+    def cosine_similarity(self, query: List[str], verbose: bool = False) -> "pd.DataFrame":
+        """Calculate cosine similarity between a query and the resident index.
+
+        :param query: The tokenized query against which to calculate cosine similarity
+        :param verbose: Whether or not to print the query weights
+        :return: A DataFrame of cosine similarity scores for the documents containing at
+            least one query term
+        """
+        import pandas as pd
+
+        # Calculate unique terms and their frequencies in the query
+        query_counter = Counter(query)
+
+        query_terms = []
+        postings = []
+        idfs = []
+        query_tfs = []
+
+        for term, query_tf in query_counter.items():
+            with metrics.timer("lexicon_lookup"):
+                entry = self.lookup(term)
+
+            if entry is None:
+                logger.info(f"The term '{term}' was not found in the index")
+                metrics.increment("terms_not_found")
+                continue
+
+            query_terms.append(term)
+            postings.append(self.read_weighted_postings(entry))
+            idfs.append(entry.inverse_document_frequency)
+            query_tfs.append(query_tf)
+
+        if verbose:
+            query_df = pd.DataFrame(
+                zip(query_terms, np.array(idfs) * np.array(query_tfs)),
+                columns=["term", "tf_idf_weight"],
+            )
+            logger.info(query_df)
+
+        query_tf_idf = np.array(query_tfs) * np.array(idfs)
+        query_length = np.linalg.norm(query_tf_idf)
+
+        # Each posting contributes the product of the normalized query and document weights
+        doc_id_lists = [doc_ids for doc_ids, _, _ in postings]
+        weight_lists = [
+            weights * (query_weight / query_length if query_length > 0 else 0.0)
+            for (_, _, weights), query_weight in zip(postings, query_tf_idf)
+        ]
+
+        with metrics.timer("scoring"):
+            doc_ids, scores = accumulate_scores(doc_id_lists, weight_lists)
+
+        return pd.DataFrame(zip(doc_ids, scores), columns=["doc_id", "cosine_score"])
+
+    def top_k(
+        self,
+        query: List[str],
+        k: int,
+        offset: int = 0,
+        decoded: Optional[Dict[int, Tuple[np.ndarray, Optional[np.ndarray], np.ndarray]]] = None,
+        scorer: Optional[Scorer] = None,
+        documents: Optional[np.ndarray] = None,
+    ) -> List[Tuple[int, float]]:
+        """Find the documents with the highest scores for a query.
+
+        Only the best offset + k documents are selected. Models with bounded contributions,
+        such as cosine similarity, use the maximum term scores to stop scoring documents
+        that cannot reach them.
+
+        :param query: The tokenized query to score documents against
+        :param k: The number of documents to return
+        :param offset: The number of best documents to skip, for pagination
+        :param decoded: Postings lists that are already decoded with their document weights,
+            keyed by term ID, which lets a batch of queries decode their common terms once
+        :param scorer: The ranking model, which defaults to cosine similarity
+        :param documents: The sorted IDs of the only documents that may be returned, such as
+            those matching the phrases of the query
+        :return: A list of document IDs and their scores, best first
+        """
+        scorer = scorer or CosineScorer()
+        query_counter = Counter(query)
+
+        entries = []
+        query_tfs = []
+
+        for term, query_tf in query_counter.items():
+            with metrics.timer("lexicon_lookup"):
+                entry = self.lookup(term)
+
+            if entry is None:
+                logger.info(f"The term '{term}' was not found in the index")
+                metrics.increment("terms_not_found")
+                continue
+
+            entries.append(entry)
+            query_tfs.append(query_tf)
+
+        query_tfs = np.array(query_tfs, dtype=np.int64)
+        query_weights = scorer.query_weights(entries, query_tfs, self.statistics)
+
+        def fetch_contributions(
+            position: int, candidates: Optional[np.ndarray]
+        ) -> Tuple[np.ndarray, np.ndarray]:
+            entry = entries[position]
+
+            # Candidates of MaxScore are always a subset of the allowed documents
+            if candidates is None:
+                candidates = documents
+
+            if decoded is not None and entry.term_id in decoded:
+                doc_ids, tfs, weights = decoded[entry.term_id]
+            else:
+                doc_ids, tfs, weights = self.read_weighted_postings(entry, candidates)
+
+            if candidates is not None:
+                in_candidates = np.isin(doc_ids, candidates, assume_unique=True)
+                doc_ids = doc_ids[in_candidates]
+                tfs = tfs[in_candidates] if tfs is not None else None
+                weights = weights[in_candidates]
+
+            with metrics.timer("scoring"):
+                contributions = scorer.score_postings(
+                    entry, query_weights[position], doc_ids, tfs, weights, self.statistics
+                )
+
+            return doc_ids, contributions
+
+        if scorer.prunable:
+            upper_bounds = scorer.upper_bounds(entries, query_weights, self.statistics)
+
+            # MaxScore interleaves selection with fetching postings, so this also covers
+            # the decoding and scoring it triggers, which are recorded separately too
+            with metrics.timer("top_k_selection", pruned="true"):
+                doc_ids, scores = max_score_top_k(upper_bounds, fetch_contributions, offset + k)
+        else:
+            contributions = [
+                fetch_contributions(position, None) for position in range(len(entries))
+            ]
+
+            with metrics.timer("scoring"):
+                doc_ids, scores = accumulate_scores(
+                    [doc_ids for doc_ids, _ in contributions],
+                    [scores for _, scores in contributions],
+                )
+                scores = scorer.adjust_scores(doc_ids, scores, query_tfs, self.statistics)
+
+            with metrics.timer("top_k_selection", pruned="false"):
+                doc_ids, scores = select_top_k(doc_ids, scores, offset + k)
+
+        return list(zip(doc_ids[offset:].tolist(), scores[offset:].tolist()))
@@ -0,0 +1,139 @@
+from array import array
+from typing import TYPE_CHECKING, Optional, Tuple
+
+import numpy as np
+
+from index.compact_index import CompactInvertedIndex
+from index.inverted_index import InvertedIndex
+from index.positions import encode_positions, positions_file_name, write_positions_file
+from index.postings import RAW_ENCODING
+
+if TYPE_CHECKING:
+    from index.sharding import GlobalStatistics
+
+
+class PositionalInvertedIndex(CompactInvertedIndex):
+    """Builds an inverted index that also records where each term occurs in each document.
+
+    The positions are written to a separate positions file next to the other index files,
+    which are identical to those of CompactInvertedIndex, so an index built with positions
+    can still be queried by code that ignores them.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the PositionalInvertedIndex instance."""
+        super().__init__()
+
+        # The positions of each term in the order of its postings, indexed by term ID
+        self.positions = []
+        self.current_document = None
+        self.next_position = 0
+
+    def add_word(self, document_id: int, word: str, position: Optional[int] = None) -> None:
+        """Add a word to the index.
+
+        :param document_id: The ID of the document being processed
+        :param word: The word to be added
+        :param position: The position of the word within the document's tokens, which
+            defaults to the position following that of the previous word
+        :return: None
+        """
+        if document_id != self.current_document:
+            self.current_document = document_id
+            self.next_position = 0
+
+        if position is None:
+            position = self.next_position
+
+        super().add_word(document_id, word)
+        self.__term_positions(word).append(position)
+        self.next_position = position + 1
+
+    def __term_positions(self, word: str) -> array:
+        """Find the positions array of a term that has been interned.
+
+        :param word: The term
+        :return: The positions of the term
+        """
+        term_id = self.term_ids[word]
+
+        while len(self.positions) <= term_id:
+            self.positions.append(array("I"))
+
+        return self.positions[term_id]
+
+    def merge(self, other: InvertedIndex) -> None:
+        """Merge the positional index of the next batch of documents into this index.
+
+        :param other: A positional index of documents following those already added
+        :return: None
+        """
+        if not isinstance(other, PositionalInvertedIndex):
+            raise ValueError("Only positional indexes can be merged into a positional index")
+
+        super().merge(other)
+
+        for term, term_positions in zip(other.terms, other.positions):
+            self.__term_positions(term).extend(term_positions)
+
+    def yield_positions(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Yields the positions and term frequencies of every term in lexicon order.
+
+        Documents need not be added in ID order, so the positions of each document are
+        reordered by document ID, as compressed postings are, and are found by the rank of
+        the document among the term's postings whatever their encoding.
+
+        :return: A tuple of a term's positions within each of its documents, concatenated
+            in document ID order, and its term frequencies in the same order
+        """
+        for term_id in range(len(self.terms)):
+            positions = np.frombuffer(self.positions[term_id], dtype=np.uintc).astype(np.int64)
+            frequencies = np.frombuffer(self.postings_frequencies[term_id], dtype=np.uintc)
+            frequencies = frequencies.astype(np.int64)
+            doc_ids = np.frombuffer(self.postings_doc_ids[term_id], dtype=np.uintc)
+
+            if np.any(doc_ids[1:] < doc_ids[:-1]):
+                order = np.argsort(doc_ids, kind="stable")
+                starts = np.cumsum(frequencies) - frequencies
+                frequencies = frequencies[order]
+
+                # Gather the positions of each document from where it was added
+                shifts = starts[order] - (np.cumsum(frequencies) - frequencies)
+                positions = positions[np.arange(len(positions)) + np.repeat(shifts, frequencies)]
+
+            yield positions, frequencies
+
+    def generate_file(
+        self,
+        dataset_name: str,
+        byte_order: str = "big",
+        encoding: str = RAW_ENCODING,
+        output_directory: str = "./output_reports",
+        global_statistics: Optional["GlobalStatistics"] = None,
+    ) -> Tuple[str, str, str]:
+        """Generate lexicon, inverted and positions files.
+
+        :param dataset_name: The name of the dataset
+        :param byte_order: The ordering of the bytes to use within the inverted and
+            positions files (either big or little)
+        :param encoding: The encoding of the postings lists
+        :param output_directory: The directory in which the files are written
+        :param global_statistics: The statistics of the whole collection, when this index is
+            a shard of it
+        :return: A tuple containing the names of the lexicon, inverted and document length
+            files; the positions file is named after the lexicon file
+        """
+        files = super().generate_file(
+            dataset_name, byte_order, encoding, output_directory, global_statistics
+        )
+
+        write_positions_file(
+            positions_file_name(files[0]),
+            (
+                encode_positions(positions, frequencies, byte_order)
+                for positions, frequencies in self.yield_positions()
+            ),
+            byte_order,
+        )
+
+        return files
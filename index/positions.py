@@ -0,0 +1,263 @@
+import os
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+from index.compression import vbyte_decode, vbyte_encode
+
+
+def positions_file_name(lexicon_file: str) -> str:
+    """Find the name of the positions file written alongside a lexicon file.
+
+    :param lexicon_file: The name of the lexicon file
+    :return: The name of the positions file
+    """
+    directory, name = os.path.split(lexicon_file)
+    name = name.replace("_lexicon_", "_positions_").replace(".csv", ".bin")
+
+    return os.path.join(directory, name)
+
+
+def integer_dtype(byte_order: str = "big", size: int = 8) -> np.dtype:
+    """Build the type of the fixed-width integers of a positions file.
+
+    :param byte_order: The ordering of the bytes used within the file (either big or little)
+    :param size: The number of bytes of the integer
+    :return: An unsigned integer dtype
+    """
+    return np.dtype(f"{'>' if byte_order == 'big' else '<'}u{size}")
+
+
+def encode_positions(
+    positions: np.ndarray, frequencies: np.ndarray, byte_order: str = "big"
+) -> bytes:
+    """Encode the positions of a term within each document of its postings list.
+
+    The positions of each document are delta encoded and variable-byte compressed. They are
+    preceded by the compressed byte length of every document's positions, behind a 4-byte
+    length of that table, so the positions of a few documents can be found without
+    decoding the others.
+
+    :param positions: The sorted positions of the term within each document, concatenated
+        in the order of the postings
+    :param frequencies: The term frequency of each posting, i.e. its number of positions
+    :param byte_order: The ordering of the bytes to use within the file (either big or little)
+    :return: The bytes of the positions list
+    """
+    positions = np.asarray(positions, dtype=np.int64)
+    frequencies = np.asarray(frequencies, dtype=np.int64)
+
+    if len(frequencies) == 0:
+        return np.zeros((1,), dtype=integer_dtype(byte_order, 4)).tobytes()
+
+    doc_ends = np.cumsum(frequencies)
+    doc_starts = doc_ends - frequencies
+
+    gaps = np.diff(positions, prepend=0)
+    gaps[doc_starts] = positions[doc_starts]
+    encoded_gaps = vbyte_encode(gaps)
+
+    # Each integer ends with the byte that has its high bit set
+    value_ends = np.flatnonzero(encoded_gaps & 0x80) + 1
+    byte_lengths = np.diff(value_ends[doc_ends - 1], prepend=0)
+    encoded_lengths = vbyte_encode(byte_lengths)
+
+    table_size = np.array([len(encoded_lengths)], dtype=integer_dtype(byte_order, 4))
+
+    return table_size.tobytes() + encoded_lengths.tobytes() + encoded_gaps.tobytes()
+
+
+def decode_positions(
+    buffer, posting_indices: np.ndarray, byte_order: str = "big"
+) -> List[np.ndarray]:
+    """Decode the positions of a term within some documents of its postings list.
+
+    Only the bytes of the selected postings are decoded.
+
+    :param buffer: The bytes of the positions list, e.g. a slice of a memory map
+    :param posting_indices: The positions of the selected documents within the postings list
+    :param byte_order: The ordering of the bytes used within the file (either big or little)
+    :return: The sorted positions of the term within each selected document
+    """
+    encoded = np.frombuffer(buffer, dtype=np.uint8)
+    table_size = int(np.frombuffer(encoded[:4].tobytes(), dtype=integer_dtype(byte_order, 4))[0])
+
+    byte_lengths = vbyte_decode(encoded[4 : 4 + table_size])
+    gaps = encoded[4 + table_size :]
+
+    posting_indices = np.asarray(posting_indices, dtype=np.int64)
+
+    if len(posting_indices) == 0:
+        return []
+
+    byte_ends = np.cumsum(byte_lengths)[posting_indices]
+    sizes = byte_lengths[posting_indices]
+
+    # Gather the bytes of the selected documents into one buffer
+    gathered_ends = np.cumsum(sizes)
+    shifts = np.repeat(byte_ends - gathered_ends, sizes)
+    selected = gaps[np.arange(int(gathered_ends[-1])) + shifts]
+
+    values = vbyte_decode(selected)
+    counts = np.add.reduceat((selected >> 7).astype(np.int64), gathered_ends - sizes)
+
+    # Undo the delta encoding within each document
+    totals = np.cumsum(values)
+    ends = np.cumsum(counts)
+    positions = totals - np.repeat(
+        totals[ends - 1] - np.add.reduceat(values, ends - counts), counts
+    )
+
+    return np.split(positions, ends[:-1])
+
+
+def write_positions_file(
+    positions_file: str, positions_lists: Iterable[bytes], byte_order: str = "big"
+) -> str:
+    """Write encoded positions lists followed by a table of their offsets.
+
+    :param positions_file: The name of the positions file
+    :param positions_lists: The encoded positions list of every term, in lexicon order
+    :param byte_order: The ordering of the bytes to use within the file (either big or little)
+    :return: The name of the positions file
+    """
+    offsets = [0]
+
+    with open(positions_file, "wb") as file:
+        for buffer in positions_lists:
+            file.write(buffer)
+            offsets.append(offsets[-1] + len(buffer))
+
+        # The table of offsets ends with the number of terms, so it can be found from the end
+        table = np.array(offsets + [len(offsets) - 1], dtype=integer_dtype(byte_order))
+        file.write(table.tobytes())
+
+    return positions_file
+
+
+class PositionsFile:
+    """A memory-mapped positions file."""
+
+    def __init__(self, positions_file: str, byte_order: str = "big") -> None:
+        """Initialize the PositionsFile instance.
+
+        :param positions_file: The name of the positions file
+        :param byte_order: The ordering of the bytes used within the file
+            (either big or little)
+        """
+        self.positions_file = positions_file
+        self.byte_order = byte_order
+        self.map = np.memmap(positions_file, dtype=np.uint8, mode="r")
+
+        integer = integer_dtype(byte_order)
+        num_terms = int(np.frombuffer(self.map[-integer.itemsize :].tobytes(), dtype=integer)[0])
+        table_start = len(self.map) - (num_terms + 2) * integer.itemsize
+
+        self.offsets = np.frombuffer(
+            self.map, dtype=integer, count=num_terms + 1, offset=table_start
+        ).astype(np.int64)
+
+    def positions(self, term_id: int, posting_indices: np.ndarray) -> List[np.ndarray]:
+        """Decode the positions of a term within some documents of its postings list.
+
+        :param term_id: The ID of the term, i.e. its position within the lexicon file
+        :param posting_indices: The positions of the selected documents within the postings
+        :return: The sorted positions of the term within each selected document
+        """
+        buffer = self.map[self.offsets[term_id] : self.offsets[term_id + 1]]
+        return decode_positions(buffer, posting_indices, self.byte_order)
+
+
+def read_positions_file(positions_file: str, byte_order: str = "big") -> Optional[PositionsFile]:
+    """Open a positions file if it exists.
+
+    :param positions_file: The name of the positions file
+    :param byte_order: The ordering of the bytes used within the file (either big or little)
+    :return: The positions file, or None if the index was built without positions
+    """
+    if not os.path.exists(positions_file):
+        return None
+
+    return PositionsFile(positions_file, byte_order)
+
+
+def intersect_doc_ids(doc_id_lists: List[np.ndarray]) -> np.ndarray:
+    """Intersect sorted document ID lists, starting from the shortest.
+
+    The remaining candidates are searched for within each longer list, so the cost of an
+    intersection depends on the length of the shortest list rather than the longest.
+
+    :param doc_id_lists: The sorted document IDs of each list
+    :return: The sorted document IDs found in every list
+    """
+    if not doc_id_lists:
+        return np.zeros((0,), dtype=np.int64)
+
+    doc_id_lists = sorted(doc_id_lists, key=len)
+    candidates = doc_id_lists[0]
+
+    for doc_ids in doc_id_lists[1:]:
+        if len(candidates) == 0:
+            break
+
+        positions = np.searchsorted(doc_ids, candidates)
+        found = positions < len(doc_ids)
+        found[found] = doc_ids[positions[found]] == candidates[found]
+        candidates = candidates[found]
+
+    return candidates
+
+
+def phrase_starts(positions: List[np.ndarray]) -> np.ndarray:
+    """Find where the terms of a phrase occur consecutively within a document.
+
+    :param positions: The sorted positions of each term of the phrase within the document
+    :return: The sorted positions at which the phrase starts
+    """
+    starts = positions[0]
+
+    for offset, term_positions in enumerate(positions[1:], start=1):
+        starts = np.intersect1d(starts, term_positions - offset, assume_unique=True)
+
+    return starts
+
+
+def within_distance(
+    left_starts: np.ndarray,
+    left_length: int,
+    right_starts: np.ndarray,
+    right_length: int,
+    distance: int,
+) -> bool:
+    """Check whether two phrases occur within a number of positions of each other.
+
+    Either phrase may come first, and the distance is measured from the end of the first
+    phrase to the start of the second, so adjacent phrases are 1 position apart.
+
+    :param left_starts: The sorted start positions of the first phrase
+    :param left_length: The number of terms of the first phrase
+    :param right_starts: The sorted start positions of the second phrase
+    :param right_length: The number of terms of the second phrase
+    :param distance: The largest distance allowed
+    :return: Whether any pair of occurrences is close enough
+    """
+    if len(left_starts) == 0 or len(right_starts) == 0:
+        return False
+
+    return bool(
+        np.any(nearest_gap(left_starts + left_length - 1, right_starts) <= distance)
+        or np.any(nearest_gap(right_starts + right_length - 1, left_starts) <= distance)
+    )
+
+
+def nearest_gap(ends: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """Find the distance from each phrase end to the next phrase start after it.
+
+    :param ends: The sorted end positions of the first phrase
+    :param starts: The sorted start positions of the second phrase
+    :return: The distance to the next start, or a large number if there is none
+    """
+    positions = np.searchsorted(starts, ends, side="right")
+    padded_starts = np.append(starts, np.iinfo(np.int64).max // 2)
+
+    return padded_starts[positions] - ends
@@ -0,0 +1,167 @@
+from typing import Optional, Tuple
+
+import numpy as np
+
+from index.compression import decode_blocks, decode_indexed_blocks, encode_blocks
+from index.impacts import decode_impacts, dequantize_impacts, encode_impacts, quantize_impacts
+
+
+# Fixed-width 4-byte document IDs and frequencies
+RAW_ENCODING = "raw"
+
+# Delta and variable-byte compressed blocks with skip entries, see index.compression
+VBYTE_ENCODING = "vbyte-1"
+
+# Compressed document IDs with quantized normalized weights instead of term frequencies,
+# see index.impacts
+IMPACT_8_ENCODING = "impact-8"
+IMPACT_16_ENCODING = "impact-16"
+
+# The number of bits of each impact of the impact-scored encodings
+IMPACT_BITS = {IMPACT_8_ENCODING: 8, IMPACT_16_ENCODING: 16}
+
+
+def postings_dtype(byte_order: str = "big") -> np.dtype:
+    """Build the record type of a raw posting.
+
+    :param byte_order: The ordering of the bytes used within the inverted file
+        (either big or little)
+    :return: A structured dtype of a 4-byte document ID followed by a 4-byte frequency
+    """
+    integer = ">u4" if byte_order == "big" else "<u4"
+    return np.dtype([("doc_id", integer), ("frequency", integer)])
+
+
+def decode_postings(
+    buffer,
+    byte_order: str = "big",
+    encoding: str = RAW_ENCODING,
+    candidates: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Decode a postings list without a per-posting Python loop.
+
+    :param buffer: The bytes of the postings list, e.g. a slice of a memory map
+    :param byte_order: The ordering of the bytes used within the inverted file
+        (either big or little)
+    :param encoding: The encoding of the postings list
+    :param candidates: Sorted document IDs of interest, which lets compressed lists skip
+        blocks that cannot contain them; other documents may still be returned
+    :return: A tuple of document IDs and term frequencies
+    """
+    if encoding == VBYTE_ENCODING:
+        return decode_blocks(buffer, byte_order, candidates)
+    elif encoding in IMPACT_BITS:
+        raise ValueError(f"Postings encoded as '{encoding}' hold no term frequencies")
+    elif encoding != RAW_ENCODING:
+        raise ValueError(f"Unknown postings encoding '{encoding}'")
+
+    records = np.frombuffer(buffer, dtype=postings_dtype(byte_order))
+    return records["doc_id"].astype(np.int64), records["frequency"].astype(np.int64)
+
+
+def decode_indexed_doc_ids(
+    buffer,
+    byte_order: str = "big",
+    encoding: str = RAW_ENCODING,
+    candidates: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Decode the document IDs of a postings list with the index of each posting.
+
+    :param buffer: The bytes of the postings list, e.g. a slice of a memory map
+    :param byte_order: The ordering of the bytes used within the inverted file
+        (either big or little)
+    :param encoding: The encoding of the postings list
+    :param candidates: Sorted document IDs of interest, which lets compressed lists skip
+        blocks that cannot contain them; other documents may still be returned
+    :return: A tuple of the sorted document IDs and their indices within the whole
+        postings list in document ID order, which is the order of their positions
+    """
+    if encoding == VBYTE_ENCODING:
+        doc_ids, _, posting_indices = decode_indexed_blocks(buffer, byte_order, candidates)
+        return doc_ids, posting_indices
+
+    if encoding in IMPACT_BITS:
+        doc_ids = decode_weighted_postings(buffer, byte_order, encoding)[0]
+    else:
+        # Raw postings are stored in the order their documents were added
+        doc_ids = np.sort(decode_postings(buffer, byte_order, encoding)[0], kind="stable")
+
+    return doc_ids, np.arange(len(doc_ids))
+
+
+def encode_postings(doc_ids: np.ndarray, frequencies: np.ndarray, byte_order: str = "big") -> bytes:
+    """Encode a raw postings list in a single buffer.
+
+    :param doc_ids: The document IDs of the postings
+    :param frequencies: The term frequency of each posting
+    :param byte_order: The ordering of the bytes to use within the inverted file
+        (either big or little)
+    :return: The bytes of the postings list
+    """
+    records = np.empty((len(doc_ids),), dtype=postings_dtype(byte_order))
+    records["doc_id"] = doc_ids
+    records["frequency"] = frequencies
+
+    return records.tobytes()
+
+
+def encode_postings_list(
+    doc_ids: np.ndarray,
+    frequencies: np.ndarray,
+    weights: np.ndarray,
+    byte_order: str = "big",
+    encoding: str = RAW_ENCODING,
+) -> bytes:
+    """Encode a postings list in the given encoding.
+
+    :param doc_ids: The document IDs of the postings
+    :param frequencies: The term frequency of each posting
+    :param weights: The normalized term weight of each posting, stored in the skip entries
+        of compressed postings
+    :param byte_order: The ordering of the bytes to use within the inverted file
+        (either big or little)
+    :param encoding: The encoding of the postings list
+    :return: The bytes of the postings list
+    """
+    if encoding == VBYTE_ENCODING:
+        return encode_blocks(doc_ids, frequencies, weights, byte_order)
+    elif encoding in IMPACT_BITS:
+        return encode_impacts(doc_ids, weights, IMPACT_BITS[encoding], byte_order)
+    elif encoding != RAW_ENCODING:
+        raise ValueError(f"Unknown postings encoding '{encoding}'")
+
+    return encode_postings(doc_ids, frequencies, byte_order)
+
+
+def decode_weighted_postings(
+    buffer, byte_order: str = "big", encoding: str = RAW_ENCODING
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Decode the document IDs and normalized weights of an impact-scored postings list.
+
+    :param buffer: The bytes of the postings list, e.g. a slice of a memory map
+    :param byte_order: The ordering of the bytes used within the inverted file
+        (either big or little)
+    :param encoding: The encoding of the postings list, one of the impact-scored encodings
+    :return: A tuple of document IDs and approximate normalized term weights
+    """
+    if encoding not in IMPACT_BITS:
+        raise ValueError(f"Postings encoded as '{encoding}' hold no weights")
+
+    return decode_impacts(buffer, IMPACT_BITS[encoding], byte_order)
+
+
+def stored_weights(weights: np.ndarray, encoding: str = RAW_ENCODING) -> np.ndarray:
+    """Find the normalized weights as they are decoded from a postings list.
+
+    Impact-scored encodings quantize the weights, so the largest weight recorded in the
+    lexicon must be the quantized one to remain a bound of the decoded weights.
+
+    :param weights: The normalized term weight of each posting
+    :param encoding: The encoding of the postings list
+    :return: The weights after quantization, or the weights themselves for other encodings
+    """
+    if encoding not in IMPACT_BITS:
+        return weights
+
+    bits = IMPACT_BITS[encoding]
+    return dequantize_impacts(*quantize_impacts(weights, bits), bits)
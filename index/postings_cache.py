@@ -0,0 +1,140 @@
+from collections import OrderedDict
+import threading
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+import numpy as np
+
+
+# Approximate memory cost of an entry besides its arrays
+ENTRY_OVERHEAD = 300
+
+
+class PostingsCache:
+    """A thread-safe, byte-budgeted cache of decoded postings lists with 2Q eviction.
+
+    Lists read for the first time enter a small FIFO queue. Lists evicted from that queue
+    leave their key in a history of recently seen terms, and a term found in the history is
+    admitted to the main LRU queue when it is read again. A burst of rare terms therefore
+    only cycles through the FIFO queue without displacing the frequently used terms.
+    """
+
+    def __init__(
+        self, max_bytes: int = 64 * 1024**2, recent_share: float = 0.25, max_history: int = 4096
+    ) -> None:
+        """Initialize the PostingsCache instance.
+
+        :param max_bytes: The approximate number of bytes the cached arrays may use, where
+            0 disables the cache
+        :param recent_share: The share of the budget used by terms read only once recently
+        :param max_history: The number of evicted keys remembered
+        """
+        self.max_bytes = max_bytes
+        self.recent_bytes_budget = int(max_bytes * recent_share)
+        self.max_history = max_history
+
+        # Each key maps to the cached value and its size in bytes
+        self.recent = OrderedDict()
+        self.frequent = OrderedDict()
+        self.history = OrderedDict()
+        self.recent_bytes = 0
+        self.frequent_bytes = 0
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Tuple[np.ndarray, ...]]:
+        """Find a cached postings list.
+
+        :param key: The ID of the term
+        :return: The cached arrays, or None if the list is not cached
+        """
+        with self.lock:
+            if key in self.frequent:
+                self.frequent.move_to_end(key)
+                self.hits += 1
+                return self.frequent[key][0]
+
+            if key in self.recent:
+                self.hits += 1
+                return self.recent[key][0]
+
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: Tuple[np.ndarray, ...]) -> None:
+        """Add a postings list to the cache, evicting other lists if the budget is exceeded.
+
+        :param key: The ID of the term
+        :param value: The arrays of the postings list
+        :return: None
+        """
+        size = ENTRY_OVERHEAD + sum(array.nbytes for array in value)
+
+        if size > self.max_bytes:
+            return
+
+        with self.lock:
+            if key in self.recent or key in self.frequent:
+                return
+
+            if self.history.pop(key, None) is not None:
+                self.frequent[key] = (value, size)
+                self.frequent_bytes += size
+            else:
+                self.recent[key] = (value, size)
+                self.recent_bytes += size
+
+            self.__evict()
+
+    def __evict(self) -> None:
+        """Evict lists until the cache fits its budget, with the lock held."""
+        while self.recent_bytes + self.frequent_bytes > self.max_bytes:
+            if self.recent and (self.recent_bytes > self.recent_bytes_budget or not self.frequent):
+                key, (_, size) = self.recent.popitem(last=False)
+                self.recent_bytes -= size
+
+                self.history[key] = True
+                if len(self.history) > self.max_history:
+                    self.history.popitem(last=False)
+            else:
+                _, (_, size) = self.frequent.popitem(last=False)
+                self.frequent_bytes -= size
+
+            self.evictions += 1
+
+    def get_or_load(
+        self, key: Hashable, load: Callable[[], Tuple[np.ndarray, ...]]
+    ) -> Tuple[np.ndarray, ...]:
+        """Find a cached postings list, loading and caching it on a miss.
+
+        :param key: The ID of the term
+        :param load: The function that decodes the postings list
+        :return: The arrays of the postings list
+        """
+        value = self.get(key)
+
+        if value is None:
+            value = load()
+            self.put(key, value)
+
+        return value
+
+    def stats(self) -> Dict:
+        """Report the memory use and hit rate of the cache.
+
+        :return: A dictionary of counters
+        """
+        with self.lock:
+            lookups = self.hits + self.misses
+
+            return {
+                "entries": len(self.recent) + len(self.frequent),
+                "bytes": self.recent_bytes + self.frequent_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+            }
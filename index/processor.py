@@ -1,21 +1,71 @@
+from functools import lru_cache
 import re
 import string
-from typing import List
+from typing import Dict, FrozenSet, List, Optional
 
-from nltk.corpus import stopwords
-from nltk.stem.porter import PorterStemmer
-from nltk.tokenize import word_tokenize
+
+# Common punctuation that simple processing splits tokens on
+SPLIT_PATTERN = re.compile(r"\s|-|/|,|\.|\(|\)")
+
+# Stemmed tokens that do not match this pattern are not words
+WORD_PATTERN = re.compile(r"\W?\w+")
+
+PUNCTUATION_TABLE = str.maketrans("", "", string.punctuation)
+
+
+@lru_cache(maxsize=None)
+def english_stop_words() -> FrozenSet[str]:
+    """Read nltk's English stop words, once per process."""
+    from nltk.corpus import stopwords
+
+    return frozenset(stopwords.words("english"))
 
 
 class Processor:
-    """Processes text using either simple processing methods or nltk."""
+    """Processes text using either simple processing methods or nltk.
+
+    A processor only reads its own state and a thread-safe token cache once it is created,
+    so one instance can be shared by concurrent threads.
+    """
 
-    def __init__(self, use_nltk: bool = True):
+    def __init__(self, use_nltk: bool = True, cache_size: int = 0):
+        """Initialize the Processor instance.
+
+        :param use_nltk: Whether to use nltk's tokenizer and stemmer
+        :param cache_size: The maximum number of raw tokens whose clean form is remembered,
+            or 0 to clean every token occurrence
+        """
         self.use_nltk = use_nltk
+        self.cache_size = cache_size
 
+        # nltk is only imported when it is used, since importing it slows down startup
         if self.use_nltk:
+            from nltk.stem.porter import PorterStemmer
+            from nltk.tokenize import word_tokenize
+
             self.stemmer = PorterStemmer()
-            self.stop_words = set(stopwords.words("english"))
+            self.stop_words = english_stop_words()
+            self.word_tokenize = word_tokenize
+
+        self.__init_cache()
+
+    def __init_cache(self) -> None:
+        """Set up the memoization of clean tokens."""
+        # Natural text repeats the same surface forms, so cleaning them is memoized
+        if self.cache_size > 0:
+            self.clean_token = lru_cache(maxsize=self.cache_size)(self.__clean_token)
+        else:
+            self.clean_token = self.__clean_token
+
+    def __getstate__(self) -> Dict:
+        # The cache wraps a bound method, so it is rebuilt rather than pickled
+        state = self.__dict__.copy()
+        del state["clean_token"]
+        return state
+
+    def __setstate__(self, state: Dict) -> None:
+        self.__dict__.update(state)
+        self.__init_cache()
 
     def process_line(self, line: str) -> List[str]:
         """Process a line of text.
@@ -23,10 +73,15 @@ class Processor:
         :param line: The line of text
         :return: A list of clean tokens
         """
-        if self.use_nltk:
-            return self.__nltk_process_line(line)
-        else:
-            return self.__simple_process_line(line)
+        clean_tokens = []
+
+        for token in self.__tokenize(line):
+            clean_token = self.clean_token(token)
+
+            if clean_token is not None:
+                clean_tokens.append(clean_token)
+
+        return clean_tokens
 
     def process_token(self, token: str) -> str:
         """Processes a single token.
@@ -35,10 +90,39 @@ class Processor:
         :return: The processed token
         """
         if self.use_nltk:
-            return self.__nltk_process_line(token)
+            return self.process_line(token)
         else:
             return self.__simple_process_token(token)
 
+    def process_lines(self, lines: List[str]) -> List[List[str]]:
+        """Process many lines of text, cleaning each distinct raw token only once.
+
+        :param lines: The lines of text
+        :return: A list of clean tokens for each line
+        """
+        tokenized_lines = [self.__tokenize(line) for line in lines]
+
+        clean_forms = {}
+        for tokens in tokenized_lines:
+            for token in tokens:
+                if token not in clean_forms:
+                    clean_forms[token] = self.clean_token(token)
+
+        return [
+            [clean_forms[token] for token in tokens if clean_forms[token] is not None]
+            for tokens in tokenized_lines
+        ]
+
+    def cache_info(self) -> Dict[str, int]:
+        """Report the use of the token cache.
+
+        :return: A dictionary of the cache hits, misses, maximum size and current size
+        """
+        if self.cache_size == 0:
+            return {"hits": 0, "misses": 0, "maxsize": 0, "currsize": 0}
+
+        return self.clean_token.cache_info()._asdict()
+
     @staticmethod
     def __simple_process_token(token: str) -> str:
         """Removes punctuation and converts a token to lowercase.
@@ -47,14 +131,17 @@ class Processor:
         :return: The processed token
         """
         stripped_token = token.strip()
-        return stripped_token.translate(str.maketrans("", "", string.punctuation)).lower()
+        return stripped_token.translate(PUNCTUATION_TABLE).lower()
 
-    def __simple_process_line(self, line: str) -> List[str]:
-        """Process a line of text using simple tokenization methods.
+    def __tokenize(self, line: str) -> List[str]:
+        """Split a line of text into raw tokens.
 
         :param line: A line of text
-        :return: A list of clean tokens
+        :return: A list of raw tokens
         """
+        if self.use_nltk:
+            return self.word_tokenize(line)
+
         # Strip whitespace from ends of lines
         stripped_line = line.strip()
 
@@ -63,17 +150,34 @@ class Processor:
         decoded_line = encoded_line.decode()
 
         # Split tokens on common punctuation
-        tokens = re.split("\s|-|/|,|\.|\(|\)", decoded_line)
+        return SPLIT_PATTERN.split(decoded_line)
 
-        clean_tokens = []
-        for token in tokens:
+    def __clean_token(self, token: str) -> Optional[str]:
+        """Clean a single raw token.
+
+        :param token: A raw token produced by the tokenizer
+        :return: The clean token, or None if the token should be discarded
+        """
+        if not self.use_nltk:
             processed_token = self.__simple_process_token(token)
-            if not processed_token or processed_token is None or processed_token.isspace():
-                continue
 
-            clean_tokens.append(processed_token)
+            if not processed_token or processed_token.isspace():
+                return None
 
-        return clean_tokens
+            return processed_token
+
+        # Remove stop words
+        if token.lower() in self.stop_words:
+            return None
+
+        # Stem token
+        stemmed_token = self.stemmer.stem(token)
+
+        # Remove non-words
+        if not WORD_PATTERN.match(stemmed_token):
+            return None
+
+        return stemmed_token
 
     def __nltk_process_token(self, token: str) -> str:
         """Tokenizes and stems a token using nltk.
@@ -81,32 +185,20 @@ class Processor:
         :param token: A token to process
         :return: The processed token
         """
-        tokenized_token = word_tokenize(token)[0]
+        tokenized_token = self.word_tokenize(token)[0]
         stemmed_token = self.stemmer.stem(tokenized_token)
         return stemmed_token
 
-    def __nltk_process_line(self, line: str) -> List[str]:
-        """Process a line of text using nltk's tokenizer and stemmer.
 
-        :param line: A line of text
-        :return: A list of clean tokens
-        """
-        tokens = word_tokenize(line)
+@lru_cache(maxsize=None)
+def shared_processor(use_nltk: bool = True, cache_size: int = 0) -> Processor:
+    """Find the processor shared by every caller asking for the same settings.
 
-        clean_tokens = []
-
-        for token in tokens:
-            # Remove stop words
-            if token.lower() in self.stop_words:
-                continue
-
-            # Stem token
-            stemmed_token = self.stemmer.stem(token)
+    Creating an nltk processor loads its stop words and stemmer, which is better done once
+    than for every query.
 
-            # Remove non-words
-            if not re.match("\W?\w+", stemmed_token):
-                continue
-
-            clean_tokens.append(stemmed_token)
-
-        return clean_tokens
+    :param use_nltk: Whether to use nltk's tokenizer and stemmer
+    :param cache_size: The maximum number of raw tokens whose clean form is remembered
+    :return: The shared processor
+    """
+    return Processor(use_nltk, cache_size)
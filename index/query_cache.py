@@ -0,0 +1,160 @@
+from collections import Counter, OrderedDict
+from datetime import datetime
+import threading
+import time
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+
+def query_key(
+    query: List[str], k: int, offset: int = 0, model: str = "cosine", constraints: Tuple = ()
+) -> Tuple:
+    """Build the cache key of a tokenized query.
+
+    Queries with the same tokens in any order share a key, since their scores are equal.
+
+    :param query: The tokenized query
+    :param k: The number of documents requested
+    :param offset: The number of best documents skipped
+    :param model: The name of the ranking model
+    :param constraints: A hashable form of the query's phrases and proximity operators
+    :return: A hashable key of the token counts, k, offset, model and constraints
+    """
+    return tuple(sorted(Counter(query).items())), k, offset, model, constraints
+
+
+class QueryCache:
+    """A thread-safe cache of query results with LRU eviction and a time to live.
+
+    Entries belong to the timestamp of the index that produced them. Using the cache with
+    the timestamp of a newer index drops every entry of the older one, while lookups with
+    the timestamp of an older index always miss.
+    """
+
+    def __init__(
+        self, max_size: int = 1024, ttl: float = 300.0, clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        """Initialize the QueryCache instance.
+
+        :param max_size: The largest number of results kept, where 0 disables the cache
+        :param ttl: The number of seconds for which a result stays valid
+        :param clock: The function returning the current time in seconds
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+
+        # Each key maps to the time the entry expires and the cached result
+        self.entries = OrderedDict()
+        self.timestamp = None
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def __is_stale(self, timestamp: Optional[datetime]) -> bool:
+        """Check whether a timestamp belongs to an index older than the cached one.
+
+        :param timestamp: The timestamp of the index being queried
+        :return: True if the index has since been replaced
+        """
+        return self.timestamp is not None and timestamp is not None and timestamp < self.timestamp
+
+    def __check_timestamp(self, timestamp: Optional[datetime]) -> None:
+        """Drop every entry if the index timestamp changed, with the lock held.
+
+        :param timestamp: The timestamp of the index being queried
+        :return: None
+        """
+        if timestamp != self.timestamp:
+            if self.entries:
+                self.invalidations += 1
+
+            self.entries.clear()
+            self.timestamp = timestamp
+
+    def get(self, key: Hashable, timestamp: Optional[datetime] = None):
+        """Find a cached result.
+
+        :param key: The key of the query, see query_key
+        :param timestamp: The timestamp of the index being queried
+        :return: The cached result, or None if there is no valid entry
+        """
+        with self.lock:
+            # A request still holding a replaced index misses, without dropping the entries
+            # of the newer one
+            if self.__is_stale(timestamp):
+                self.misses += 1
+                return None
+
+            self.__check_timestamp(timestamp)
+            entry = self.entries.get(key)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires, result = entry
+
+            if expires <= self.clock():
+                del self.entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+
+            return result
+
+    def put(self, key: Hashable, result, timestamp: Optional[datetime] = None) -> None:
+        """Add a result to the cache, evicting the least recently used entries if it is full.
+
+        :param key: The key of the query, see query_key
+        :param result: The result to cache
+        :param timestamp: The timestamp of the index that produced the result
+        :return: None
+        """
+        if self.max_size <= 0:
+            return
+
+        with self.lock:
+            # A result computed on an index that has since been replaced is not cached
+            if self.__is_stale(timestamp):
+                return
+
+            self.__check_timestamp(timestamp)
+
+            self.entries[key] = (self.clock() + self.ttl, result)
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> Dict:
+        """Report the size and usage of the cache.
+
+        :return: A dictionary of counters
+        """
+        with self.lock:
+            lookups = self.hits + self.misses
+
+            return {
+                "size": len(self.entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,250 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+import logging
+from typing import Any, Callable, Dict, Hashable, List, NamedTuple, Optional, Tuple, Union
+
+from index.loaded_index import LoadedIndex
+from index.postings_cache import PostingsCache
+from index.query_parser import And, BooleanQuery, ParsedQuery, Term
+from index.scorers import Scorer
+from logging_tools.metrics import MetricsDelta, metrics
+
+
+logger = logging.getLogger(__name__)
+
+# The resident index of a worker process, keyed by its files, which is replaced when a
+# query names newer files
+worker_index = {"FILES": None, "INDEX": None}
+
+
+class WorkerResult(NamedTuple):
+    """The result of a function run in a worker process, with the metrics it recorded."""
+
+    value: Any
+    metrics: MetricsDelta
+
+
+class QueryRejected(Exception):
+    """Raised when a query arrives while too many others are waiting to be evaluated."""
+
+
+class QueryTimeout(Exception):
+    """Raised when a query is not evaluated within its time limit."""
+
+
+def evaluate_parsed_query(
+    index: LoadedIndex,
+    parsed_query: Union[ParsedQuery, Optional[BooleanQuery]],
+    limit: int,
+    offset: int,
+    scorer: Scorer,
+    mode: str,
+) -> List[int]:
+    """Find the documents of a parsed query.
+
+    :param index: The resident index
+    :param parsed_query: The parsed query, which is a Boolean query in boolean mode
+    :param limit: The number of documents to return
+    :param offset: The number of documents to skip
+    :param scorer: The ranking model
+    :param mode: The query mode, either ranked, conjunctive or boolean
+    :return: The IDs of the documents, best first, or in document ID order for Boolean
+        queries
+    """
+    if mode == "boolean":
+        return index.boolean_documents(parsed_query)[offset : offset + limit].tolist()
+
+    results = rank_parsed_query(index, parsed_query, limit, offset, scorer, mode)
+
+    return [doc_id for doc_id, _ in results]
+
+
+def rank_parsed_query(
+    index: LoadedIndex,
+    parsed_query: ParsedQuery,
+    limit: int,
+    offset: int,
+    scorer: Scorer,
+    mode: str,
+) -> List[Tuple[int, float]]:
+    """Find the best documents of a parsed ranked or conjunctive query, with their scores.
+
+    :param index: The resident index
+    :param parsed_query: The parsed query
+    :param limit: The number of documents to return
+    :param offset: The number of best documents to skip
+    :param scorer: The ranking model
+    :param mode: The query mode, either ranked or conjunctive
+    :return: A list of document IDs and their scores, best first
+    """
+    matches = index.matching_documents(parsed_query) if parsed_query.positional else None
+
+    if mode == "conjunctive":
+        conjunction = And([Term(term) for term in dict.fromkeys(parsed_query.terms)])
+        matches = index.boolean_documents(conjunction, matches)
+
+    return index.top_k(parsed_query.terms, limit, offset, scorer=scorer, documents=matches)
+
+
+def evaluate_in_worker(
+    files: Tuple[str, str, str], postings_cache_bytes: int, *args
+) -> WorkerResult:
+    """Find the documents of a parsed query within a worker process.
+
+    The worker loads its own index from the files on first use, and again whenever a
+    query names newer files. The metrics it records are sent back with the documents, as
+    only those of the service's own process are reported.
+
+    :param files: The lexicon, inverted and document length files of the index
+    :param postings_cache_bytes: The size of the worker's postings cache
+    :param args: The remaining arguments of evaluate_parsed_query
+    :return: The IDs of the documents, and the metrics recorded while finding them
+    """
+    if worker_index["FILES"] != files:
+        worker_index["INDEX"] = LoadedIndex(
+            *files, postings_cache=PostingsCache(postings_cache_bytes)
+        )
+        worker_index["FILES"] = files
+
+    documents = evaluate_parsed_query(worker_index["INDEX"], *args)
+
+    return WorkerResult(documents, metrics.drain())
+
+
+class QueryExecutor:
+    """Evaluates queries in a pool of threads or processes, away from the event loop.
+
+    At most max_pending queries are admitted at once, whether running or waiting for a
+    worker, and further queries are rejected rather than queued without bound. A query
+    identical to one already being evaluated waits for the same result instead of being
+    evaluated again. Its bookkeeping is only touched from the event loop, so it needs no
+    locks.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        max_pending: int = 64,
+        timeout: float = 30.0,
+        use_processes: bool = False,
+    ) -> None:
+        """Initialize the QueryExecutor instance.
+
+        :param workers: The number of threads or processes evaluating queries
+        :param max_pending: The largest number of distinct queries admitted at once
+        :param timeout: The default and largest number of seconds a request waits for
+            its query
+        :param use_processes: Whether to evaluate queries in processes rather than threads
+        """
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.use_processes = use_processes
+        self.executor: Optional[Executor] = None
+        self.in_flight: Dict[Hashable, asyncio.Future] = {}
+
+        self.completed = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def start(self) -> None:
+        """Create the pool of workers, if it is not running yet."""
+        if self.executor is not None:
+            return
+
+        if self.use_processes:
+            self.executor = ProcessPoolExecutor(self.workers)
+        else:
+            self.executor = ThreadPoolExecutor(self.workers, thread_name_prefix="query")
+
+    def shutdown(self) -> None:
+        """Stop the pool of workers once the queries they are evaluating finish."""
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+    async def run(self, key: Hashable, function: Callable, *args, timeout: Optional[float] = None):
+        """Evaluate a query in the pool, or wait for an identical query in flight.
+
+        A request that times out stops waiting, but the query is still evaluated for any
+        other requests waiting on it, and keeps its place in the pool until it finishes.
+
+        :param key: A key identifying identical queries, which must include the index
+        :param function: The function evaluating the query
+        :param args: The arguments of the function
+        :param timeout: The number of seconds to wait, at most the executor's timeout
+        :return: The result of the function
+        :raises QueryRejected: If too many queries are in flight
+        :raises QueryTimeout: If the query takes longer than the timeout
+        """
+        future = self.in_flight.get(key)
+
+        if future is not None:
+            self.coalesced += 1
+            metrics.increment("queries_coalesced")
+        elif len(self.in_flight) >= self.max_pending:
+            self.rejected += 1
+            metrics.increment("queries_rejected")
+            raise QueryRejected(f"More than {self.max_pending} queries are in flight")
+        else:
+            self.start()
+            future = asyncio.ensure_future(self.__evaluate(function, *args))
+            self.in_flight[key] = future
+            future.add_done_callback(lambda finished: self.__finish(key, finished))
+
+        timeout = self.timeout if timeout is None else min(timeout, self.timeout)
+
+        try:
+            # Shielded, so a request that stops waiting leaves the result to the others
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            metrics.increment("query_timeouts")
+            raise QueryTimeout(f"The query took longer than {timeout:g} seconds")
+
+    async def __evaluate(self, function: Callable, *args):
+        """Evaluate a query in the pool, merging the metrics of a worker process once.
+
+        :param function: The function evaluating the query
+        :param args: The arguments of the function
+        :return: The result of the function
+        """
+        result = await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+        if isinstance(result, WorkerResult):
+            metrics.merge(result.metrics)
+            return result.value
+
+        return result
+
+    def __finish(self, key: Hashable, future: asyncio.Future) -> None:
+        """Forget a query that finished evaluating.
+
+        :param key: The key of the query
+        :param future: The future of the query
+        :return: None
+        """
+        del self.in_flight[key]
+        self.completed += 1
+
+        # Retrieve any error, which no request may be waiting for anymore
+        if not future.cancelled():
+            future.exception()
+
+    def stats(self) -> Dict:
+        """Report the load and outcomes of the executor.
+
+        :return: A dictionary of counters
+        """
+        return {
+            "workers": self.workers,
+            "use_processes": self.use_processes,
+            "max_pending": self.max_pending,
+            "timeout": self.timeout,
+            "in_flight": len(self.in_flight),
+            "completed": self.completed,
+            "coalesced": self.coalesced,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+        }
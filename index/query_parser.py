@@ -0,0 +1,229 @@
+import re
+from typing import List, NamedTuple, Optional, Union
+
+from index.processor import Processor
+
+
+# A quoted phrase, whose closing quote may be missing, a proximity operator, or a word
+QUERY_PATTERN = re.compile(r'"([^"]*)"?|\bNEAR/(\d+)\b|([^\s"]+)')
+
+# A parenthesis, a quoted phrase or a word of a Boolean query
+BOOLEAN_PATTERN = re.compile(r'[()]|"[^"]*"?|[^\s()"]+')
+
+# Boolean operators are only recognized in upper case, so "and" is still a word
+BOOLEAN_OPERATORS = {"AND", "OR", "NOT"}
+
+
+class Proximity(NamedTuple):
+    """Two phrases that must occur within a number of positions of each other."""
+
+    left: List[str]
+    right: List[str]
+    distance: int
+
+
+class ParsedQuery(NamedTuple):
+    """The terms of a query and the positional constraints on the documents it finds."""
+
+    terms: List[str]
+    phrases: List[List[str]]
+    proximities: List[Proximity]
+
+    @property
+    def positional(self) -> bool:
+        """Whether the query needs the positions of its terms."""
+        return bool(self.phrases or self.proximities)
+
+
+def parse_query(query_str: str, processor: Processor) -> ParsedQuery:
+    """Parse a query of words, "quoted phrases" and NEAR/k operators.
+
+    Every term of the query is used for ranking. A quoted phrase only matches documents
+    containing its terms consecutively, and a NEAR/k operator only matches documents in
+    which the words or phrases on either side of it occur within k positions of each
+    other, in either order. Queries without either are plain bags of words.
+
+    :param query_str: The query
+    :param processor: The processor used to clean the query's tokens
+    :return: The parsed query
+    """
+    terms = []
+    phrases = []
+    proximities = []
+
+    # Each operand is the clean tokens of a word or phrase, and a pending operator joins
+    # the previous operand to the next one
+    previous = None
+    distance = None
+
+    for phrase, near_distance, word in QUERY_PATTERN.findall(query_str):
+        if near_distance:
+            distance = int(near_distance) if previous else None
+            continue
+
+        tokens = processor.process_line(word or phrase)
+
+        if not tokens:
+            continue
+
+        terms.extend(tokens)
+
+        if phrase and len(tokens) > 1:
+            phrases.append(tokens)
+
+        if distance is not None:
+            proximities.append(Proximity(previous, tokens, distance))
+
+        previous = tokens
+        distance = None
+
+    return ParsedQuery(terms, phrases, proximities)
+
+
+class Term(NamedTuple):
+    """A Boolean query matching the documents containing a term."""
+
+    term: str
+
+
+class Phrase(NamedTuple):
+    """A Boolean query matching the documents containing consecutive terms."""
+
+    terms: List[str]
+
+
+class And(NamedTuple):
+    """A Boolean query matching the documents matched by every operand."""
+
+    operands: List["BooleanQuery"]
+
+
+class Or(NamedTuple):
+    """A Boolean query matching the documents matched by any operand."""
+
+    operands: List["BooleanQuery"]
+
+
+class Not(NamedTuple):
+    """A Boolean query matching the documents not matched by its operand."""
+
+    operand: "BooleanQuery"
+
+
+BooleanQuery = Union[Term, Phrase, And, Or, Not]
+
+
+class BooleanParser:
+    """A recursive descent parser of the tokens of a Boolean query."""
+
+    def __init__(self, tokens: List[str], processor: Processor) -> None:
+        """Initialize the BooleanParser instance.
+
+        :param tokens: The words, phrases, operators and parentheses of the query
+        :param processor: The processor used to clean the query's words
+        """
+        self.tokens = tokens
+        self.processor = processor
+        self.position = 0
+
+    def peek(self) -> Optional[str]:
+        """Find the next token without consuming it."""
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def parse_or(self) -> Optional[BooleanQuery]:
+        """Parse operands joined by OR."""
+        operands = [self.parse_and()]
+
+        while self.peek() == "OR":
+            self.position += 1
+            operands.append(self.parse_and())
+
+        return combine(Or, operands)
+
+    def parse_and(self) -> Optional[BooleanQuery]:
+        """Parse operands joined by AND, or by no operator at all."""
+        operands = [self.parse_not()]
+
+        while self.peek() is not None and self.peek() not in {"OR", ")"}:
+            if self.peek() == "AND":
+                self.position += 1
+
+            operands.append(self.parse_not())
+
+        return combine(And, operands)
+
+    def parse_not(self) -> Optional[BooleanQuery]:
+        """Parse an operand preceded by any number of NOT operators."""
+        if self.peek() != "NOT":
+            return self.parse_operand()
+
+        self.position += 1
+        operand = self.parse_not()
+
+        return Not(operand) if operand is not None else None
+
+    def parse_operand(self) -> Optional[BooleanQuery]:
+        """Parse a word, a phrase or a parenthesized query."""
+        token = self.peek()
+
+        if token is None or token in BOOLEAN_OPERATORS or token == ")":
+            raise ValueError(f"Expected a term but found '{token or 'the end of the query'}'")
+
+        self.position += 1
+
+        if token == "(":
+            query = self.parse_or()
+
+            if self.peek() != ")":
+                raise ValueError("Missing ')' in query")
+
+            self.position += 1
+            return query
+
+        terms = self.processor.process_line(token.strip('"'))
+
+        if not terms:
+            return None
+        elif len(terms) == 1:
+            return Term(terms[0])
+        elif token.startswith('"'):
+            return Phrase(terms)
+
+        # A word that cleans to several terms, such as a hyphenated word, needs all of them
+        return And([Term(term) for term in terms])
+
+
+def combine(operator: type, operands: List[Optional[BooleanQuery]]) -> Optional[BooleanQuery]:
+    """Join the operands of an operator, dropping those without terms.
+
+    :param operator: The class of the operator, either And or Or
+    :param operands: The parsed operands
+    :return: The combined query, the only operand, or None if no operand has terms
+    """
+    operands = [operand for operand in operands if operand is not None]
+
+    if len(operands) <= 1:
+        return operands[0] if operands else None
+
+    return operator(operands)
+
+
+def parse_boolean_query(query_str: str, processor: Processor) -> Optional[BooleanQuery]:
+    """Parse a Boolean query of words, "quoted phrases", AND, OR, NOT and parentheses.
+
+    NOT binds most tightly, then AND, then OR, and words without an operator between them
+    are joined by AND. Words consisting only of stop words are dropped.
+
+    :param query_str: The query
+    :param processor: The processor used to clean the query's tokens
+    :return: The parsed query, or None if the query has no terms
+    :raises ValueError: If the query is not well formed
+    """
+    tokens = BOOLEAN_PATTERN.findall(query_str)
+    parser = BooleanParser(tokens, processor)
+    query = parser.parse_or()
+
+    if parser.position < len(tokens):
+        raise ValueError(f"Unexpected '{tokens[parser.position]}' in query")
+
+    return query
@@ -0,0 +1,278 @@
+from typing import List, NamedTuple, Optional
+
+import numpy as np
+
+from index.scoring import lookup_doc_lengths
+from index.term_dictionary import TermEntry
+
+
+class CollectionStatistics(NamedTuple):
+    """The collection-wide statistics ranking models depend on."""
+
+    num_docs: int
+    doc_ids: np.ndarray
+    token_lengths: Optional[np.ndarray]
+    total_tokens: int
+    average_token_length: float
+
+
+class Scorer:
+    """A ranking model evaluated term-at-a-time over vectorized postings.
+
+    A document's score is the sum of the contributions of the query terms it contains,
+    optionally adjusted once every term has been scored.
+    """
+
+    name = ""
+
+    # Whether contributions are non-negative and bounded by upper_bounds, with no
+    # adjustment, which lets top-k retrieval stop scoring early
+    prunable = True
+
+    def query_weights(
+        self, entries: List[TermEntry], query_tfs: np.ndarray, statistics: CollectionStatistics
+    ) -> np.ndarray:
+        """Calculate the weight of each query term.
+
+        :param entries: The lexicon entries of the query terms found in the index
+        :param query_tfs: The frequency of each of those terms within the query
+        :param statistics: The collection statistics
+        :return: The weight of each query term
+        """
+        raise NotImplementedError
+
+    def upper_bounds(
+        self, entries: List[TermEntry], query_weights: np.ndarray, statistics: CollectionStatistics
+    ) -> np.ndarray:
+        """Bound the contribution each query term can make to a document's score.
+
+        :param entries: The lexicon entries of the query terms found in the index
+        :param query_weights: The weight of each query term
+        :param statistics: The collection statistics
+        :return: The largest contribution of each query term
+        """
+        return np.full((len(entries),), np.inf)
+
+    def score_postings(
+        self,
+        entry: TermEntry,
+        query_weight: float,
+        doc_ids: np.ndarray,
+        tfs: Optional[np.ndarray],
+        weights: np.ndarray,
+        statistics: CollectionStatistics,
+    ) -> np.ndarray:
+        """Calculate a query term's contribution to the score of the documents containing it.
+
+        :param entry: The lexicon entry of the term
+        :param query_weight: The weight of the term within the query
+        :param doc_ids: The document IDs of the term's postings
+        :param tfs: The term frequency of each posting, or None for impact-scored postings
+        :param weights: The normalized cosine weight of each posting
+        :param statistics: The collection statistics
+        :return: The contribution to each document's score
+        """
+        raise NotImplementedError
+
+    def adjust_scores(
+        self,
+        doc_ids: np.ndarray,
+        scores: np.ndarray,
+        query_tfs: np.ndarray,
+        statistics: CollectionStatistics,
+    ) -> np.ndarray:
+        """Adjust the summed contributions of the documents matching a query.
+
+        :param doc_ids: The document IDs
+        :param scores: The summed term contributions of each document
+        :param query_tfs: The frequency of each query term found in the index
+        :param statistics: The collection statistics
+        :return: The final score of each document
+        """
+        return scores
+
+
+def require_frequencies(tfs: Optional[np.ndarray], model: str) -> np.ndarray:
+    """Check that postings hold term frequencies.
+
+    :param tfs: The term frequencies of a postings list, or None
+    :param model: The name of the ranking model needing them
+    :return: The term frequencies
+    """
+    if tfs is None:
+        raise ValueError(
+            f"The {model} model needs term frequencies, which impact-scored "
+            "postings do not store"
+        )
+
+    return tfs
+
+
+def require_token_lengths(statistics: CollectionStatistics, model: str) -> np.ndarray:
+    """Check that the document token lengths were recorded when the index was built.
+
+    :param statistics: The collection statistics
+    :param model: The name of the ranking model needing them
+    :return: The token length of every document
+    """
+    if statistics.token_lengths is None:
+        raise ValueError(f"The {model} model needs document token lengths; rebuild the index")
+
+    return statistics.token_lengths
+
+
+class CosineScorer(Scorer):
+    """Cosine similarity between log2 tf-idf query and document vectors."""
+
+    name = "cosine"
+
+    def query_weights(
+        self, entries: List[TermEntry], query_tfs: np.ndarray, statistics: CollectionStatistics
+    ) -> np.ndarray:
+        idfs = np.array([entry.inverse_document_frequency for entry in entries])
+        query_tf_idf = query_tfs * idfs
+        query_length = np.linalg.norm(query_tf_idf)
+
+        # Each term's share of the normalized query vector
+        if query_length > 0:
+            return query_tf_idf / query_length
+
+        return np.zeros((len(entries),))
+
+    def upper_bounds(
+        self, entries: List[TermEntry], query_weights: np.ndarray, statistics: CollectionStatistics
+    ) -> np.ndarray:
+        # A term contributes at most its query weight times its largest document weight
+        max_scores = np.array([entry.max_score for entry in entries])
+        return np.where(query_weights > 0, query_weights * max_scores, 0.0)
+
+    def score_postings(
+        self,
+        entry: TermEntry,
+        query_weight: float,
+        doc_ids: np.ndarray,
+        tfs: Optional[np.ndarray],
+        weights: np.ndarray,
+        statistics: CollectionStatistics,
+    ) -> np.ndarray:
+        return query_weight * weights
+
+
+class BM25Scorer(Scorer):
+    """Okapi BM25 with the non-negative idf of Lucene."""
+
+    name = "bm25"
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75) -> None:
+        """Initialize the BM25Scorer instance.
+
+        :param k1: The saturation of term frequencies
+        :param b: The strength of document length normalization
+        """
+        self.k1 = k1
+        self.b = b
+
+    def query_weights(
+        self, entries: List[TermEntry], query_tfs: np.ndarray, statistics: CollectionStatistics
+    ) -> np.ndarray:
+        doc_frequencies = np.array([entry.document_frequency for entry in entries])
+        idfs = np.log1p((statistics.num_docs - doc_frequencies + 0.5) / (doc_frequencies + 0.5))
+
+        return query_tfs * idfs
+
+    def upper_bounds(
+        self, entries: List[TermEntry], query_weights: np.ndarray, statistics: CollectionStatistics
+    ) -> np.ndarray:
+        # The saturated frequency approaches but never exceeds k1 + 1
+        return query_weights * (self.k1 + 1)
+
+    def score_postings(
+        self,
+        entry: TermEntry,
+        query_weight: float,
+        doc_ids: np.ndarray,
+        tfs: Optional[np.ndarray],
+        weights: np.ndarray,
+        statistics: CollectionStatistics,
+    ) -> np.ndarray:
+        tfs = require_frequencies(tfs, self.name)
+        token_lengths = require_token_lengths(statistics, self.name)
+
+        doc_lengths = lookup_doc_lengths(doc_ids, statistics.doc_ids, token_lengths)
+        length_norm = self.k1 * (
+            1 - self.b + self.b * doc_lengths / max(statistics.average_token_length, 1e-9)
+        )
+
+        return query_weight * tfs * (self.k1 + 1) / (tfs + length_norm)
+
+
+class DirichletScorer(Scorer):
+    """Query likelihood with Dirichlet smoothing of the document language models.
+
+    Only documents containing at least one query term are ranked.
+    """
+
+    name = "dirichlet"
+
+    # The document length part of the score is negative and added after every term
+    prunable = False
+
+    def __init__(self, mu: float = 2000.0) -> None:
+        """Initialize the DirichletScorer instance.
+
+        :param mu: The weight of the collection language model
+        """
+        self.mu = mu
+
+    def query_weights(
+        self, entries: List[TermEntry], query_tfs: np.ndarray, statistics: CollectionStatistics
+    ) -> np.ndarray:
+        return query_tfs.astype(np.float64)
+
+    def score_postings(
+        self,
+        entry: TermEntry,
+        query_weight: float,
+        doc_ids: np.ndarray,
+        tfs: Optional[np.ndarray],
+        weights: np.ndarray,
+        statistics: CollectionStatistics,
+    ) -> np.ndarray:
+        tfs = require_frequencies(tfs, self.name)
+
+        if entry.collection_frequency <= 0 or statistics.total_tokens <= 0:
+            raise ValueError(
+                f"The {self.name} model needs collection frequencies; rebuild the index"
+            )
+
+        collection_probability = entry.collection_frequency / statistics.total_tokens
+
+        return query_weight * np.log1p(tfs / (self.mu * collection_probability))
+
+    def adjust_scores(
+        self,
+        doc_ids: np.ndarray,
+        scores: np.ndarray,
+        query_tfs: np.ndarray,
+        statistics: CollectionStatistics,
+    ) -> np.ndarray:
+        token_lengths = require_token_lengths(statistics, self.name)
+        doc_lengths = lookup_doc_lengths(doc_ids, statistics.doc_ids, token_lengths)
+
+        return scores + query_tfs.sum() * np.log(self.mu / (doc_lengths + self.mu))
+
+
+# The ranking models available to queries, by name
+SCORERS = {scorer.name: scorer for scorer in [CosineScorer, BM25Scorer, DirichletScorer]}
+
+
+def get_scorer(name: str) -> Scorer:
+    """Create the ranking model of the given name with its default parameters.
+
+    :param name: The name of the ranking model
+    :return: The ranking model
+    """
+    if name not in SCORERS:
+        raise ValueError(f"Unknown ranking model '{name}', expected one of {', '.join(SCORERS)}")
+
+    return SCORERS[name]()
@@ -0,0 +1,176 @@
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+
+def accumulate_scores(
+    doc_id_lists: List[np.ndarray], weight_lists: List[np.ndarray]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Sum term weights per document over several postings lists.
+
+    Only documents appearing in at least one postings list are given an accumulator, so the
+    cost depends on the total length of the postings rather than the collection size.
+
+    :param doc_id_lists: The document IDs of each postings list
+    :param weight_lists: The weight of each posting, aligned with the document IDs
+    :return: A tuple of sorted document IDs and their accumulated scores
+    """
+    if len(doc_id_lists) == 0:
+        return np.zeros((0,), dtype=np.int64), np.zeros((0,))
+
+    doc_ids = np.concatenate(doc_id_lists)
+    weights = np.concatenate(weight_lists)
+
+    unique_doc_ids, accumulators = np.unique(doc_ids, return_inverse=True)
+    scores = np.bincount(accumulators, weights=weights, minlength=len(unique_doc_ids))
+
+    return unique_doc_ids, scores
+
+
+def lookup_doc_lengths(
+    doc_ids: np.ndarray, all_doc_ids: np.ndarray, all_doc_lengths: np.ndarray
+) -> np.ndarray:
+    """Find the lengths of a subset of documents.
+
+    :param doc_ids: The document IDs to look up
+    :param all_doc_ids: The sorted IDs of every document in the collection
+    :param all_doc_lengths: The length of every document, aligned with all_doc_ids
+    :return: The lengths of the requested documents
+    """
+    positions = np.searchsorted(all_doc_ids, doc_ids)
+    return all_doc_lengths[positions]
+
+
+def cosine_scores(
+    postings: List[Tuple[np.ndarray, np.ndarray]],
+    idfs: np.ndarray,
+    query_tfs: np.ndarray,
+    all_doc_ids: np.ndarray,
+    all_doc_lengths: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Calculate cosine similarity term-at-a-time over the postings of the query terms.
+
+    :param postings: The document IDs and term frequencies of each query term found in the
+        index
+    :param idfs: The inverse document frequency of each query term found in the index
+    :param query_tfs: The frequency of each query term found in the index within the query
+    :param all_doc_ids: The sorted IDs of every document in the collection
+    :param all_doc_lengths: The Euclidean length of every document, aligned with all_doc_ids
+    :return: A tuple of sorted document IDs and their cosine similarity scores
+    """
+    query_tf_idf = query_tfs * idfs
+    query_length = np.linalg.norm(query_tf_idf)
+
+    # Each posting contributes the product of the query and document weights of its term
+    doc_id_lists = [doc_ids for doc_ids, _ in postings]
+    weight_lists = [
+        tfs * (idf * query_weight)
+        for (_, tfs), idf, query_weight in zip(postings, idfs, query_tf_idf)
+    ]
+
+    doc_ids, dot_products = accumulate_scores(doc_id_lists, weight_lists)
+    doc_lengths = lookup_doc_lengths(doc_ids, all_doc_ids, all_doc_lengths)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scores = dot_products / (query_length * doc_lengths)
+    scores[np.isnan(scores)] = 0
+
+    return doc_ids, scores
+
+
+def normalized_weights(tfs: np.ndarray, term_weight: float, doc_lengths: np.ndarray) -> np.ndarray:
+    """Weight term frequencies and normalize them by their documents' lengths.
+
+    :param tfs: The term frequencies of a postings list
+    :param term_weight: The factor applied to every frequency of the term
+    :param doc_lengths: The length of each posting's document
+    :return: The normalized weight of each posting
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        weights = tfs * term_weight / doc_lengths
+    weights[np.isnan(weights)] = 0
+
+    return weights
+
+
+def select_top_k(doc_ids: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Select the highest-scoring documents without sorting every score.
+
+    :param doc_ids: The document IDs
+    :param scores: The score of each document
+    :param k: The number of documents to select
+    :return: A tuple of the selected document IDs and their scores, best first with ties
+        broken by ascending document ID
+    """
+    if k <= 0:
+        return doc_ids[:0], scores[:0]
+
+    if len(scores) > k:
+        # Every document scoring at least the k-th best score is a candidate, so ties at
+        # the boundary are resolved deterministically below
+        threshold = np.partition(scores, len(scores) - k)[len(scores) - k]
+        candidates = np.flatnonzero(scores >= threshold)
+        doc_ids = doc_ids[candidates]
+        scores = scores[candidates]
+
+    order = np.lexsort((doc_ids, -scores))[:k]
+    return doc_ids[order], scores[order]
+
+
+def max_score_top_k(
+    upper_bounds: np.ndarray,
+    fetch_contributions: Callable[[int, Optional[np.ndarray]], Tuple[np.ndarray, np.ndarray]],
+    k: int,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Find the top-k documents term-at-a-time with MaxScore early termination.
+
+    Terms are processed in decreasing order of their upper-bound contribution. Once the
+    bounds of the remaining terms sum to less than the current k-th best score, no new
+    document can enter the top-k, so the remaining terms only update existing candidates,
+    and candidates that can no longer reach the top-k are dropped.
+
+    :param upper_bounds: The largest score contribution each term can make to a document
+    :param fetch_contributions: A function returning the sorted document IDs and score
+        contributions of the term with the given position; when candidate document IDs
+        are passed, only postings of those documents are needed
+    :param k: The number of documents to select
+    :return: A tuple of the selected document IDs and their scores, best first
+    """
+    order = np.argsort(-upper_bounds, kind="stable")
+
+    # The sum of the upper bounds of every term from a given position onwards
+    remaining_bounds = np.append(np.cumsum(upper_bounds[order][::-1])[::-1], 0.0)
+
+    candidate_ids = np.zeros((0,), dtype=np.int64)
+    candidate_scores = np.zeros((0,))
+    accepting_new_documents = True
+
+    for position, term_position in enumerate(order):
+        if accepting_new_documents:
+            doc_ids, contributions = fetch_contributions(term_position, None)
+            candidate_ids, candidate_scores = accumulate_scores(
+                [candidate_ids, doc_ids], [candidate_scores, contributions]
+            )
+        else:
+            doc_ids, contributions = fetch_contributions(term_position, candidate_ids)
+            positions = np.searchsorted(candidate_ids, doc_ids)
+            found = positions < len(candidate_ids)
+            found[found] = candidate_ids[positions[found]] == doc_ids[found]
+            candidate_scores[positions[found]] += contributions[found]
+
+        if len(candidate_ids) < k:
+            continue
+
+        rest = remaining_bounds[position + 1]
+        threshold = np.partition(candidate_scores, len(candidate_scores) - k)[
+            len(candidate_scores) - k
+        ]
+
+        if rest < threshold:
+            accepting_new_documents = False
+
+        reachable = candidate_scores + rest >= threshold
+        candidate_ids = candidate_ids[reachable]
+        candidate_scores = candidate_scores[reachable]
+
+    return select_top_k(candidate_ids, candidate_scores, k)
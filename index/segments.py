@@ -0,0 +1,532 @@
+from collections import Counter
+import json
+import logging
+import os
+import threading
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from index.inverted_index import InvertedIndex
+from index.loaded_index import LoadedIndex
+from index.postings import IMPACT_BITS, RAW_ENCODING
+from index.processor import Processor
+from index.scoring import accumulate_scores, normalized_weights, select_top_k
+from index.statistics_file import statistics_file_name
+
+
+logger = logging.getLogger(__name__)
+
+
+class SegmentSnapshot(NamedTuple):
+    """An immutable view of the segments and their collection-wide statistics."""
+
+    names: List[str]
+    segments: List[LoadedIndex]
+    live: List[np.ndarray]
+    doc_lengths: List[np.ndarray]
+    terms: np.ndarray
+    idfs: np.ndarray
+
+
+class SegmentPostings(NamedTuple):
+    """The postings of a segment, flattened into one entry per posting.
+
+    Document lengths depend on inverse document frequencies over every segment, so they are
+    recalculated whenever the segments change; the flattened postings let them be
+    recalculated without decoding any postings list again.
+    """
+
+    term_positions: np.ndarray
+    doc_positions: np.ndarray
+    squared_tfs: np.ndarray
+
+
+def flatten_postings(segment: LoadedIndex) -> SegmentPostings:
+    """Decode every postings list of a segment into flat arrays.
+
+    :param segment: The segment
+    :return: The position of each posting's term within the segment's sorted terms, the
+        position of its document within the segment's documents, and its squared term
+        frequency
+    """
+    term_positions = [np.zeros((0,), dtype=np.int64)]
+    doc_positions = [np.zeros((0,), dtype=np.int64)]
+    squared_tfs = [np.zeros((0,))]
+
+    for position in range(len(segment.term_dictionary)):
+        doc_ids, frequencies = segment.read_postings(segment.term_dictionary.entry(position))
+
+        term_positions.append(np.full((len(doc_ids),), position, dtype=np.int64))
+        doc_positions.append(np.searchsorted(segment.doc_ids, doc_ids))
+        squared_tfs.append(np.square(frequencies.astype(np.float64)))
+
+    return SegmentPostings(
+        np.concatenate(term_positions), np.concatenate(doc_positions), np.concatenate(squared_tfs)
+    )
+
+
+class SegmentedIndex:
+    """An index made of independently written segments that can grow without a rebuild.
+
+    New documents are written to a small new segment, deleted documents are hidden by a
+    per-segment tombstone bitmap, and segments of similar size are merged into larger ones
+    following a tiered merge policy. Inverse document frequencies and document lengths are
+    calculated over every segment, so scores match those of a single index of the same
+    documents. As in the segment files, deleted documents count towards the statistics until
+    their segment is merged.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        byte_order: str = "big",
+        encoding: str = RAW_ENCODING,
+        merge_factor: int = 10,
+    ) -> None:
+        """Initialize the SegmentedIndex instance.
+
+        :param directory: The directory holding the segment files and manifest
+        :param byte_order: The ordering of the bytes to use within the inverted files
+            (either big or little)
+        :param encoding: The encoding of the postings lists of new segments, which must
+            hold term frequencies since weights depend on statistics across segments
+        :param merge_factor: The number of segments of the same size tier that are merged
+            together
+        """
+        if encoding in IMPACT_BITS:
+            raise ValueError(f"Segments cannot be encoded as '{encoding}'")
+
+        self.directory = directory
+        self.byte_order = byte_order
+        self.encoding = encoding
+        self.merge_factor = merge_factor
+
+        self.manifest_file = os.path.join(directory, "manifest.json")
+        self.lock = threading.RLock()
+        self.stop_merging = threading.Event()
+        self.merge_thread = None
+
+        os.makedirs(directory, exist_ok=True)
+
+        if os.path.exists(self.manifest_file):
+            with open(self.manifest_file, "r") as file:
+                self.manifest = json.load(file)
+        else:
+            self.manifest = {"generation": 0, "segments": []}
+
+        self.segments = {
+            segment["name"]: LoadedIndex(*segment["files"], byte_order=byte_order)
+            for segment in self.manifest["segments"]
+        }
+        self.deleted = {
+            segment["name"]: self.__read_tombstones(segment)
+            for segment in self.manifest["segments"]
+        }
+
+        # Each segment's postings are decoded once, when the segment is first used
+        self.segment_postings: Dict[str, SegmentPostings] = {}
+
+        self.snapshot = self.__build_snapshot()
+
+    def add_documents(
+        self, documents: Iterable[Tuple[int, str]], processor: Processor
+    ) -> Optional[str]:
+        """Index new documents into a new segment.
+
+        Documents whose IDs already exist in the index replace the older versions.
+
+        :param documents: An iterable of document IDs and their text
+        :param processor: The document processor object
+        :return: The name of the new segment, or None if there were no documents
+        """
+        index = InvertedIndex()
+        index.doc_ids = []
+
+        for document_id, text in documents:
+            for token in processor.process_line(text):
+                index.add_word(document_id, token)
+
+            index.doc_ids.append(document_id)
+            index.num_docs += 1
+
+        if index.num_docs == 0:
+            return None
+
+        return self.add_segment(index)
+
+    def add_segment(self, index: InvertedIndex) -> str:
+        """Write an in-memory index as a new segment.
+
+        :param index: The index of the new documents
+        :return: The name of the new segment
+        """
+        with self.lock:
+            name = f"segment_{self.manifest['generation']}"
+            self.manifest["generation"] += 1
+
+            files = index.generate_file(
+                name, self.byte_order, self.encoding, output_directory=self.directory
+            )
+            segment = LoadedIndex(*files, byte_order=self.byte_order)
+
+            # Older versions of the new documents are replaced
+            for other_name, other_segment in self.segments.items():
+                replaced = np.isin(other_segment.doc_ids, segment.doc_ids)
+
+                if replaced.any():
+                    self.deleted[other_name] |= replaced
+                    self.__write_tombstones(other_name)
+
+            self.segments[name] = segment
+            self.deleted[name] = np.zeros((len(segment.doc_ids),), dtype=bool)
+            self.manifest["segments"].append(
+                {
+                    "name": name,
+                    "files": list(files),
+                    "tombstone_file": os.path.join(self.directory, f"{name}_tombstones.bin"),
+                }
+            )
+            self.__write_tombstones(name)
+            self.__write_manifest()
+
+            self.snapshot = self.__build_snapshot()
+
+        logger.info(f"Added segment {name} of {len(segment.doc_ids)} documents")
+
+        return name
+
+    def delete_documents(self, doc_ids: Iterable[int]) -> int:
+        """Mark documents as deleted.
+
+        :param doc_ids: The IDs of the documents to delete
+        :return: The number of newly deleted documents
+        """
+        doc_ids = np.fromiter(doc_ids, dtype=np.int64)
+        num_deleted = 0
+
+        with self.lock:
+            for name, segment in self.segments.items():
+                deleted = np.isin(segment.doc_ids, doc_ids) & ~self.deleted[name]
+
+                if deleted.any():
+                    num_deleted += int(deleted.sum())
+                    self.deleted[name] |= deleted
+                    self.__write_tombstones(name)
+
+            # Deleted documents still count towards the statistics, so only liveness changes
+            live = [~self.deleted[name] for name in self.snapshot.names]
+            self.snapshot = self.snapshot._replace(live=live)
+
+        return num_deleted
+
+    def find_merges(self) -> List[List[str]]:
+        """Find groups of segments to merge following a tiered merge policy.
+
+        Segments are assigned to tiers by the logarithm of their number of live documents
+        in base merge_factor, and every merge_factor segments of the same tier are merged.
+
+        :return: A list of groups of segment names
+        """
+        tiers = {}
+
+        with self.lock:
+            for segment in self.manifest["segments"]:
+                name = segment["name"]
+                num_live = int((~self.deleted[name]).sum())
+
+                tier = 0
+                while num_live >= self.merge_factor:
+                    num_live //= self.merge_factor
+                    tier += 1
+
+                tiers.setdefault(tier, []).append(name)
+
+        merges = []
+
+        for _, names in sorted(tiers.items()):
+            for start in range(0, len(names) - self.merge_factor + 1, self.merge_factor):
+                merges.append(names[start : start + self.merge_factor])
+
+        return merges
+
+    def maybe_merge(self) -> List[str]:
+        """Merge groups of segments selected by the merge policy until none are left.
+
+        :return: The names of the new merged segments
+        """
+        merged = []
+        merges = self.find_merges()
+
+        while merges:
+            merged.extend(self.merge_segments(names) for names in merges)
+            merges = self.find_merges()
+
+        return merged
+
+    def merge_segments(self, names: List[str]) -> str:
+        """Merge segments into a single new segment, dropping their deleted documents.
+
+        :param names: The names of the segments to merge
+        :return: The name of the merged segment
+        """
+        with self.lock:
+            postings = {}
+            merged_doc_ids = []
+
+            for name in names:
+                segment = self.segments[name]
+                live_doc_ids = segment.doc_ids[~self.deleted[name]]
+                merged_doc_ids.extend(live_doc_ids.tolist())
+
+                for position, term in enumerate(segment.term_dictionary.terms):
+                    entry = segment.term_dictionary.entry(position)
+                    doc_ids, frequencies = segment.read_postings(entry)
+
+                    live = np.isin(doc_ids, live_doc_ids)
+                    postings.setdefault(str(term), []).append((doc_ids[live], frequencies[live]))
+
+            index = InvertedIndex()
+            index.doc_ids = merged_doc_ids
+            index.num_docs = len(merged_doc_ids)
+
+            for term, term_postings in postings.items():
+                doc_ids = np.concatenate([doc_ids for doc_ids, _ in term_postings])
+
+                if len(doc_ids) == 0:
+                    continue
+
+                frequencies = np.concatenate([frequencies for _, frequencies in term_postings])
+                order = np.argsort(doc_ids)
+
+                postings_list = {"size": 1}
+                postings_list.update(zip(doc_ids[order].tolist(), frequencies[order].tolist()))
+
+                index.index[term] = {
+                    "count": int(frequencies.sum()),
+                    "num_docs": len(doc_ids),
+                    "postings_list": postings_list,
+                }
+                index.num_terms += 1
+
+            merged_name = self.add_segment(index)
+            self.remove_segments(names)
+
+        logger.info(f"Merged segments {', '.join(names)} into {merged_name}")
+
+        return merged_name
+
+    def remove_segments(self, names: List[str]) -> None:
+        """Remove segments and their files.
+
+        :param names: The names of the segments to remove
+        :return: None
+        """
+        with self.lock:
+            removed = [segment for segment in self.manifest["segments"] if segment["name"] in names]
+            self.manifest["segments"] = [
+                segment for segment in self.manifest["segments"] if segment["name"] not in names
+            ]
+            self.__write_manifest()
+
+            for name in names:
+                del self.segments[name]
+                del self.deleted[name]
+                self.segment_postings.pop(name, None)
+
+            self.snapshot = self.__build_snapshot()
+
+        # In-flight queries keep their memory maps, which stay valid after the files are removed
+        for segment in removed:
+            for file in segment["files"] + [segment["tombstone_file"]]:
+                os.remove(file)
+
+            statistics_file = statistics_file_name(segment["files"][0])
+            if os.path.exists(statistics_file):
+                os.remove(statistics_file)
+
+    def start_background_merging(self, interval: float = 60.0) -> None:
+        """Periodically apply the merge policy within a background thread.
+
+        :param interval: The number of seconds between merge policy checks
+        :return: None
+        """
+        if self.merge_thread is not None:
+            return
+
+        def merge_loop():
+            while not self.stop_merging.wait(interval):
+                try:
+                    self.maybe_merge()
+                except Exception:
+                    logger.exception("Background segment merge failed")
+
+        self.stop_merging.clear()
+        self.merge_thread = threading.Thread(target=merge_loop, daemon=True)
+        self.merge_thread.start()
+
+    def stop_background_merging(self) -> None:
+        """Stop the background merge thread."""
+        if self.merge_thread is None:
+            return
+
+        self.stop_merging.set()
+        self.merge_thread.join()
+        self.merge_thread = None
+
+    def cosine_similarity(self, query: List[str]) -> pd.DataFrame:
+        """Calculate cosine similarity between a query and the live documents of every segment.
+
+        :param query: The tokenized query against which to calculate cosine similarity
+        :return: A DataFrame of cosine similarity scores for the live documents containing at
+            least one query term
+        """
+        doc_ids, scores = self.__score(query)
+        return pd.DataFrame(zip(doc_ids, scores), columns=["doc_id", "cosine_score"])
+
+    def top_k(self, query: List[str], k: int, offset: int = 0) -> List[Tuple[int, float]]:
+        """Find the live documents with the highest cosine similarity to a query.
+
+        :param query: The tokenized query against which to calculate cosine similarity
+        :param k: The number of documents to return
+        :param offset: The number of best documents to skip, for pagination
+        :return: A list of document IDs and their cosine similarity scores, best first
+        """
+        doc_ids, scores = select_top_k(*self.__score(query), offset + k)
+        return list(zip(doc_ids[offset:].tolist(), scores[offset:].tolist()))
+
+    def __score(self, query: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Score the live documents of every segment against a query.
+
+        :param query: The tokenized query
+        :return: A tuple of sorted document IDs and their cosine similarity scores
+        """
+        snapshot = self.snapshot
+        query_counter = Counter(query)
+
+        query_terms = []
+        idfs = []
+        query_tfs = []
+
+        for term, query_tf in query_counter.items():
+            position = np.searchsorted(snapshot.terms, term)
+
+            if position == len(snapshot.terms) or snapshot.terms[position] != term:
+                logger.info(f"The term '{term}' was not found in the index")
+                continue
+
+            query_terms.append(term)
+            idfs.append(snapshot.idfs[position])
+            query_tfs.append(query_tf)
+
+        query_tf_idf = np.array(query_tfs) * np.array(idfs)
+
+        # A query of terms found in every document has no weight, and matches nothing
+        query_length = np.linalg.norm(query_tf_idf) or 1.0
+
+        doc_id_lists = []
+        weight_lists = []
+
+        for segment, live, doc_lengths in zip(
+            snapshot.segments, snapshot.live, snapshot.doc_lengths
+        ):
+            for term, idf, query_weight in zip(query_terms, idfs, query_tf_idf):
+                entry = segment.term_dictionary.lookup(term)
+
+                if entry is None:
+                    continue
+
+                doc_ids, frequencies = segment.read_postings(entry)
+                positions = np.searchsorted(segment.doc_ids, doc_ids)
+                is_live = live[positions]
+
+                weights = normalized_weights(
+                    frequencies[is_live],
+                    idf * query_weight / query_length,
+                    doc_lengths[positions[is_live]],
+                )
+
+                doc_id_lists.append(doc_ids[is_live])
+                weight_lists.append(weights)
+
+        return accumulate_scores(doc_id_lists, weight_lists)
+
+    def __build_snapshot(self) -> SegmentSnapshot:
+        """Calculate collection-wide statistics over every segment.
+
+        :return: A snapshot of the current segments and their statistics
+        """
+        names = [segment["name"] for segment in self.manifest["segments"]]
+        segments = [self.segments[name] for name in names]
+
+        if len(segments) == 0:
+            return SegmentSnapshot([], [], [], [], np.zeros((0,), dtype=str), np.zeros((0,)))
+
+        num_docs = sum(len(segment.doc_ids) for segment in segments)
+
+        # Document frequencies are summed over the vocabularies of every segment
+        all_terms = np.concatenate([segment.term_dictionary.terms for segment in segments])
+        all_doc_frequencies = np.concatenate(
+            [segment.term_dictionary.doc_frequencies for segment in segments]
+        )
+        terms, term_positions = np.unique(all_terms, return_inverse=True)
+        doc_frequencies = np.bincount(term_positions, weights=all_doc_frequencies)
+        idfs = np.log2(num_docs / doc_frequencies)
+
+        # Document lengths are recalculated with the collection-wide weights from each
+        # segment's flattened postings, which are only decoded for new segments
+        doc_lengths = []
+        segment_ends = np.cumsum([len(segment.term_dictionary) for segment in segments])
+
+        for name, segment, end in zip(names, segments, segment_ends):
+            segment_idfs = idfs[term_positions[end - len(segment.term_dictionary) : end]]
+
+            if name not in self.segment_postings:
+                self.segment_postings[name] = flatten_postings(segment)
+
+            postings = self.segment_postings[name]
+            squared_weights = (
+                postings.squared_tfs * np.square(segment_idfs)[postings.term_positions]
+            )
+            lengths = np.bincount(
+                postings.doc_positions, weights=squared_weights, minlength=len(segment.doc_ids)
+            )
+
+            doc_lengths.append(np.sqrt(lengths))
+
+        live = [~self.deleted[name] for name in names]
+
+        return SegmentSnapshot(names, segments, live, doc_lengths, terms, idfs)
+
+    def __read_tombstones(self, segment: Dict) -> np.ndarray:
+        """Read the tombstone bitmap of a segment.
+
+        :param segment: The manifest entry of the segment
+        :return: An array of whether each document of the segment is deleted
+        """
+        num_docs = len(self.segments[segment["name"]].doc_ids)
+
+        if not os.path.exists(segment["tombstone_file"]):
+            return np.zeros((num_docs,), dtype=bool)
+
+        bitmap = np.fromfile(segment["tombstone_file"], dtype=np.uint8)
+        return np.unpackbits(bitmap, count=num_docs).astype(bool)
+
+    def __write_tombstones(self, name: str) -> None:
+        """Write the tombstone bitmap of a segment.
+
+        :param name: The name of the segment
+        :return: None
+        """
+        tombstone_file = os.path.join(self.directory, f"{name}_tombstones.bin")
+        np.packbits(self.deleted[name]).tofile(tombstone_file)
+
+    def __write_manifest(self) -> None:
+        """Atomically replace the manifest with the current list of segments."""
+        temporary_file = f"{self.manifest_file}.tmp"
+
+        with open(temporary_file, "w") as file:
+            json.dump(self.manifest, file, indent=2)
+
+        os.replace(temporary_file, self.manifest_file)
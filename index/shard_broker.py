@@ -0,0 +1,286 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import heapq
+from itertools import islice
+import json
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from index.loaded_index import LoadedIndex
+from index.postings_cache import PostingsCache
+from index.processor import Processor
+from index.sharding import load_shard, read_manifest, search_shard
+from logging_tools.metrics import metrics
+
+
+logger = logging.getLogger(__name__)
+
+# The resident shard and query processor of a shard worker process
+shard_worker = {"INDEX": None, "PROCESSOR": None}
+
+
+class ShardError(Exception):
+    """Raised when a shard cannot answer a query."""
+
+
+class Shard:
+    """A document partition of a collection, which finds its own best documents for a query."""
+
+    def search(self, query_str: str, limit: int, model: str, mode: str) -> List[Tuple[int, float]]:
+        """Find the best documents of the shard for a query.
+
+        :param query_str: The query
+        :param limit: The number of documents to return
+        :param model: The name of the ranking model
+        :param mode: The query mode, either ranked, conjunctive or boolean
+        :return: A list of document IDs and their scores, best first, or in document ID
+            order for Boolean queries
+        """
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Release the resources of the shard."""
+
+
+class LocalShard(Shard):
+    """A shard resident in the broker's own process."""
+
+    def __init__(self, index: LoadedIndex, processor: Processor) -> None:
+        """Initialize the LocalShard instance.
+
+        :param index: The resident index of the shard
+        :param processor: The processor used to clean the tokens of queries
+        """
+        self.index = index
+        self.processor = processor
+
+    def search(self, query_str: str, limit: int, model: str, mode: str) -> List[Tuple[int, float]]:
+        return search_shard(self.index, self.processor, query_str, limit, model, mode)
+
+
+def init_shard_worker(
+    manifest_file: str, shard_id: int, processor: Processor, postings_cache_bytes: int = 0
+) -> None:
+    """Load a shard within its worker process.
+
+    :param manifest_file: The name of the manifest file of the collection
+    :param shard_id: The number of the shard
+    :param processor: The processor used to clean the tokens of queries
+    :param postings_cache_bytes: The size of the shard's postings cache
+    :return: None
+    """
+    postings_cache = PostingsCache(postings_cache_bytes) if postings_cache_bytes > 0 else None
+
+    shard_worker["INDEX"] = load_shard(manifest_file, shard_id, postings_cache)
+    shard_worker["PROCESSOR"] = processor
+
+
+def search_in_worker(query_str: str, limit: int, model: str, mode: str) -> List[Tuple[int, float]]:
+    """Find the best documents of the shard resident in a worker process.
+
+    :param query_str: The query
+    :param limit: The number of documents to return
+    :param model: The name of the ranking model
+    :param mode: The query mode
+    :return: A list of document IDs and their scores
+    """
+    return search_shard(
+        shard_worker["INDEX"], shard_worker["PROCESSOR"], query_str, limit, model, mode
+    )
+
+
+class ProcessShard(Shard):
+    """A shard resident in a worker process of its own, which searches it on its own CPU."""
+
+    def __init__(
+        self,
+        manifest_file: str,
+        shard_id: int,
+        processor: Processor,
+        postings_cache_bytes: int = 0,
+    ) -> None:
+        """Initialize the ProcessShard instance.
+
+        :param manifest_file: The name of the manifest file of the collection
+        :param shard_id: The number of the shard
+        :param processor: The processor used to clean the tokens of queries
+        :param postings_cache_bytes: The size of the shard's postings cache, or 0 for none
+        """
+        self.executor = ProcessPoolExecutor(
+            1,
+            initializer=init_shard_worker,
+            initargs=(manifest_file, shard_id, processor, postings_cache_bytes),
+        )
+
+    def search(self, query_str: str, limit: int, model: str, mode: str) -> List[Tuple[int, float]]:
+        return self.executor.submit(search_in_worker, query_str, limit, model, mode).result()
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=True)
+
+
+def post_json(url: str, body: Dict, timeout: float) -> Dict:
+    """Send a JSON request to a shard worker and read its JSON response.
+
+    :param url: The URL of the endpoint
+    :param body: The body of the request
+    :param timeout: The number of seconds to wait for the response
+    :return: The body of the response
+    :raises ValueError: If the worker rejects the query
+    :raises ShardError: If the worker cannot be reached or fails
+    """
+    request = Request(url, json.dumps(body).encode("utf-8"), {"Content-Type": "application/json"})
+
+    try:
+        with urlopen(request, timeout=timeout) as response:
+            return json.load(response)
+    except HTTPError as error:
+        if error.code == 400:
+            raise ValueError(json.load(error).get("detail", "The query is invalid"))
+
+        raise ShardError(f"The shard at {url} failed with status {error.code}")
+    except (URLError, OSError) as error:
+        raise ShardError(f"The shard at {url} is unreachable: {error}")
+
+
+class HttpShard(Shard):
+    """A shard served by another instance of the service, through its /shard/search endpoint.
+
+    Requests are sent by a transport function, which a local stand-in for the worker may
+    replace, e.g. in tests.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        timeout: float = 30.0,
+        transport: Callable[[str, Dict, float], Dict] = post_json,
+    ) -> None:
+        """Initialize the HttpShard instance.
+
+        :param url: The base URL of the shard worker
+        :param timeout: The number of seconds to wait for the worker's response
+        :param transport: The function sending a JSON body to a URL and returning the JSON
+            response, which defaults to an HTTP POST request
+        """
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.transport = transport
+
+    def search(self, query_str: str, limit: int, model: str, mode: str) -> List[Tuple[int, float]]:
+        body = {"query_str": query_str, "limit": limit, "model": model, "mode": mode}
+        response = self.transport(f"{self.url}/shard/search", body, self.timeout)
+
+        return [(int(doc["doc_id"]), float(doc["score"])) for doc in response["documents"]]
+
+
+def merge_results(
+    results: List[List[Tuple[int, float]]], limit: int, offset: int = 0, mode: str = "ranked"
+) -> List[Tuple[int, float]]:
+    """Merge the best documents of every shard.
+
+    :param results: The documents of each shard, best first, or in document ID order for
+        Boolean queries
+    :param limit: The number of documents to return
+    :param offset: The number of best documents to skip
+    :param mode: The query mode
+    :return: A list of document IDs and their scores, best first with ties broken by
+        ascending document ID as within a single index, or in document ID order for
+        Boolean queries
+    """
+    if mode == "boolean":
+        merged = heapq.merge(*results, key=lambda result: result[0])
+    else:
+        merged = heapq.merge(*results, key=lambda result: (-result[1], result[0]))
+
+    return list(islice(merged, offset, offset + limit))
+
+
+class ShardBroker:
+    """Fans queries out to every shard of a collection and merges their best documents.
+
+    Shards are document-partitioned and weighted with the statistics of the whole
+    collection, so the best offset + limit documents of the collection are among the best
+    offset + limit documents of each shard, and the merged results are those of a single
+    index. Shards are searched concurrently by a pool of threads, which wait on the worker
+    processes or HTTP workers holding them.
+    """
+
+    def __init__(self, shards: List[Shard], workers: Optional[int] = None) -> None:
+        """Initialize the ShardBroker instance.
+
+        :param shards: The shards of the collection
+        :param workers: The number of shards searched at once, which defaults to all of them
+        """
+        self.shards = shards
+        self.executor = ThreadPoolExecutor(workers or len(shards), thread_name_prefix="shard")
+
+    @classmethod
+    def from_manifest(
+        cls,
+        manifest_file: str,
+        processor: Processor,
+        use_processes: bool = False,
+        postings_cache_bytes: int = 0,
+    ) -> "ShardBroker":
+        """Create a broker of every shard listed in a manifest, held by this machine.
+
+        :param manifest_file: The name of the manifest file of the collection
+        :param processor: The processor used to clean the tokens of queries
+        :param use_processes: Whether each shard is held by a worker process of its own
+            rather than by the broker's process
+        :param postings_cache_bytes: The size of each shard's postings cache, or 0 for none
+        :return: The broker
+        """
+        num_shards = len(read_manifest(manifest_file)["shards"])
+
+        if use_processes:
+            shards = [
+                ProcessShard(manifest_file, shard_id, processor, postings_cache_bytes)
+                for shard_id in range(num_shards)
+            ]
+        else:
+            shards = []
+
+            for shard_id in range(num_shards):
+                cache = PostingsCache(postings_cache_bytes) if postings_cache_bytes > 0 else None
+                shards.append(LocalShard(load_shard(manifest_file, shard_id, cache), processor))
+
+        return cls(shards)
+
+    def search(
+        self,
+        query_str: str,
+        limit: int = 10,
+        offset: int = 0,
+        model: str = "cosine",
+        mode: str = "ranked",
+    ) -> List[Tuple[int, float]]:
+        """Find the best documents of the collection for a query.
+
+        :param query_str: The query
+        :param limit: The number of documents to return
+        :param offset: The number of best documents to skip, or of matching documents in
+            document ID order for Boolean queries
+        :param model: The name of the ranking model
+        :param mode: The query mode, either ranked, conjunctive or boolean
+        :return: A list of document IDs and their scores, best first, or in document ID
+            order for Boolean queries
+        :raises ShardError: If a shard cannot answer the query
+        """
+        with metrics.timer("shard_fan_out", mode=mode):
+            futures = [
+                self.executor.submit(shard.search, query_str, offset + limit, model, mode)
+                for shard in self.shards
+            ]
+            results = [future.result() for future in futures]
+
+        return merge_results(results, limit, offset, mode)
+
+    def close(self) -> None:
+        """Stop searching and release every shard."""
+        self.executor.shutdown(wait=True)
+
+        for shard in self.shards:
+            shard.close()
@@ -0,0 +1,244 @@
+import json
+import logging
+import os
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from index.indexer import add_tokens, yield_batches
+from index.inverted_index import InvertedIndex
+from index.loaded_index import LoadedIndex
+from index.postings import RAW_ENCODING
+from index.postings_cache import PostingsCache
+from index.processor import Processor
+from index.query_executor import rank_parsed_query
+from index.query_parser import parse_boolean_query, parse_query
+from index.scorers import get_scorer
+from index.statistics_file import read_statistics, write_statistics_file
+from index.term_dictionary import TermDictionary
+
+
+logger = logging.getLogger(__name__)
+
+
+class GlobalStatistics(NamedTuple):
+    """The statistics of a whole collection, shared by each of its shards.
+
+    The term dictionary holds the document frequency, inverse document frequency and
+    collection frequency of every term of the collection, but no postings.
+    """
+
+    num_docs: int
+    total_tokens: int
+    term_dictionary: TermDictionary
+
+
+def shard_of(document_id: int, num_shards: int) -> int:
+    """Find the shard holding a document.
+
+    Documents are dealt to the shards by ID, so consecutive documents, which are often
+    similar in size and topic, are spread over every shard.
+
+    :param document_id: The ID of the document
+    :param num_shards: The number of shards
+    :return: The number of the shard, from 0 to num_shards - 1
+    """
+    return document_id % num_shards
+
+
+def merge_statistics(shards: List[InvertedIndex]) -> GlobalStatistics:
+    """Calculate the statistics of a collection from the in-memory indexes of its shards.
+
+    :param shards: The index of each shard
+    :return: The statistics of the whole collection
+    """
+    all_terms = []
+    all_counts = []
+    all_doc_frequencies = []
+
+    for shard in shards:
+        terms, counts, doc_frequencies = shard.term_statistics()
+        all_terms.extend(terms)
+        all_counts.extend(counts)
+        all_doc_frequencies.extend(doc_frequencies)
+
+    terms, term_positions = np.unique(np.asarray(all_terms, dtype=str), return_inverse=True)
+    counts = np.bincount(term_positions, weights=all_counts, minlength=len(terms))
+    doc_frequencies = np.bincount(term_positions, weights=all_doc_frequencies, minlength=len(terms))
+
+    num_docs = sum(shard.num_docs for shard in shards)
+    idfs = np.log2(num_docs / doc_frequencies) if len(terms) > 0 else np.zeros((0,))
+
+    # The dictionary only holds statistics, so its terms have no postings
+    no_postings = np.zeros((len(terms),), dtype=np.int64)
+    term_dictionary = TermDictionary(
+        terms,
+        doc_frequencies.astype(np.int64),
+        idfs,
+        no_postings,
+        no_postings,
+        collection_frequencies=counts.astype(np.int64),
+    )
+
+    return GlobalStatistics(num_docs, int(counts.sum()), term_dictionary)
+
+
+def build_shards(
+    documents: Iterable[Tuple[int, str]],
+    processor: Processor,
+    num_shards: int,
+    dataset_name: str,
+    output_directory: str = "./output_reports/shards",
+    index_class: type = InvertedIndex,
+    byte_order: str = "big",
+    encoding: str = RAW_ENCODING,
+    batch_size: int = 1000,
+) -> str:
+    """Index a collection as document-partitioned shards.
+
+    Each shard only holds the postings of its own documents, but its lexicon and document
+    weights are calculated from the statistics of the whole collection, which are also
+    written to a global statistics file. A query then ranks the documents of every shard
+    exactly as a single index of the collection would.
+
+    :param documents: An iterable of document IDs and their text, in document ID order
+    :param processor: The document processor object
+    :param num_shards: The number of shards
+    :param dataset_name: The name of the dataset
+    :param output_directory: The directory in which the files are written, apart from
+        those of unsharded indexes so the service never mistakes a shard for one
+    :param index_class: The class of the index built for each shard, which must be
+        InvertedIndex or one of its subclasses
+    :param byte_order: The ordering of the bytes to use within the inverted files
+        (either big or little)
+    :param encoding: The encoding of the postings lists
+    :param batch_size: The number of documents whose tokens are cleaned together
+    :return: The name of the manifest file listing the files of every shard
+    """
+    if num_shards < 1:
+        raise ValueError(f"A collection needs at least one shard, not {num_shards}")
+
+    # Shards are written with the options and statistics only InvertedIndex classes take
+    if not issubclass(index_class, InvertedIndex):
+        raise ValueError(f"Shards cannot be built with {index_class.__name__}")
+
+    shards = [index_class() for _ in range(num_shards)]
+
+    # Shards hold sparse document IDs, which are recorded rather than assumed
+    for shard in shards:
+        shard.doc_ids = []
+
+    for batch in yield_batches(documents, batch_size):
+        batch_tokens = processor.process_lines([text for _, text in batch])
+
+        for (document_id, _), tokens in zip(batch, batch_tokens):
+            shard = shards[shard_of(document_id, num_shards)]
+            add_tokens(shard, document_id, tokens)
+            shard.doc_ids.append(document_id)
+            shard.num_docs += 1
+
+    os.makedirs(output_directory, exist_ok=True)
+
+    statistics = merge_statistics(shards)
+    statistics_file = os.path.join(output_directory, f"{dataset_name}_global_statistics.bin")
+    write_statistics_file(
+        statistics_file,
+        statistics.term_dictionary,
+        np.zeros((0,), dtype=np.int64),
+        np.zeros((0,)),
+    )
+
+    manifest = {
+        "dataset": dataset_name,
+        "num_docs": statistics.num_docs,
+        "total_tokens": statistics.total_tokens,
+        "statistics_file": statistics_file,
+        "shards": [],
+    }
+
+    for shard_id, shard in enumerate(shards):
+        files = shard.generate_file(
+            f"{dataset_name}_shard{shard_id}", byte_order, encoding, output_directory, statistics
+        )
+        manifest["shards"].append(
+            {"shard_id": shard_id, "num_docs": shard.num_docs, "files": list(files)}
+        )
+
+        logger.info("Wrote shard %d of %d with %d documents", shard_id, num_shards, shard.num_docs)
+
+    manifest_file = os.path.join(output_directory, f"{dataset_name}_shards.json")
+
+    with open(manifest_file, "w") as file:
+        json.dump(manifest, file, indent=2)
+
+    return manifest_file
+
+
+def read_manifest(manifest_file: str) -> Dict:
+    """Read the manifest of a sharded collection.
+
+    :param manifest_file: The name of the manifest file
+    :return: The manifest, with the collection's statistics and the files of every shard
+    """
+    with open(manifest_file, "r") as file:
+        return json.load(file)
+
+
+def read_global_statistics(manifest: Dict) -> GlobalStatistics:
+    """Open the statistics of a sharded collection.
+
+    :param manifest: The manifest of the collection
+    :return: The statistics of the whole collection
+    """
+    term_dictionary, _ = read_statistics(manifest["statistics_file"])
+
+    return GlobalStatistics(manifest["num_docs"], manifest["total_tokens"], term_dictionary)
+
+
+def load_shard(
+    manifest_file: str, shard_id: int, postings_cache: Optional[PostingsCache] = None
+) -> LoadedIndex:
+    """Load one shard of a collection, ranked with the statistics of the whole collection.
+
+    :param manifest_file: The name of the manifest file
+    :param shard_id: The number of the shard
+    :param postings_cache: A cache of the shard's decoded postings lists
+    :return: The resident index of the shard
+    """
+    manifest = read_manifest(manifest_file)
+    files = manifest["shards"][shard_id]["files"]
+
+    return LoadedIndex(
+        *files, postings_cache=postings_cache, global_statistics=read_global_statistics(manifest)
+    )
+
+
+def search_shard(
+    index: LoadedIndex,
+    processor: Processor,
+    query_str: str,
+    limit: int,
+    model: str = "cosine",
+    mode: str = "ranked",
+) -> List[Tuple[int, float]]:
+    """Find the best documents of a shard for a query.
+
+    :param index: The resident index of the shard
+    :param processor: The processor used to clean the query's tokens
+    :param query_str: The query
+    :param limit: The number of documents to return
+    :param model: The name of the ranking model
+    :param mode: The query mode, either ranked, conjunctive or boolean
+    :return: A list of document IDs and their scores, best first, or in document ID order
+        with scores of 0 for Boolean queries
+    """
+    if mode == "boolean":
+        doc_ids = index.boolean_documents(parse_boolean_query(query_str, processor))[:limit]
+        return [(doc_id, 0.0) for doc_id in doc_ids.tolist()]
+
+    if mode not in ["ranked", "conjunctive"]:
+        raise ValueError(f"Unknown query mode '{mode}'")
+
+    scorer = get_scorer(model)
+
+    return rank_parsed_query(index, parse_query(query_str, processor), limit, 0, scorer, mode)
@@ -0,0 +1,378 @@
+from array import array
+import csv
+import heapq
+from itertools import groupby
+import logging
+import os
+import struct
+import tempfile
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from index.inverted_index import InvertedIndex, find_collection_doc_ids, generate_file_names
+from index.postings import (
+    RAW_ENCODING,
+    decode_postings,
+    encode_postings,
+    encode_postings_list,
+    stored_weights,
+)
+from index.statistics_file import convert_to_statistics_file
+
+
+logger = logging.getLogger(__name__)
+
+# The header of a term's record within a run: term length, collection count, postings count
+RECORD_HEADER = struct.Struct(">IQI")
+
+
+def write_record(file, term: str, count: int, doc_ids: np.ndarray, frequencies: np.ndarray) -> None:
+    """Write a term and its postings to a run file.
+
+    :param file: The run file, opened for binary writing
+    :param term: The term
+    :param count: The number of times the term appears in the collection
+    :param doc_ids: The document IDs of the postings
+    :param frequencies: The term frequency of each posting
+    :return: None
+    """
+    encoded_term = term.encode("utf-8")
+
+    file.write(RECORD_HEADER.pack(len(encoded_term), count, len(doc_ids)))
+    file.write(encoded_term)
+    file.write(encode_postings(doc_ids, frequencies))
+
+
+def yield_records(run_file: str) -> Tuple[str, int, np.ndarray, np.ndarray]:
+    """Yields the terms and postings of a run file in order.
+
+    :param run_file: The name of the run file
+    :return: A tuple of a term, its collection count, document IDs and term frequencies
+    """
+    with open(run_file, "rb") as file:
+        while True:
+            header = file.read(RECORD_HEADER.size)
+
+            if not header:
+                break
+
+            term_length, count, num_postings = RECORD_HEADER.unpack(header)
+            term = file.read(term_length).decode("utf-8")
+            doc_ids, frequencies = decode_postings(file.read(8 * num_postings))
+
+            yield term, count, doc_ids, frequencies
+
+
+class SpimiIndex:
+    """Builds an inverted index within a bounded amount of memory.
+
+    Terms and postings are collected in memory until the memory budget is reached, at which
+    point they are written to disk as a sorted run. Generating the index files merges the
+    runs, so peak memory depends on the budget rather than the size of the collection.
+    """
+
+    # Approximate memory cost of a term in the in-memory dictionary and of one posting
+    TERM_SIZE = 250
+    POSTING_SIZE = 8
+
+    def __init__(self, memory_budget: int = 256 * 1024**2, run_directory: Optional[str] = None):
+        """Initialize the SpimiIndex instance.
+
+        :param memory_budget: The approximate number of bytes the in-memory postings may
+            use before they are written to a run
+        :param run_directory: The directory in which to write runs, which defaults to a
+            new temporary directory, removed once the files are generated
+        """
+        self.memory_budget = memory_budget
+        self.run_directory = run_directory or tempfile.mkdtemp(prefix="spimi_")
+        self.owns_run_directory = run_directory is None
+        self.runs = []
+
+        # Each term maps to its collection count, document IDs and term frequencies
+        self.dictionary = {}
+        self.memory_used = 0
+        self.current_document = None
+
+        self.num_docs = 0
+
+        # The number of distinct terms, or None when it must be counted by merging the runs
+        self.__num_terms = 0
+
+        # The IDs of the indexed documents, when they are not numbered from 1 to num_docs
+        self.doc_ids = None
+
+        # The IDs of the documents seen so far, used when doc_ids is not set
+        self.seen_doc_ids = array("q")
+
+    @property
+    def num_terms(self) -> int:
+        """Find the number of distinct terms.
+
+        Terms are counted by merging the runs, when new terms were added since they were
+        last counted.
+
+        :return: The number of distinct terms
+        """
+        if self.__num_terms is None:
+            self.term_statistics()
+
+        return self.__num_terms
+
+    @num_terms.setter
+    def num_terms(self, num_terms: Optional[int]) -> None:
+        self.__num_terms = num_terms
+
+    def add_word(self, document_id: int, word: str) -> None:
+        """Add a word to the index.
+
+        Runs are only written between documents, so a document's postings are never split
+        across runs.
+
+        :param document_id: The ID of the document being processed
+        :param word: The word to be added
+        :return: None
+        """
+        if document_id != self.current_document:
+            if self.memory_used >= self.memory_budget:
+                self.flush()
+
+            self.current_document = document_id
+            self.seen_doc_ids.append(document_id)
+
+        entry = self.dictionary.get(word)
+
+        if entry is None:
+            entry = [0, array("I"), array("I")]
+            self.dictionary[word] = entry
+            self.memory_used += self.TERM_SIZE + len(word)
+
+            # The term may already be in a run
+            self.num_terms = None
+
+        entry[0] += 1
+        doc_ids, frequencies = entry[1], entry[2]
+
+        if doc_ids and doc_ids[-1] == document_id:
+            frequencies[-1] += 1
+        else:
+            doc_ids.append(document_id)
+            frequencies.append(1)
+            self.memory_used += self.POSTING_SIZE
+
+    def merge(self, other: InvertedIndex) -> None:
+        """Merge the partial index of the next batch of documents.
+
+        :param other: The partial index of documents following those already added
+        :return: None
+        """
+        postings_doc_ids = []
+
+        for word, count, doc_ids, frequencies in other.yield_postings():
+            postings_doc_ids.append(doc_ids)
+            entry = self.dictionary.get(word)
+
+            if entry is None:
+                entry = [0, array("I"), array("I")]
+                self.dictionary[word] = entry
+                self.memory_used += self.TERM_SIZE + len(word)
+                self.num_terms = None
+
+            entry[0] += count
+            entry[1].extend(doc_ids.tolist())
+            entry[2].extend(frequencies.tolist())
+
+            self.memory_used += self.POSTING_SIZE * len(doc_ids)
+
+        # Partial indexes only know the IDs of their documents through their postings
+        if other.doc_ids is not None:
+            self.seen_doc_ids.extend(other.doc_ids)
+        elif postings_doc_ids:
+            self.seen_doc_ids.extend(np.unique(np.concatenate(postings_doc_ids)).tolist())
+
+        self.num_docs += other.num_docs
+
+        if self.memory_used >= self.memory_budget:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the in-memory postings to a new sorted run."""
+        if not self.dictionary:
+            return
+
+        # A temporary run directory is removed whenever the files are generated
+        os.makedirs(self.run_directory, exist_ok=True)
+        run_file = os.path.join(self.run_directory, f"run_{len(self.runs)}.bin")
+
+        with open(run_file, "wb") as file:
+            for term in sorted(self.dictionary.keys()):
+                count, doc_ids, frequencies = self.dictionary[term]
+                write_record(file, term, count, np.array(doc_ids), np.array(frequencies))
+
+        logger.info(f"Wrote run {run_file} of {len(self.dictionary)} terms")
+
+        self.runs.append(run_file)
+        self.dictionary = {}
+        self.memory_used = 0
+
+    def yield_dictionary_records(self) -> Tuple[str, int, np.ndarray, np.ndarray]:
+        """Yields the terms and postings still in memory, in the same order as a run.
+
+        :return: A tuple of a term, its collection count, document IDs and term frequencies
+        """
+        for term in sorted(self.dictionary.keys()):
+            count, doc_ids, frequencies = self.dictionary[term]
+            yield term, count, np.array(doc_ids, dtype=np.int64), np.array(frequencies)
+
+    def yield_merged_records(self) -> Tuple[str, int, np.ndarray, np.ndarray]:
+        """Yields every term and its complete postings by merging the runs.
+
+        Postings that were not written to a run yet are merged last, since they belong to
+        the latest documents.
+
+        :return: A tuple of a term, its collection count, document IDs and term frequencies
+        """
+        runs = [yield_records(run_file) for run_file in self.runs]
+        runs.append(self.yield_dictionary_records())
+
+        # Runs hold consecutive documents and equal terms are merged in run order, so the
+        # concatenated postings stay sorted by document ID
+        merged = heapq.merge(*runs, key=lambda record: record[0])
+
+        for term, records in groupby(merged, key=lambda record: record[0]):
+            records = list(records)
+
+            yield (
+                term,
+                sum(record[1] for record in records),
+                np.concatenate([record[2] for record in records]),
+                np.concatenate([record[3] for record in records]),
+            )
+
+    def term_statistics(self) -> Tuple[List[str], List[int], List[int]]:
+        """Find the collection and document frequency of every term.
+
+        The runs are merged without writing the postings still in memory, and the terms
+        are counted along the way.
+
+        :return: A tuple of the terms, their collection counts and document frequencies
+        """
+        terms = []
+        counts = []
+        doc_frequencies = []
+
+        for term, count, doc_ids, _ in self.yield_merged_records():
+            terms.append(term)
+            counts.append(count)
+            doc_frequencies.append(len(doc_ids))
+
+        self.num_terms = len(terms)
+
+        return terms, counts, doc_frequencies
+
+    def generate_file(
+        self,
+        dataset_name: str,
+        byte_order: str = "big",
+        encoding: str = RAW_ENCODING,
+    ) -> Tuple[str, str, str]:
+        """Generate lexicon and inverted files by merging the runs.
+
+        The output files have the same format as those of InvertedIndex.generate_file. Terms
+        are written in sorted order.
+
+        :param dataset_name: The name of the dataset
+        :param byte_order: The ordering of the bytes to use within the inverted file
+            (either big or little)
+        :param encoding: The encoding of the postings lists
+        :return: A tuple containing the names of the generated files
+        """
+        self.flush()
+
+        lexicon_file, inverted_file, document_length_file = generate_file_names(dataset_name)
+        os.makedirs(self.run_directory, exist_ok=True)
+        merged_file = os.path.join(self.run_directory, "merged.bin")
+
+        if self.doc_ids is not None:
+            collection_doc_ids = np.unique(np.array(self.doc_ids, dtype=np.int64))
+        else:
+            collection_doc_ids = find_collection_doc_ids(
+                [np.frombuffer(self.seen_doc_ids, dtype=np.int64)], self.num_docs
+            )
+
+        doc_vector_lengths = np.zeros((len(collection_doc_ids),))
+        doc_token_lengths = np.zeros((len(collection_doc_ids),), dtype=np.int64)
+        self.num_terms = 0
+
+        # The first pass merges the runs and accumulates the document vector lengths
+        with open(merged_file, "wb") as file:
+            for term, count, doc_ids, frequencies in self.yield_merged_records():
+                idf = np.log2(self.num_docs / len(doc_ids))
+                positions = np.searchsorted(collection_doc_ids, doc_ids)
+                np.add.at(doc_vector_lengths, positions, np.square(frequencies * idf))
+                np.add.at(doc_token_lengths, positions, frequencies)
+
+                write_record(file, term, count, doc_ids, frequencies)
+                self.num_terms += 1
+
+        doc_vector_lengths = np.sqrt(doc_vector_lengths)
+
+        # The second pass writes the postings, whose maximum weights need the lengths
+        with open(inverted_file, "wb") as f, open(lexicon_file, "w", newline="") as lexicon:
+            writer = csv.writer(lexicon)
+            writer.writerow(
+                [
+                    "term",
+                    "document_frequency",
+                    "inverse_document_frequency",
+                    "offset",
+                    "max_score",
+                    "collection_frequency",
+                    "encoding",
+                ]
+            )
+
+            # This variable tracks the offset within the index file
+            offset = 0
+
+            for term, count, doc_ids, frequencies in yield_records(merged_file):
+                idf = np.log2(self.num_docs / len(doc_ids))
+
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    lengths = doc_vector_lengths[np.searchsorted(collection_doc_ids, doc_ids)]
+                    weights = frequencies * idf / lengths
+                weights = stored_weights(np.nan_to_num(weights), encoding)
+
+                writer.writerow(
+                    [
+                        term,
+                        len(doc_ids),
+                        float(idf),
+                        offset,
+                        float(weights.max()),
+                        count,
+                        encoding,
+                    ]
+                )
+
+                buffer = encode_postings_list(doc_ids, frequencies, weights, byte_order, encoding)
+                f.write(buffer)
+
+                offset += len(buffer)
+
+        doc_lengths_df = pd.DataFrame(
+            zip(collection_doc_ids, doc_vector_lengths, doc_token_lengths),
+            columns=["doc_id", "euclidean_length", "token_length"],
+        )
+        doc_lengths_df.to_csv(document_length_file, index=False)
+        convert_to_statistics_file(lexicon_file, inverted_file, document_length_file)
+
+        for run_file in self.runs + [merged_file]:
+            os.remove(run_file)
+        self.runs = []
+
+        if self.owns_run_directory:
+            os.rmdir(self.run_directory)
+
+        return lexicon_file, inverted_file, document_length_file
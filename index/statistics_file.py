@@ -0,0 +1,408 @@
+from bisect import bisect_left
+import os
+import sys
+from typing import List, NamedTuple, Optional, Tuple
+import zlib
+
+import numpy as np
+
+from index.postings import IMPACT_8_ENCODING, IMPACT_16_ENCODING, RAW_ENCODING, VBYTE_ENCODING
+from index.term_dictionary import TermDictionary, TermEntry, read_lexicon
+
+
+MAGIC = b"TRESTATS"
+VERSION = 1
+
+# The postings encodings, stored as their position within this list
+ENCODINGS = [RAW_ENCODING, VBYTE_ENCODING, IMPACT_8_ENCODING, IMPACT_16_ENCODING]
+
+# The sections of the file and their element types, in file order; term sections are in
+# sorted term order and document sections in document ID order
+SECTIONS = [
+    ("string_offsets", "u8"),
+    ("strings", "u1"),
+    ("term_ids", "u4"),
+    ("doc_frequencies", "u4"),
+    ("collection_frequencies", "u8"),
+    ("idfs", "f8"),
+    ("max_scores", "f8"),
+    ("offsets", "u8"),
+    ("lengths", "u8"),
+    ("encodings", "u1"),
+    ("doc_ids", "i8"),
+    ("euclidean_lengths", "f8"),
+    ("token_lengths", "u8"),
+]
+
+# Sections start at multiples of this many bytes so they can be viewed in place
+ALIGNMENT = 8
+
+
+class DocumentStatistics(NamedTuple):
+    """The per-document arrays of a statistics file."""
+
+    doc_ids: np.ndarray
+    euclidean_lengths: np.ndarray
+    token_lengths: Optional[np.ndarray]
+    total_tokens: int
+
+
+def statistics_file_name(lexicon_file: str) -> str:
+    """Find the name of the binary statistics file written alongside a lexicon file.
+
+    :param lexicon_file: The name of the lexicon file
+    :return: The name of the statistics file
+    """
+    directory, name = os.path.split(lexicon_file)
+    name = name.replace("_lexicon_", "_statistics_").replace(".csv", ".bin")
+
+    return os.path.join(directory, name)
+
+
+def prologue_dtype() -> np.dtype:
+    """Build the record type of the start of the file, which is independent of byte order.
+
+    :return: A structured dtype of the magic bytes and the byte order character
+    """
+    return np.dtype([("magic", "S8"), ("byte_order", "S1"), ("padding", "S7")])
+
+
+def header_dtype(byte_order: str = "big") -> np.dtype:
+    """Build the record type of the header following the prologue.
+
+    :param byte_order: The ordering of the bytes used within the file (either big or little)
+    :return: A structured dtype of the version, counts, section table and a checksum of
+        the rest of the header
+    """
+    prefix = ">" if byte_order == "big" else "<"
+    section_type = np.dtype(
+        [("offset", f"{prefix}u8"), ("size", f"{prefix}u8"), ("checksum", f"{prefix}u4")]
+    )
+
+    return np.dtype(
+        [
+            ("version", f"{prefix}u4"),
+            ("num_terms", f"{prefix}u8"),
+            ("num_docs", f"{prefix}u8"),
+            ("total_tokens", f"{prefix}u8"),
+            ("has_token_lengths", "u1"),
+            ("sections", section_type, (len(SECTIONS),)),
+            ("checksum", f"{prefix}u4"),
+        ]
+    )
+
+
+def write_statistics_file(
+    statistics_file: str,
+    term_dictionary: TermDictionary,
+    doc_ids: np.ndarray,
+    euclidean_lengths: np.ndarray,
+    token_lengths: Optional[np.ndarray] = None,
+    byte_order: str = sys.byteorder,
+) -> str:
+    """Write a lexicon and its collection statistics as a binary file.
+
+    The file defaults to the byte order of the machine, so its arrays can be used in place.
+
+    :param statistics_file: The name of the statistics file
+    :param term_dictionary: The term dictionary of the index
+    :param doc_ids: The sorted IDs of every document in the collection
+    :param euclidean_lengths: The Euclidean length of every document
+    :param token_lengths: The number of tokens of every document, if they were recorded
+    :param byte_order: The ordering of the bytes to use within the file (either big or little)
+    :return: The name of the statistics file
+    """
+    prefix = ">" if byte_order == "big" else "<"
+
+    encoded_terms = [term.encode("utf-8") for term in term_dictionary.terms.tolist()]
+    string_offsets = np.cumsum([0] + [len(term) for term in encoded_terms])
+
+    arrays = {
+        "string_offsets": string_offsets,
+        "strings": np.frombuffer(b"".join(encoded_terms), dtype=np.uint8),
+        "term_ids": term_dictionary.term_ids,
+        "doc_frequencies": term_dictionary.doc_frequencies,
+        "collection_frequencies": term_dictionary.collection_frequencies,
+        "idfs": term_dictionary.idfs,
+        "max_scores": term_dictionary.max_scores,
+        "offsets": term_dictionary.offsets,
+        "lengths": term_dictionary.lengths,
+        "encodings": [ENCODINGS.index(encoding) for encoding in term_dictionary.encodings],
+        "doc_ids": doc_ids,
+        "euclidean_lengths": euclidean_lengths,
+        "token_lengths": token_lengths if token_lengths is not None else [],
+    }
+
+    header_type = header_dtype(byte_order)
+    header = np.zeros((1,), dtype=header_type)
+    header["version"] = VERSION
+    header["num_terms"] = len(term_dictionary)
+    header["num_docs"] = len(doc_ids)
+    header["total_tokens"] = int(np.sum(token_lengths)) if token_lengths is not None else 0
+    header["has_token_lengths"] = token_lengths is not None
+
+    sections = []
+    position = prologue_dtype().itemsize + header_type.itemsize
+
+    for i, (name, element_type) in enumerate(SECTIONS):
+        position += -position % ALIGNMENT
+        data = np.asarray(arrays[name]).astype(f"{prefix}{element_type}").tobytes()
+
+        header["sections"][0, i] = (position, len(data), zlib.crc32(data))
+        sections.append((position, data))
+        position += len(data)
+
+    header["checksum"] = zlib.crc32(header.tobytes()[: -np.dtype("u4").itemsize])
+
+    prologue = np.array([(MAGIC, b">" if byte_order == "big" else b"<", b"")], prologue_dtype())
+
+    with open(statistics_file, "wb") as file:
+        file.write(prologue.tobytes())
+        file.write(header.tobytes())
+
+        for section_position, data in sections:
+            file.write(b"\0" * (section_position - file.tell()))
+            file.write(data)
+
+    return statistics_file
+
+
+def convert_to_statistics_file(
+    lexicon_file: str,
+    inverted_file: str,
+    document_length_file: str,
+    byte_order: str = sys.byteorder,
+) -> str:
+    """Write the binary statistics file of an index from its CSV files.
+
+    :param lexicon_file: The name of the lexicon file
+    :param inverted_file: The name of the inverted file
+    :param document_length_file: The name of the document length file
+    :param byte_order: The ordering of the bytes to use within the file (either big or little)
+    :return: The name of the statistics file
+    """
+    import pandas as pd
+
+    term_dictionary = TermDictionary.from_dataframe(
+        read_lexicon(lexicon_file), os.path.getsize(inverted_file)
+    )
+    doc_lengths = pd.read_csv(document_length_file)
+
+    return write_statistics_file(
+        statistics_file_name(lexicon_file),
+        term_dictionary,
+        doc_lengths["doc_id"].values,
+        doc_lengths["euclidean_length"].values,
+        doc_lengths["token_length"].values if "token_length" in doc_lengths.columns else None,
+        byte_order,
+    )
+
+
+class EncodedTerms:
+    """A read-only sequence of the UTF-8 encoded terms of a statistics file."""
+
+    def __init__(self, string_offsets: np.ndarray, strings: np.ndarray) -> None:
+        """Initialize the EncodedTerms instance.
+
+        :param string_offsets: The offset of every term within the strings, and their end
+        :param strings: The concatenated encoded terms
+        """
+        self.string_offsets = string_offsets
+        self.strings = strings
+
+    def __getitem__(self, position: int) -> bytes:
+        start, end = self.string_offsets[position], self.string_offsets[position + 1]
+        return self.strings[start:end].tobytes()
+
+    def __len__(self) -> int:
+        return len(self.string_offsets) - 1
+
+
+class StatisticsFile:
+    """A memory-mapped binary lexicon and collection statistics file.
+
+    Opening the file only reads and checks its header, so the time it takes does not depend
+    on the size of the vocabulary or the collection.
+    """
+
+    def __init__(self, statistics_file: str, verify: bool = False) -> None:
+        """Initialize the StatisticsFile instance.
+
+        :param statistics_file: The name of the statistics file
+        :param verify: Whether to check the checksum of every section, which reads the
+            whole file
+        """
+        self.statistics_file = statistics_file
+        self.map = np.memmap(statistics_file, dtype=np.uint8, mode="r")
+
+        prologue = np.frombuffer(self.map, dtype=prologue_dtype(), count=1)[0]
+
+        if prologue["magic"] != MAGIC:
+            raise ValueError(f"{statistics_file} is not a statistics file")
+
+        self.byte_order = "big" if prologue["byte_order"] == b">" else "little"
+        header_type = header_dtype(self.byte_order)
+        header_bytes = self.map[prologue_dtype().itemsize :][: header_type.itemsize]
+        self.header = np.frombuffer(header_bytes, dtype=header_type, count=1)[0]
+
+        if self.header["version"] != VERSION:
+            raise ValueError(f"Unsupported statistics file version {self.header['version']}")
+
+        if zlib.crc32(header_bytes[:-4].tobytes()) != self.header["checksum"]:
+            raise ValueError(f"The header of {statistics_file} is corrupt")
+
+        if verify:
+            self.verify()
+
+    def section(self, name: str) -> np.ndarray:
+        """View a section of the file without copying it.
+
+        :param name: The name of the section
+        :return: The section's array
+        """
+        position = [section_name for section_name, _ in SECTIONS].index(name)
+        offset, size, _ = self.header["sections"][position]
+        prefix = ">" if self.byte_order == "big" else "<"
+        element_type = np.dtype(f"{prefix}{SECTIONS[position][1]}")
+
+        return np.frombuffer(
+            self.map,
+            dtype=element_type,
+            count=int(size) // element_type.itemsize,
+            offset=int(offset),
+        )
+
+    def verify(self) -> None:
+        """Check the checksum of every section.
+
+        :return: None
+        """
+        for (name, _), (offset, size, checksum) in zip(SECTIONS, self.header["sections"]):
+            if zlib.crc32(self.map[int(offset) : int(offset + size)].tobytes()) != checksum:
+                raise ValueError(f"The {name} section of {self.statistics_file} is corrupt")
+
+    def term_dictionary(self) -> "BinaryTermDictionary":
+        """Create a term dictionary backed by the file.
+
+        :return: The term dictionary
+        """
+        return BinaryTermDictionary(self)
+
+    def document_statistics(self) -> DocumentStatistics:
+        """Find the per-document arrays of the file.
+
+        :return: The document IDs, Euclidean lengths and token lengths
+        """
+        return DocumentStatistics(
+            self.section("doc_ids"),
+            self.section("euclidean_lengths"),
+            self.section("token_lengths") if self.header["has_token_lengths"] else None,
+            int(self.header["total_tokens"]),
+        )
+
+
+class BinaryTermDictionary:
+    """Maps terms to their lexicon entries by binary search over a statistics file.
+
+    The arrays are views of the memory map, so only the pages touched by lookups are read.
+    """
+
+    def __init__(self, statistics_file: StatisticsFile) -> None:
+        """Initialize the BinaryTermDictionary instance.
+
+        :param statistics_file: The opened statistics file
+        """
+        self.encoded_terms = EncodedTerms(
+            statistics_file.section("string_offsets"), statistics_file.section("strings")
+        )
+        self.term_ids = statistics_file.section("term_ids")
+        self.doc_frequencies = statistics_file.section("doc_frequencies")
+        self.collection_frequencies = statistics_file.section("collection_frequencies")
+        self.idfs = statistics_file.section("idfs")
+        self.max_scores = statistics_file.section("max_scores")
+        self.offsets = statistics_file.section("offsets")
+        self.lengths = statistics_file.section("lengths")
+        self.encoding_codes = statistics_file.section("encodings")
+
+        self.__terms = None
+
+    @property
+    def terms(self) -> np.ndarray:
+        """Decode every term, which takes time proportional to the vocabulary size.
+
+        :return: The sorted terms
+        """
+        if self.__terms is None:
+            terms = [term.decode("utf-8") for term in self.encoded_terms]
+            self.__terms = np.asarray(terms, dtype=str)
+
+        return self.__terms
+
+    def lookup(self, term: str) -> Optional[TermEntry]:
+        """Look up a term.
+
+        :param term: The processed term to look up
+        :return: The term's lexicon entry, or None if the term is not in the dictionary
+        """
+        # UTF-8 bytes sort in the same order as the code points of the sorted terms
+        encoded_term = term.encode("utf-8")
+        position = bisect_left(self.encoded_terms, encoded_term)
+
+        if position == len(self.encoded_terms) or self.encoded_terms[position] != encoded_term:
+            return None
+
+        return self.entry(position)
+
+    def entry(self, position: int) -> TermEntry:
+        """Find the lexicon entry at a position of the sorted terms.
+
+        :param position: The position of the term within the sorted terms
+        :return: The term's lexicon entry
+        """
+        return TermEntry(
+            int(self.term_ids[position]),
+            int(self.doc_frequencies[position]),
+            float(self.idfs[position]),
+            int(self.offsets[position]),
+            int(self.lengths[position]),
+            float(self.max_scores[position]),
+            ENCODINGS[self.encoding_codes[position]],
+            int(self.collection_frequencies[position]),
+        )
+
+    def __contains__(self, term: str) -> bool:
+        return self.lookup(term) is not None
+
+    def __len__(self) -> int:
+        return len(self.encoded_terms)
+
+    def arrays(self) -> List[np.ndarray]:
+        """List the memory-mapped arrays holding the dictionary.
+
+        :return: The encoded terms and their statistics
+        """
+        return [
+            self.encoded_terms.string_offsets,
+            self.encoded_terms.strings,
+            self.term_ids,
+            self.doc_frequencies,
+            self.collection_frequencies,
+            self.idfs,
+            self.max_scores,
+            self.offsets,
+            self.lengths,
+            self.encoding_codes,
+        ]
+
+
+def read_statistics(
+    statistics_file: str, verify: bool = False
+) -> Tuple[BinaryTermDictionary, DocumentStatistics]:
+    """Open a statistics file.
+
+    :param statistics_file: The name of the statistics file
+    :param verify: Whether to check the checksum of every section
+    :return: A tuple of the term dictionary and the per-document arrays
+    """
+    opened = StatisticsFile(statistics_file, verify)
+    return opened.term_dictionary(), opened.document_statistics()
@@ -0,0 +1,184 @@
+import os
+from typing import TYPE_CHECKING, Iterable, List, NamedTuple, Optional
+
+import numpy as np
+
+from index.postings import RAW_ENCODING
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+class TermEntry(NamedTuple):
+    """The lexicon entry of a single term."""
+
+    term_id: int
+    document_frequency: int
+    inverse_document_frequency: float
+    offset: int
+    length: int
+    max_score: float = np.inf
+    encoding: str = RAW_ENCODING
+    collection_frequency: int = 0
+
+
+class TermDictionary:
+    """Maps terms to their lexicon entries.
+
+    Terms are kept in a sorted string array alongside parallel arrays of their statistics,
+    so a lookup is a binary search rather than a scan over the whole vocabulary.
+    """
+
+    def __init__(
+        self,
+        terms: Iterable[str],
+        doc_frequencies: Iterable[int],
+        idfs: Iterable[float],
+        offsets: Iterable[int],
+        lengths: Iterable[int],
+        max_scores: Optional[Iterable[float]] = None,
+        encodings: Optional[Iterable[str]] = None,
+        collection_frequencies: Optional[Iterable[int]] = None,
+    ) -> None:
+        """Initialize the TermDictionary instance.
+
+        :param terms: The terms, in lexicon order
+        :param doc_frequencies: The document frequency of each term
+        :param idfs: The inverse document frequency of each term
+        :param offsets: The offset of each term's postings within the inverted file
+        :param lengths: The number of bytes of each term's postings within the inverted file
+        :param max_scores: The largest normalized document weight of each term, if it was
+            recorded when the index was built
+        :param encodings: The encoding of each term's postings, which defaults to the raw
+            format of indexes built before compression was introduced
+        :param collection_frequencies: The number of occurrences of each term in the
+            collection, or 0 for lexicons that did not record them
+        """
+        terms = np.asarray(list(terms), dtype=str)
+        order = np.argsort(terms, kind="stable")
+
+        self.terms = terms[order]
+        self.term_ids = order.astype(np.int64)
+        self.doc_frequencies = np.asarray(doc_frequencies, dtype=np.int64)[order]
+        self.idfs = np.asarray(idfs, dtype=np.float64)[order]
+        self.offsets = np.asarray(offsets, dtype=np.int64)[order]
+        self.lengths = np.asarray(lengths, dtype=np.int64)[order]
+
+        # Without recorded maxima a term's contribution cannot be bounded
+        if max_scores is None:
+            self.max_scores = np.full((len(order),), np.inf)
+        else:
+            self.max_scores = np.asarray(max_scores, dtype=np.float64)[order]
+
+        if encodings is None:
+            self.encodings = np.full((len(order),), RAW_ENCODING)
+        else:
+            self.encodings = np.asarray(list(encodings), dtype=str)[order]
+
+        if collection_frequencies is None:
+            self.collection_frequencies = np.zeros((len(order),), dtype=np.int64)
+        else:
+            self.collection_frequencies = np.asarray(collection_frequencies, dtype=np.int64)[order]
+
+    @classmethod
+    def from_dataframe(cls, lexicon: "pd.DataFrame", inverted_file_size: int) -> "TermDictionary":
+        """Create a term dictionary from a lexicon DataFrame.
+
+        :param lexicon: The lexicon, as written by InvertedIndex.generate_file
+        :param inverted_file_size: The size of the inverted file in bytes
+        :return: The term dictionary
+        """
+        offsets = lexicon["offset"].values.astype(np.int64)
+
+        # The postings of the last term run until the end of the inverted file
+        lengths = np.diff(offsets, append=inverted_file_size)
+
+        return cls(
+            lexicon["term"].values,
+            lexicon["document_frequency"].values,
+            lexicon["inverse_document_frequency"].values,
+            offsets,
+            lengths,
+            lexicon["max_score"].values if "max_score" in lexicon.columns else None,
+            lexicon["encoding"].values if "encoding" in lexicon.columns else None,
+            (
+                lexicon["collection_frequency"].values
+                if "collection_frequency" in lexicon.columns
+                else None
+            ),
+        )
+
+    @classmethod
+    def from_files(cls, lexicon_file: str, inverted_file: str) -> "TermDictionary":
+        """Create a term dictionary from a lexicon file and its inverted file.
+
+        :param lexicon_file: The name of the lexicon file
+        :param inverted_file: The name of the inverted file
+        :return: The term dictionary
+        """
+        return cls.from_dataframe(read_lexicon(lexicon_file), os.path.getsize(inverted_file))
+
+    def lookup(self, term: str) -> Optional[TermEntry]:
+        """Look up a term.
+
+        :param term: The processed term to look up
+        :return: The term's lexicon entry, or None if the term is not in the dictionary
+        """
+        position = int(np.searchsorted(self.terms, term))
+
+        if position == len(self.terms) or self.terms[position] != term:
+            return None
+
+        return self.entry(position)
+
+    def entry(self, position: int) -> TermEntry:
+        """Find the lexicon entry at a position of the sorted term array.
+
+        :param position: The position of the term within the sorted term array
+        :return: The term's lexicon entry
+        """
+        return TermEntry(
+            int(self.term_ids[position]),
+            int(self.doc_frequencies[position]),
+            float(self.idfs[position]),
+            int(self.offsets[position]),
+            int(self.lengths[position]),
+            float(self.max_scores[position]),
+            str(self.encodings[position]),
+            int(self.collection_frequencies[position]),
+        )
+
+    def __contains__(self, term: str) -> bool:
+        return self.lookup(term) is not None
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def arrays(self) -> List[np.ndarray]:
+        """List the arrays holding the dictionary.
+
+        :return: The terms and their statistics
+        """
+        return [
+            self.terms,
+            self.term_ids,
+            self.doc_frequencies,
+            self.idfs,
+            self.offsets,
+            self.lengths,
+            self.max_scores,
+            self.encodings,
+            self.collection_frequencies,
+        ]
+
+
+def read_lexicon(lexicon_file: str) -> "pd.DataFrame":
+    """Read a lexicon file.
+
+    :param lexicon_file: The name of the lexicon file
+    :return: A DataFrame of the lexicon
+    """
+    import pandas as pd
+
+    # Terms such as "nan" or "null" must not be parsed as missing values
+    return pd.read_csv(lexicon_file, keep_default_na=False, dtype={"term": str})
@@ -0,0 +1,291 @@
+from bisect import bisect_left
+from contextlib import nullcontext
+import os
+from threading import Lock
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+
+# The prefix of the name of every exported metric
+METRICS_PREFIX = "text_retrieval"
+
+# The upper bounds, in seconds, of the buckets of the latency histograms
+LATENCY_BUCKETS = (
+    0.0001,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+# A timer that does nothing, shared by every timed block while metrics are disabled
+NULL_TIMER = nullcontext()
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """The number of observations within each latency bucket, and their sum."""
+
+    def __init__(self) -> None:
+        """Initialize the Histogram instance."""
+        self.bucket_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float) -> None:
+        """Record a single observation.
+
+        :param seconds: The observed duration
+        :return: None
+        """
+        self.bucket_counts[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def merge(self, other: "Histogram") -> None:
+        """Add the observations of another histogram.
+
+        :param other: The histogram whose observations are added
+        :return: None
+        """
+        self.bucket_counts = [a + b for a, b in zip(self.bucket_counts, other.bucket_counts)]
+        self.count += other.count
+        self.sum += other.sum
+
+
+class Timer:
+    """A context manager recording the duration of a block in a histogram."""
+
+    __slots__ = ("metrics", "name", "labels", "start")
+
+    def __init__(self, metrics: "Metrics", name: str, labels: Labels) -> None:
+        """Initialize the Timer instance.
+
+        :param metrics: The metrics in which to record the duration
+        :param name: The name of the histogram
+        :param labels: The labels of the histogram
+        """
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+        self.start = 0.0
+
+    def __enter__(self) -> "Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.metrics.observe(self.name, time.perf_counter() - self.start, self.labels)
+
+
+class MetricsDelta(NamedTuple):
+    """The counters and histograms recorded by a process over a span of work."""
+
+    counters: Dict[str, Dict[Labels, float]]
+    histograms: Dict[str, Dict[Labels, Histogram]]
+
+
+class Metrics:
+    """Counters and latency histograms of the work done by the engine.
+
+    While disabled, timers and counters return immediately without recording anything,
+    so instrumented code costs little more than a method call. Metrics are rendered in the
+    Prometheus text exposition format.
+    """
+
+    def __init__(self, enabled: bool = False) -> None:
+        """Initialize the Metrics instance.
+
+        :param enabled: Whether or not to record metrics
+        """
+        self.enabled = enabled
+        self.lock = Lock()
+        self.counters: Dict[str, Dict[Labels, float]] = {}
+        self.histograms: Dict[str, Dict[Labels, Histogram]] = {}
+
+    def timer(self, name: str, **labels: str):
+        """Time a block of code, e.g. with metrics.timer("scoring"): ...
+
+        :param name: The name of the histogram, in seconds
+        :param labels: The labels of the histogram
+        :return: A context manager
+        """
+        if not self.enabled:
+            return NULL_TIMER
+
+        return Timer(self, name, tuple(sorted(labels.items())))
+
+    def observe(self, name: str, seconds: float, labels: Labels = ()) -> None:
+        """Record a duration in a histogram.
+
+        :param name: The name of the histogram, in seconds
+        :param seconds: The duration
+        :param labels: The labels of the histogram, as sorted pairs
+        :return: None
+        """
+        if not self.enabled:
+            return
+
+        with self.lock:
+            histograms = self.histograms.setdefault(name, {})
+
+            if labels not in histograms:
+                histograms[labels] = Histogram()
+
+            histograms[labels].observe(seconds)
+
+    def increment(self, name: str, value: float = 1, **labels: str) -> None:
+        """Add to a counter.
+
+        :param name: The name of the counter
+        :param value: The amount to add
+        :param labels: The labels of the counter
+        :return: None
+        """
+        if not self.enabled:
+            return
+
+        key = tuple(sorted(labels.items()))
+
+        with self.lock:
+            counters = self.counters.setdefault(name, {})
+            counters[key] = counters.get(key, 0) + value
+
+    def drain(self) -> MetricsDelta:
+        """Take every metric recorded since the last drain, e.g. within a worker process.
+
+        :return: The recorded counters and histograms, which are discarded here
+        """
+        with self.lock:
+            delta = MetricsDelta(self.counters, self.histograms)
+            self.counters = {}
+            self.histograms = {}
+
+        return delta
+
+    def merge(self, delta: MetricsDelta) -> None:
+        """Add the metrics recorded elsewhere, e.g. by a worker process.
+
+        :param delta: The counters and histograms to add, see drain
+        :return: None
+        """
+        if not self.enabled:
+            return
+
+        with self.lock:
+            for name, counters in delta.counters.items():
+                own_counters = self.counters.setdefault(name, {})
+
+                for labels, value in counters.items():
+                    own_counters[labels] = own_counters.get(labels, 0) + value
+
+            for name, histograms in delta.histograms.items():
+                own_histograms = self.histograms.setdefault(name, {})
+
+                for labels, histogram in histograms.items():
+                    if labels not in own_histograms:
+                        own_histograms[labels] = Histogram()
+
+                    own_histograms[labels].merge(histogram)
+
+    def reset(self) -> None:
+        """Discard every recorded metric."""
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def render(self, gauges: Optional[Dict[str, float]] = None) -> str:
+        """Render the metrics in the Prometheus text exposition format.
+
+        :param gauges: Current values to export alongside the recorded metrics, such as
+            the sizes of caches
+        :return: The text of the metrics
+        """
+        lines = []
+
+        with self.lock:
+            for name, counters in sorted(self.counters.items()):
+                metric = f"{METRICS_PREFIX}_{name}_total"
+                lines.append(f"# TYPE {metric} counter")
+
+                for labels, value in sorted(counters.items()):
+                    lines.append(f"{metric}{format_labels(labels)} {format_value(value)}")
+
+            for name, histograms in sorted(self.histograms.items()):
+                metric = f"{METRICS_PREFIX}_{name}_seconds"
+                lines.append(f"# TYPE {metric} histogram")
+
+                for labels, histogram in sorted(histograms.items()):
+                    lines.extend(render_histogram(metric, labels, histogram))
+
+        for name, value in sorted((gauges or {}).items()):
+            metric = f"{METRICS_PREFIX}_{name}"
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {format_value(value)}")
+
+        return "\n".join(lines) + "\n"
+
+
+def render_histogram(metric: str, labels: Labels, histogram: Histogram) -> List[str]:
+    """Render the cumulative buckets, sum and count of a histogram.
+
+    :param metric: The name of the histogram
+    :param labels: The labels of the histogram
+    :param histogram: The histogram
+    :return: The lines of the histogram
+    """
+    lines = []
+    cumulative = 0
+
+    for upper_bound, count in zip(LATENCY_BUCKETS + ("+Inf",), histogram.bucket_counts):
+        cumulative += count
+        bucket_labels = labels + (("le", str(upper_bound)),)
+        lines.append(f"{metric}_bucket{format_labels(bucket_labels)} {cumulative}")
+
+    lines.append(f"{metric}_sum{format_labels(labels)} {format_value(histogram.sum)}")
+    lines.append(f"{metric}_count{format_labels(labels)} {histogram.count}")
+
+    return lines
+
+
+def format_labels(labels: Labels) -> str:
+    """Format the labels of a metric, e.g. {mode="ranked"}.
+
+    :param labels: The label names and values
+    :return: The formatted labels, or an empty string if there are none
+    """
+    if not labels:
+        return ""
+
+    pairs = ",".join(f'{name}="{escape_label_value(value)}"' for name, value in labels)
+    return "{" + pairs + "}"
+
+
+def escape_label_value(value: str) -> str:
+    """Escape the backslashes, quotes and newlines of a label value."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_value(value: float) -> str:
+    """Format the value of a metric, writing whole numbers without a fraction."""
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def metrics_enabled() -> bool:
+    """Whether the METRICS_ENABLED environment variable turns metrics on."""
+    return os.getenv("METRICS_ENABLED", "").lower() in {"1", "true", "yes", "on"}
+
+
+# The metrics of this process, recorded only when METRICS_ENABLED is set
+metrics = Metrics(metrics_enabled())
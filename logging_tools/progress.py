@@ -0,0 +1,65 @@
+import logging
+import time
+from typing import Optional
+
+
+class ProgressLogger:
+    """Logs the progress and throughput of a long-running build at most once per interval."""
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        interval: float = 10.0,
+        total_bytes: Optional[int] = None,
+    ) -> None:
+        """Initialize the ProgressLogger instance.
+
+        :param logger: The logger to write progress messages to
+        :param interval: The least number of seconds between two progress messages
+        :param total_bytes: The size of the input, used to report its throughput when done
+        """
+        self.logger = logger
+        self.interval = interval
+        self.total_bytes = total_bytes
+        self.start = time.perf_counter()
+        self.last_report = self.start
+        self.documents = 0
+        self.words = 0
+
+    def update(self, documents: int, words: int) -> None:
+        """Record processed documents, logging the progress if the interval has passed.
+
+        :param documents: The number of documents processed since the last update
+        :param words: The number of words processed since the last update
+        :return: None
+        """
+        self.documents += documents
+        self.words += words
+
+        now = time.perf_counter()
+
+        if now - self.last_report >= self.interval:
+            self.last_report = now
+            self.logger.info(f"{self.documents} documents processed ({self.throughput(now)})")
+
+    def finish(self) -> None:
+        """Log the totals and overall throughput."""
+        now = time.perf_counter()
+        message = f"{self.documents} documents processed in {now - self.start:.1f}s"
+        self.logger.info(f"{message} ({self.throughput(now, finished=True)})")
+
+    def throughput(self, now: float, finished: bool = False) -> str:
+        """Describe the throughput since the start.
+
+        :param now: The current time of the performance counter
+        :param finished: Whether the whole input has been processed
+        :return: The documents and words per second, and the megabytes of input per second
+            once the input is finished, if its size is known
+        """
+        elapsed = max(now - self.start, 1e-9)
+        rates = [f"{self.documents / elapsed:.0f} docs/s", f"{self.words / elapsed:.0f} words/s"]
+
+        if finished and self.total_bytes is not None:
+            rates.append(f"{self.total_bytes / 1024**2 / elapsed:.2f} MB/s")
+
+        return ", ".join(rates)
@@ -9,6 +9,7 @@ app = FastAPI()
 setup_logging()
 
 
-from routers import query  # noqa: E402
+from routers import query, shard  # noqa: E402
 
 app.include_router(query.router)
+app.include_router(shard.router)
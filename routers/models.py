@@ -5,3 +5,37 @@ from pydantic import BaseModel
 
 class SimilarDocs(BaseModel):
     documents: List[str]
+
+
+class BatchQuery(BaseModel):
+    query_id: str
+    query_str: str
+
+
+class BatchQueries(BaseModel):
+    queries: List[BatchQuery]
+
+
+class BatchResult(BaseModel):
+    query_id: str
+    documents: List[str]
+
+
+class BatchResults(BaseModel):
+    results: List[BatchResult]
+
+
+class ShardQuery(BaseModel):
+    query_str: str
+    limit: int = 10
+    model: str = "cosine"
+    mode: str = "ranked"
+
+
+class ShardDocument(BaseModel):
+    doc_id: int
+    score: float
+
+
+class ShardResults(BaseModel):
+    documents: List[ShardDocument]
@@ -1,13 +1,31 @@
+import asyncio
 import os
-from datetime import datetime
 import logging
+from threading import Lock
+import time
+from typing import List, Optional
 
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse
 
-from index.inverted_index import InvertedIndex
-from index.processor import Processor
+from index.batch import evaluate_batch
+from index.inverted_index import find_latest_files
+from index.loaded_index import LoadedIndex
+from index.postings_cache import PostingsCache
+from index.processor import Processor, shared_processor
+from index.query_cache import QueryCache, query_key
+from index.query_executor import (
+    QueryExecutor,
+    QueryRejected,
+    QueryTimeout,
+    evaluate_in_worker,
+    evaluate_parsed_query,
+)
+from index.query_parser import parse_boolean_query, parse_query
+from index.scorers import Scorer, get_scorer
+from logging_tools.metrics import metrics
 from main import app
-from routers.models import SimilarDocs
+from routers.models import BatchQueries, BatchResults, SimilarDocs
 
 
 logger = logging.getLogger(__name__)
@@ -16,50 +34,314 @@ router = APIRouter()
 
 files = {"LEXICON_FILE": "", "INVERTED_FILE": "", "DOCUMENT_LENGTH_FILE": ""}
 
+# The resident index is swapped as a whole so in-flight queries keep their own reference
+loaded = {"INDEX": None}
 
-@app.on_event("startup")
-async def startup_event():
-    """Find latest pre-computed index files."""
+# Ranked queries score documents containing any query term, conjunctive queries only
+# those containing every term, and Boolean queries return their matches unranked
+QUERY_MODES = ["ranked", "conjunctive", "boolean"]
+
+# Results of recent queries, dropped whenever a newer index is loaded
+query_cache = QueryCache(
+    int(os.getenv("QUERY_CACHE_SIZE", 1024)), float(os.getenv("QUERY_CACHE_TTL", 300))
+)
+
+# Queries are evaluated by a pool of threads, or processes, so the event loop stays free
+query_executor = QueryExecutor(
+    int(os.getenv("QUERY_POOL_SIZE", os.cpu_count())),
+    int(os.getenv("QUERY_MAX_PENDING", 64)),
+    float(os.getenv("QUERY_TIMEOUT", 30)),
+    os.getenv("QUERY_EXECUTOR", "thread") == "process",
+)
+
+# Held while loading an index, so concurrent reloads do not load the same files twice
+refresh_lock = Lock()
+
+# The time taken to start the service and to warm up its index
+startup = {"seconds": None, "warm_up": None}
+
+
+def refresh_index() -> bool:
+    """Load the latest index files if they are newer than the resident index.
+
+    :return: Whether or not a newer index was loaded
+    """
     dataset = os.getenv("DATASET")
 
-    latest_date = datetime.min
+    with refresh_lock:
+        latest_date, latest_files = find_latest_files(dataset)
 
-    for file in os.listdir("output_reports"):
-        if dataset in file and "_" in file:
-            date_str = file.split("_")[-1].replace(".csv", "").replace(".bin", "")
-            date = datetime.strptime(date_str, "%d%m%Y-%H%M%S")
+        current = loaded["INDEX"]
 
-            if date >= latest_date:
-                latest_date = date
+        if not latest_files or (current is not None and current.timestamp >= latest_date):
+            return False
 
-                if "document_length" in file:
-                    files["DOCUMENT_LENGTH_FILE"] = f"output_reports/{file}"
-                elif "index" in file:
-                    files["INVERTED_FILE"] = f"output_reports/{file}"
-                elif "lexicon" in file:
-                    files["LEXICON_FILE"] = f"output_reports/{file}"
+        new_index = LoadedIndex(
+            latest_files["LEXICON_FILE"],
+            latest_files["INVERTED_FILE"],
+            latest_files["DOCUMENT_LENGTH_FILE"],
+            timestamp=latest_date,
+            postings_cache=PostingsCache(postings_cache_bytes()),
+        )
+
+        # The new index is warmed up before it serves queries
+        warm_up_terms = int(os.getenv("WARM_UP_TERMS", 0))
+
+        if warm_up_terms > 0:
+            startup["warm_up"] = new_index.warm_up(warm_up_terms)
+
+        files.update(latest_files)
+        loaded["INDEX"] = new_index
+        query_cache.clear()
 
     logger.info("Loaded document length file %s", files["DOCUMENT_LENGTH_FILE"])
     logger.info("Loaded index file %s", files["INVERTED_FILE"])
     logger.info("Loaded lexicon file %s", files["LEXICON_FILE"])
 
+    return True
+
+
+def postings_cache_bytes() -> int:
+    """Find the size of the postings cache of each resident index."""
+    return int(os.getenv("POSTINGS_CACHE_BYTES", 64 * 1024**2))
+
+
+def query_processor() -> Processor:
+    """Find the processor shared by every query.
+
+    Queries are processed with NLTK unless USE_NLTK is turned off, which must match how
+    the index was built.
+    """
+    use_nltk = os.getenv("USE_NLTK", "true").lower() in {"1", "true", "yes", "on"}
+
+    return shared_processor(use_nltk, int(os.getenv("TOKEN_CACHE_SIZE", 65536)))
+
+
+@app.on_event("startup")
+async def startup_event():
+    """Find latest pre-computed index files and load them into memory.
+
+    The index is warmed up first when WARM_UP_TERMS is set, which makes startup slower but
+    the first queries faster.
+    """
+    start = time.perf_counter()
+
+    query_processor()
+    refresh_index()
+    query_executor.start()
+
+    startup["seconds"] = time.perf_counter() - start
+    metrics.observe("startup", startup["seconds"])
+    logger.info("Started in %.2fs", startup["seconds"])
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the pool evaluating queries."""
+    query_executor.shutdown()
+
+
+@router.post("/reload")
+async def reload():
+    """Swap in a newer pre-computed index, if one exists."""
+    # Loading parses files, which would otherwise stall every other request
+    reloaded = await asyncio.get_running_loop().run_in_executor(None, refresh_index)
+    return {"reloaded": reloaded, "files": files}
+
+
+def find_scorer(model: str) -> Scorer:
+    """Find the ranking model requested by a query.
+
+    :param model: The name of the ranking model
+    :return: The ranking model
+    """
+    try:
+        return get_scorer(model)
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+
+
+def resident_index() -> LoadedIndex:
+    """Find the index queries are evaluated on.
+
+    :return: The resident index
+    """
+    index = loaded["INDEX"]
+
+    if index is None:
+        raise HTTPException(status_code=503, detail="No index is loaded")
+
+    return index
+
 
 @router.post("/query", response_model=SimilarDocs)
-async def query(query_str: str, limit: int = 10, offset: int = 0):
-    """Find relevant documents, given a query term."""
-    processor = Processor()
-    tokenized_query = processor.process_line(query_str)
-
-    index = InvertedIndex()
-
-    df = index.cosine_similarity(
-        files["LEXICON_FILE"],
-        files["INVERTED_FILE"],
-        files["DOCUMENT_LENGTH_FILE"],
-        tokenized_query,
+async def query(
+    query_str: str,
+    limit: int = 10,
+    offset: int = 0,
+    model: str = "cosine",
+    mode: str = "ranked",
+    timeout: Optional[float] = None,
+):
+    """Find relevant documents, given a query term.
+
+    Words within double quotes must occur as a phrase, and words or phrases joined by
+    NEAR/k must occur within k positions of each other. Boolean queries combine words and
+    phrases with AND, OR, NOT and parentheses, and return their matches by document ID.
+
+    Queries are evaluated by a pool of QUERY_POOL_SIZE workers, and identical queries in
+    flight at the same time are evaluated once. A query is rejected with 503 when
+    QUERY_MAX_PENDING others are in flight, and fails with 504 after timeout seconds, at
+    most QUERY_TIMEOUT.
+    """
+    if mode not in QUERY_MODES:
+        detail = f"Unknown query mode '{mode}', expected one of {', '.join(QUERY_MODES)}"
+        raise HTTPException(status_code=400, detail=detail)
+
+    scorer = find_scorer(model)
+    processor = query_processor()
+    index = resident_index()
+
+    metrics.increment("queries", mode=mode)
+
+    try:
+        with metrics.timer("query", mode=mode):
+            documents = await evaluate_query(
+                index, query_str, processor, limit, offset, scorer, mode, timeout
+            )
+    except ValueError as error:
+        metrics.increment("query_errors", mode=mode)
+        raise HTTPException(status_code=400, detail=str(error))
+    except QueryRejected as error:
+        raise HTTPException(status_code=503, detail=str(error))
+    except QueryTimeout as error:
+        raise HTTPException(status_code=504, detail=str(error))
+
+    return {"documents": documents}
+
+
+async def evaluate_query(
+    index: LoadedIndex,
+    query_str: str,
+    processor: Processor,
+    limit: int,
+    offset: int,
+    scorer: Scorer,
+    mode: str,
+    timeout: Optional[float] = None,
+) -> List[int]:
+    """Find the best documents for a query, or the documents matching a Boolean query.
+
+    The query is parsed and looked up in the result cache on the event loop, and only
+    evaluated by the query executor on a cache miss.
+
+    :param index: The resident index
+    :param query_str: The query
+    :param processor: The processor used to clean the query's tokens
+    :param limit: The number of documents to return
+    :param offset: The number of best documents to skip, or of matching documents in
+        document ID order for Boolean queries
+    :param scorer: The ranking model
+    :param mode: The query mode, one of QUERY_MODES
+    :param timeout: The number of seconds to wait for the query's evaluation
+    :return: The IDs of the documents, best first, or in document ID order for Boolean
+        queries
+    """
+    with metrics.timer("tokenize"):
+        if mode == "boolean":
+            parsed_query = parse_boolean_query(query_str, processor)
+        else:
+            parsed_query = parse_query(query_str, processor)
+
+    if mode == "boolean":
+        key = query_key([], limit, offset, "boolean", repr(parsed_query))
+    else:
+        constraints = (
+            mode,
+            tuple(tuple(phrase) for phrase in parsed_query.phrases),
+            tuple((tuple(left), tuple(right), k) for left, right, k in parsed_query.proximities),
+        )
+        key = query_key(parsed_query.terms, limit, offset, scorer.name, constraints)
+
+    documents = query_cache.get(key, index.timestamp)
+
+    if documents is None:
+        arguments = (parsed_query, limit, offset, scorer, mode)
+
+        # Worker processes load their own copy of the index from its files
+        if query_executor.use_processes:
+            index_files = (index.lexicon_file, index.inverted_file, index.document_length_file)
+            evaluation = (evaluate_in_worker, index_files, postings_cache_bytes(), *arguments)
+        else:
+            evaluation = (evaluate_parsed_query, index, *arguments)
+
+        documents = await query_executor.run((key, index.timestamp), *evaluation, timeout=timeout)
+        query_cache.put(key, documents, index.timestamp)
+
+    return documents
+
+
+@router.get("/stats")
+async def stats():
+    """Report the usage of the query result and postings caches."""
+    index = loaded["INDEX"]
+    postings_cache = index.postings_cache.stats() if index is not None else None
+
+    return {
+        "query_cache": query_cache.stats(),
+        "postings_cache": postings_cache,
+        "query_executor": query_executor.stats(),
+        "startup": startup,
+    }
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Report the engine's metrics in the Prometheus text format.
+
+    Timers and counters are only recorded when METRICS_ENABLED is set, and include those
+    recorded by the worker processes of the query executor. The usage of the caches is
+    always reported.
+    """
+    gauges = {f"query_cache_{name}": value for name, value in query_cache.stats().items()}
+    gauges.update(
+        {f"query_executor_{name}": value for name, value in query_executor.stats().items()}
     )
-    sorted_docs = df.sort_values(by=["cosine_score"])["doc_id"].to_list()
+    index = loaded["INDEX"]
+
+    if index is not None and index.postings_cache is not None:
+        postings_stats = index.postings_cache.stats()
+        gauges.update({f"postings_cache_{name}": value for name, value in postings_stats.items()})
+
+    return PlainTextResponse(metrics.render(gauges), media_type="text/plain; version=0.0.4")
+
+
+@router.post("/query/batch", response_model=BatchResults)
+def query_batch(batch: BatchQueries, limit: int = 10, model: str = "cosine"):
+    """Find relevant documents for many queries at once.
+
+    The queries are evaluated by a pool of QUERY_WORKERS threads, which decode the postings
+    of terms shared by several queries once.
+    """
+    scorer = find_scorer(model)
+    processor = query_processor()
+    index = resident_index()
+
+    with metrics.timer("tokenize"):
+        tokenized_queries = processor.process_lines([query.query_str for query in batch.queries])
+
+    queries = [(query.query_id, tokens) for query, tokens in zip(batch.queries, tokenized_queries)]
+
+    workers = int(os.getenv("QUERY_WORKERS", os.cpu_count()))
+
+    metrics.increment("queries", len(queries), mode="batch")
 
-    end_index = offset + limit
+    with metrics.timer("query_batch"):
+        results = evaluate_batch(index, queries, limit, workers, scorer=scorer)
 
-    return {"documents": sorted_docs[offset:end_index]}
+    return {
+        "results": [
+            {"query_id": query_id, "documents": [doc_id for doc_id, _ in documents]}
+            for query_id, documents in results
+        ]
+    }
@@ -0,0 +1,59 @@
+import logging
+import os
+
+from fastapi import APIRouter, HTTPException
+
+from index.postings_cache import PostingsCache
+from index.sharding import load_shard, search_shard
+from main import app
+from routers.models import ShardQuery, ShardResults
+from routers.query import postings_cache_bytes, query_processor
+
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# The shard this instance serves to a broker, when SHARD_MANIFEST and SHARD_ID are set
+shard = {"INDEX": None}
+
+
+@app.on_event("startup")
+async def load_shard_event():
+    """Load the shard this instance serves, if it is a shard worker."""
+    manifest_file = os.getenv("SHARD_MANIFEST")
+
+    if not manifest_file:
+        return
+
+    shard_id = int(os.getenv("SHARD_ID", 0))
+    shard["INDEX"] = load_shard(manifest_file, shard_id, PostingsCache(postings_cache_bytes()))
+
+    logger.info("Serving shard %d of %s", shard_id, manifest_file)
+
+
+@router.post("/shard/search", response_model=ShardResults)
+def shard_search(shard_query: ShardQuery):
+    """Find the best documents of this instance's shard for a broker.
+
+    Documents are returned with their scores, which a broker merges with those of the other
+    shards of the collection.
+    """
+    index = shard["INDEX"]
+
+    if index is None:
+        raise HTTPException(status_code=503, detail="This instance serves no shard")
+
+    try:
+        documents = search_shard(
+            index,
+            query_processor(),
+            shard_query.query_str,
+            shard_query.limit,
+            shard_query.model,
+            shard_query.mode,
+        )
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+
+    return {"documents": [{"doc_id": doc_id, "score": score} for doc_id, score in documents]}
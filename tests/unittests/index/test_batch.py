@@ -0,0 +1,76 @@
+import os
+from pathlib import Path
+import tempfile
+import unittest
+
+from index.batch import decode_shared_postings, evaluate_batch, read_topics, write_run_file
+from index.inverted_index import InvertedIndex
+from index.loaded_index import LoadedIndex
+from index.postings import VBYTE_ENCODING
+from index.processor import Processor
+
+
+TOPICS_PATH = str(Path(__file__).parents[3] / "sample_data" / "animal.topics.txt")
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self) -> None:
+        """Build a small index in a temporary working directory."""
+        self.cwd = os.getcwd()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.temp_dir.name)
+        os.mkdir("output_reports")
+
+        documents = {
+            1: ["bird", "dog", "dog", "dog"],
+            2: ["aardvark", "bird", "bird", "cat", "egret"],
+            3: ["aardvark", "aardvark", "bird"],
+            4: ["bird", "dog", "egret", "egret"],
+        }
+
+        index = InvertedIndex()
+
+        for document_id, words in documents.items():
+            for word in words:
+                index.add_word(document_id, word)
+            index.num_docs += 1
+
+        self.index = LoadedIndex(*index.generate_file("test", encoding=VBYTE_ENCODING))
+        self.queries = [
+            ("1", ["dog", "egret"]),
+            ("2", ["aardvark", "egret", "egret"]),
+            ("3", ["cat"]),
+            ("4", ["dog", "cat", "zebra"]),
+        ]
+
+    def tearDown(self) -> None:
+        """Remove the temporary working directory."""
+        os.chdir(self.cwd)
+        self.temp_dir.cleanup()
+
+    def test_read_topics(self):
+        queries = read_topics(TOPICS_PATH, Processor(use_nltk=False))
+        self.assertEqual(("1", ["bird", "cat", "dog"]), queries[0])
+
+    def test_decode_shared_postings(self):
+        decoded = decode_shared_postings(self.index, self.queries)
+
+        shared_ids = {
+            self.index.term_dictionary.lookup(term).term_id for term in ["cat", "dog", "egret"]
+        }
+        self.assertSetEqual(shared_ids, set(decoded.keys()))
+
+    def test_evaluate_batch__matches_top_k(self):
+        expected = [(query_id, self.index.top_k(query, 3)) for query_id, query in self.queries]
+
+        for workers, use_processes in [(1, False), (3, False), (2, True)]:
+            actual = evaluate_batch(self.index, self.queries, 3, workers, use_processes, 2)
+            self.assertListEqual(expected, actual)
+
+    def test_write_run_file(self):
+        write_run_file("run.txt", [("7", [(3, 0.5), (1, 0.25)])], "test")
+
+        with open("run.txt") as file:
+            lines = file.read().splitlines()
+
+        self.assertListEqual(["7 Q0 3 1 0.500000 test", "7 Q0 1 2 0.250000 test"], lines)
@@ -0,0 +1,68 @@
+import filecmp
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from index.compact_index import CompactInvertedIndex
+from index.inverted_index import InvertedIndex
+from index.postings import VBYTE_ENCODING
+
+
+class TestCompactInvertedIndex(unittest.TestCase):
+    def setUp(self) -> None:
+        """Create a temporary working directory."""
+        self.cwd = os.getcwd()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.temp_dir.name)
+
+        rng = np.random.default_rng(0)
+        vocabulary = [f"term{i}" for i in range(50)]
+        self.documents = [list(rng.choice(vocabulary, size=rng.integers(1, 30))) for _ in range(40)]
+
+    def tearDown(self) -> None:
+        """Remove the temporary working directory."""
+        os.chdir(self.cwd)
+        self.temp_dir.cleanup()
+
+    def build(self, index, documents=None, start: int = 1):
+        """Add documents to an index."""
+        for document_id, words in enumerate(documents or self.documents, start=start):
+            for word in words:
+                index.add_word(document_id, word)
+            index.num_docs += 1
+
+        return index
+
+    def assert_same_files(self, expected: InvertedIndex, actual: InvertedIndex, encoding: str):
+        """Check that two indexes generate identical files."""
+        os.mkdir("expected")
+        os.mkdir("actual")
+
+        expected_files = expected.generate_file(
+            "test", encoding=encoding, output_directory="expected"
+        )
+        actual_files = actual.generate_file("test", encoding=encoding, output_directory="actual")
+
+        for expected_file, actual_file in zip(expected_files, actual_files):
+            self.assertTrue(filecmp.cmp(expected_file, actual_file, shallow=False))
+
+    def test_generate_file__matches_inverted_index(self):
+        self.assert_same_files(
+            self.build(InvertedIndex()), self.build(CompactInvertedIndex()), VBYTE_ENCODING
+        )
+
+    def test_merge__matches_single_index(self):
+        merged = CompactInvertedIndex()
+        merged.merge(self.build(InvertedIndex(), self.documents[:15]))
+        merged.merge(self.build(CompactInvertedIndex(), self.documents[15:], start=16))
+
+        self.assert_same_files(self.build(InvertedIndex()), merged, "raw")
+
+    def test_term_statistics(self):
+        expected = self.build(InvertedIndex())
+        actual = self.build(CompactInvertedIndex())
+
+        self.assertEqual(expected.num_terms, actual.num_terms)
+        self.assertTupleEqual(expected.term_statistics(), actual.term_statistics())
@@ -0,0 +1,56 @@
+import unittest
+
+import numpy as np
+
+from index.compression import (
+    decode_blocks,
+    decode_indexed_blocks,
+    encode_blocks,
+    vbyte_decode,
+    vbyte_encode,
+)
+
+
+class TestCompression(unittest.TestCase):
+    def test_vbyte_encode(self):
+        encoded = vbyte_encode(np.array([5, 128, 300]))
+        self.assertListEqual([0x85, 0x00, 0x81, 0x2C, 0x82], encoded.tolist())
+
+    def test_vbyte_decode__round_trip(self):
+        values = np.array([0, 1, 127, 128, 16383, 16384, 2**32 - 1])
+        np.testing.assert_array_equal(values, vbyte_decode(vbyte_encode(values).tobytes()))
+
+    def test_decode_blocks__round_trip(self):
+        rng = np.random.default_rng(0)
+        doc_ids = np.sort(rng.choice(100000, size=1000, replace=False)) + 1
+        frequencies = rng.integers(1, 500, size=1000)
+
+        for byte_order in ["big", "little"]:
+            buffer = encode_blocks(doc_ids, frequencies, rng.random(1000), byte_order, 64)
+            actual_doc_ids, actual_frequencies = decode_blocks(buffer, byte_order)
+
+            np.testing.assert_array_equal(doc_ids, actual_doc_ids)
+            np.testing.assert_array_equal(frequencies, actual_frequencies)
+
+    def test_decode_blocks__candidates(self):
+        doc_ids = np.arange(1, 1001) * 3
+        buffer = encode_blocks(doc_ids, np.ones(1000), np.ones(1000), block_size=100)
+        candidates = np.array([6, 1500])
+
+        actual_doc_ids, _ = decode_blocks(buffer, candidates=candidates)
+
+        # Only the first block and the block holding 1500 are decoded
+        self.assertEqual(200, len(actual_doc_ids))
+        self.assertTrue(np.isin([6, 1500], actual_doc_ids).all())
+
+    def test_decode_indexed_blocks__candidates(self):
+        doc_ids = np.arange(1, 1001) * 3
+        buffer = encode_blocks(doc_ids, np.ones(1000), np.ones(1000), block_size=100)
+
+        actual_doc_ids, _, posting_indices = decode_indexed_blocks(
+            buffer, candidates=np.array([6, 1500])
+        )
+
+        # The indices of the postings within the whole list skip the blocks left out
+        np.testing.assert_array_equal(doc_ids[posting_indices], actual_doc_ids)
+        self.assertListEqual([0, 99, 400, 499], posting_indices[[0, 99, 100, 199]].tolist())
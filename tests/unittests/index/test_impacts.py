@@ -0,0 +1,30 @@
+import unittest
+
+import numpy as np
+
+from index.impacts import decode_impacts, encode_impacts
+
+
+class TestImpacts(unittest.TestCase):
+    def test_decode_impacts__round_trip(self):
+        rng = np.random.default_rng(0)
+        doc_ids = np.sort(rng.choice(100000, size=1000, replace=False)) + 1
+        weights = rng.random(1000)
+
+        for bits in [8, 16]:
+            for byte_order in ["big", "little"]:
+                buffer = encode_impacts(doc_ids, weights, bits, byte_order)
+                actual_doc_ids, actual_weights = decode_impacts(buffer, bits, byte_order)
+
+                # Rounding to the nearest level errs by at most half a level
+                max_error = weights.max() / ((1 << bits) - 1) / 2 + 1e-7
+
+                np.testing.assert_array_equal(doc_ids, actual_doc_ids)
+                np.testing.assert_allclose(weights, actual_weights, rtol=0, atol=max_error)
+
+    def test_decode_impacts__zero_weights(self):
+        buffer = encode_impacts(np.array([2, 3]), np.zeros(2), 8)
+        doc_ids, weights = decode_impacts(buffer, 8)
+
+        np.testing.assert_array_equal([2, 3], doc_ids)
+        np.testing.assert_array_equal([0, 0], weights)
@@ -0,0 +1,47 @@
+from pathlib import Path
+import unittest
+
+from index.indexer import Indexer
+from index.inverted_index import InvertedIndex
+from index.processor import Processor
+
+
+DATASET_PATH = str(Path(__file__).parents[3] / "sample_data" / "animal.txt")
+
+
+class TestIndexer(unittest.TestCase):
+    def build(self, workers: int) -> Indexer:
+        """Build an index of the sample dataset."""
+        indexer = Indexer(
+            DATASET_PATH,
+            "animal",
+            Processor(use_nltk=False),
+            InvertedIndex(),
+            workers=workers,
+            batch_size=3,
+            range_size=100,
+        )
+        indexer.load_data()
+
+        return indexer
+
+    def test_load_data__parallel_matches_serial(self):
+        serial = self.build(1)
+        parallel = self.build(2)
+
+        self.assertEqual(serial.documents_processed, parallel.documents_processed)
+        self.assertEqual(serial.words_processed, parallel.words_processed)
+        self.assertEqual(serial.index.num_docs, parallel.index.num_docs)
+        self.assertEqual(serial.index.num_terms, parallel.index.num_terms)
+
+        self.assertListEqual(list(serial.index.index.keys()), list(parallel.index.index.keys()))
+
+        for word, entry in serial.index.index.items():
+            parallel_entry = parallel.index.index[word]
+
+            self.assertEqual(entry["count"], parallel_entry["count"])
+            self.assertEqual(entry["num_docs"], parallel_entry["num_docs"])
+            self.assertListEqual(
+                list(entry["postings_list"].items()),
+                list(parallel_entry["postings_list"].items()),
+            )
@@ -0,0 +1,195 @@
+from datetime import datetime
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from index.inverted_index import InvertedIndex, find_latest_files
+from index.loaded_index import LoadedIndex
+from index.postings import IMPACT_8_ENCODING, IMPACT_16_ENCODING, VBYTE_ENCODING
+from index.postings_cache import PostingsCache
+from index.processor import Processor
+from index.query_parser import And, Term, parse_boolean_query
+
+
+class TestLoadedIndex(unittest.TestCase):
+    def setUp(self) -> None:
+        """Build a small index in a temporary working directory."""
+        self.cwd = os.getcwd()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.temp_dir.name)
+        os.mkdir("output_reports")
+
+        documents = {
+            1: ["bird", "dog", "dog", "dog"],
+            2: ["aardvark", "bird", "bird", "cat", "egret"],
+            3: ["aardvark", "aardvark", "bird"],
+            4: ["bird", "dog", "egret", "egret"],
+        }
+
+        self.index = InvertedIndex()
+
+        for document_id, words in documents.items():
+            for word in words:
+                self.index.add_word(document_id, word)
+            self.index.num_docs += 1
+
+        self.files = self.index.generate_file("test")
+
+    def tearDown(self) -> None:
+        """Remove the temporary working directory."""
+        os.chdir(self.cwd)
+        self.temp_dir.cleanup()
+
+    def test_postings__last_term(self):
+        loaded_index = LoadedIndex(*self.files)
+        doc_ids, tfs = loaded_index.postings("egret")
+
+        np.testing.assert_array_equal([2, 4], doc_ids)
+        np.testing.assert_array_equal([1, 2], tfs)
+
+    def test_postings__missing_term(self):
+        loaded_index = LoadedIndex(*self.files)
+        self.assertIsNone(loaded_index.postings("zebra"))
+
+    def test_cosine_similarity__matches_file_based(self):
+        query = ["dog", "cat", "dog", "aardvark", "egret"]
+
+        expected = self.index.cosine_similarity(*self.files, query)
+        actual = LoadedIndex(*self.files).cosine_similarity(query)
+
+        np.testing.assert_allclose(expected["cosine_score"].values, actual["cosine_score"].values)
+
+    def test_cosine_similarity__matches_dense_tf_idf(self):
+        query = ["dog", "egret", "egret"]
+        lexicon_file, index_file, document_length_file = self.files
+
+        tf_idfs, idfs = self.index.tf_idf(lexicon_file, index_file, ["dog", "egret"], 4)
+        query_tf_idf = idfs[0] * np.array([1, 2])
+        doc_lengths = pd.read_csv(document_length_file)["euclidean_length"].values
+        expected = np.dot(query_tf_idf, tf_idfs) / (np.linalg.norm(query_tf_idf) * doc_lengths)
+
+        actual = LoadedIndex(*self.files).cosine_similarity(query)
+
+        np.testing.assert_array_equal([1, 2, 4], actual["doc_id"].values)
+        np.testing.assert_allclose(expected[[0, 1, 3]], actual["cosine_score"].values)
+
+    def test_top_k__matches_full_ranking(self):
+        query = ["dog", "egret", "egret", "cat", "bird"]
+        loaded_index = LoadedIndex(*self.files)
+
+        df = loaded_index.cosine_similarity(query)
+        df = df.sort_values(by=["cosine_score", "doc_id"], ascending=[False, True])
+
+        for k in range(1, 5):
+            results = loaded_index.top_k(query, k)
+
+            self.assertListEqual(df["doc_id"].to_list()[:k], [doc_id for doc_id, _ in results])
+            np.testing.assert_allclose(
+                df["cosine_score"].values[:k], [score for _, score in results]
+            )
+
+    def test_top_k__offset(self):
+        query = ["dog", "egret", "egret", "cat", "bird"]
+        loaded_index = LoadedIndex(*self.files)
+
+        self.assertListEqual(loaded_index.top_k(query, 3)[1:], loaded_index.top_k(query, 2, 1))
+
+    def test_top_k__compressed_postings(self):
+        query = ["dog", "egret", "egret", "cat", "bird"]
+        compressed_files = self.index.generate_file("test_vbyte", encoding=VBYTE_ENCODING)
+
+        expected = LoadedIndex(*self.files).top_k(query, 4)
+        actual = LoadedIndex(*compressed_files).top_k(query, 4)
+
+        self.assertListEqual([doc_id for doc_id, _ in expected], [doc_id for doc_id, _ in actual])
+        np.testing.assert_allclose([score for _, score in expected], [score for _, score in actual])
+
+    def test_top_k__postings_cache(self):
+        query = ["dog", "egret", "egret", "cat", "bird"]
+        cache = PostingsCache()
+
+        expected = LoadedIndex(*self.files).top_k(query, 4)
+        cached_index = LoadedIndex(*self.files, postings_cache=cache)
+
+        self.assertListEqual(expected, cached_index.top_k(query, 4))
+        self.assertListEqual(expected, cached_index.top_k(query, 4))
+        self.assertEqual(4, cache.stats()["hits"])
+
+    def test_top_k__impact_postings(self):
+        query = ["dog", "egret", "egret", "cat", "bird"]
+        expected = LoadedIndex(*self.files).cosine_similarity(query)
+
+        for encoding, tolerance in [(IMPACT_8_ENCODING, 1e-2), (IMPACT_16_ENCODING, 1e-4)]:
+            impact_index = LoadedIndex(
+                *self.index.generate_file(f"test_{encoding}", encoding=encoding)
+            )
+            actual = impact_index.cosine_similarity(query)
+
+            np.testing.assert_allclose(
+                expected["cosine_score"].values, actual["cosine_score"].values, atol=tolerance
+            )
+            actual = actual.sort_values(by=["cosine_score", "doc_id"], ascending=[False, True])
+            self.assertListEqual(
+                actual["doc_id"].tolist()[:3],
+                [doc_id for doc_id, _ in impact_index.top_k(query, 3)],
+            )
+            self.assertRaises(ValueError, impact_index.postings, "dog")
+
+    def test_boolean_documents(self):
+        processor = Processor(use_nltk=False)
+        files = self.index.generate_file("test_compressed", encoding=VBYTE_ENCODING)
+
+        for loaded_index in [LoadedIndex(*self.files), LoadedIndex(*files)]:
+            for query_str, expected in [
+                ("bird AND dog", [1, 4]),
+                ("bird NOT (dog OR cat)", [3]),
+                ("egret OR cat aardvark", [2, 4]),
+                ("NOT dog", [2, 3]),
+                ("zebra OR dog", [1, 4]),
+                ("dog zebra", []),
+            ]:
+                query = parse_boolean_query(query_str, processor)
+                self.assertListEqual(expected, loaded_index.boolean_documents(query).tolist())
+
+    def test_top_k__conjunctive(self):
+        loaded_index = LoadedIndex(*self.files)
+        query = ["bird", "egret", "egret"]
+        documents = loaded_index.boolean_documents(And([Term("bird"), Term("egret")]))
+
+        expected = [result for result in loaded_index.top_k(query, 10) if result[0] in [2, 4]]
+        self.assertListEqual(expected, loaded_index.top_k(query, 10, documents=documents))
+
+    def test_warm_up(self):
+        loaded_index = LoadedIndex(*self.files, postings_cache=PostingsCache(1024**2))
+        warm_up = loaded_index.warm_up(2)
+
+        self.assertEqual(2, warm_up["terms"])
+        self.assertEqual(2, loaded_index.postings_cache.stats()["entries"])
+
+        # The most frequent term's postings are now served by the cache
+        loaded_index.top_k(["bird"], 2)
+        self.assertEqual(1, loaded_index.postings_cache.stats()["hits"])
+
+    def test_find_latest_files(self):
+        for name in [
+            "test_lexicon_02012023-000000.csv",
+            "test_index_02012023-000000.bin",
+            "test_lexicon_31122022-235959.csv",
+            "test_metric_report.txt",
+        ]:
+            open(os.path.join("output_reports", name), "w").close()
+
+        latest_date, latest_files = find_latest_files("test")
+
+        # The set of files generated in setUp is the latest complete one
+        self.assertGreater(latest_date, datetime(2023, 1, 2))
+        self.assertListEqual(
+            [os.path.basename(file) for file in self.files],
+            [
+                os.path.basename(latest_files[key])
+                for key in ["LEXICON_FILE", "INVERTED_FILE", "DOCUMENT_LENGTH_FILE"]
+            ],
+        )
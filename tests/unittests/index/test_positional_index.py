@@ -0,0 +1,168 @@
+import filecmp
+import os
+from pathlib import Path
+import tempfile
+import unittest
+
+import numpy as np
+
+from index.compact_index import CompactInvertedIndex
+from index.indexer import Indexer
+from index.loaded_index import LoadedIndex
+from index.positional_index import PositionalInvertedIndex
+from index.postings import RAW_ENCODING, VBYTE_ENCODING
+from index.processor import Processor
+from index.query_parser import parse_query
+
+
+DATASET_PATH = str(Path(__file__).parents[3] / "sample_data" / "animal.txt")
+
+
+class TestPositionalInvertedIndex(unittest.TestCase):
+    def setUp(self) -> None:
+        """Build a positional index of random documents in a temporary working directory."""
+        self.cwd = os.getcwd()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.temp_dir.name)
+        os.mkdir("output_reports")
+
+        rng = np.random.default_rng(0)
+        vocabulary = [f"term{i}" for i in range(6)]
+        self.documents = [list(rng.choice(vocabulary, size=rng.integers(1, 40))) for _ in range(80)]
+        self.processor = Processor(use_nltk=False)
+
+        self.index = self.build(PositionalInvertedIndex())
+        self.loaded_index = LoadedIndex(*self.index.generate_file("test", encoding=VBYTE_ENCODING))
+
+    def tearDown(self) -> None:
+        """Remove the temporary working directory."""
+        os.chdir(self.cwd)
+        self.temp_dir.cleanup()
+
+    def build(self, index):
+        """Add the documents to an index."""
+        for document_id, words in enumerate(self.documents, start=1):
+            for word in words:
+                index.add_word(document_id, word)
+            index.num_docs += 1
+
+        return index
+
+    def matching(self, predicate):
+        """Find the documents matching a predicate of their words."""
+        return [
+            document_id
+            for document_id, words in enumerate(self.documents, start=1)
+            if predicate(" ".join(words))
+        ]
+
+    def test_generate_file__matches_compact_index(self):
+        os.mkdir("compact")
+        os.mkdir("positional")
+        expected_files = self.build(CompactInvertedIndex()).generate_file(
+            "test", encoding=VBYTE_ENCODING, output_directory="compact"
+        )
+        actual_files = self.index.generate_file(
+            "test", encoding=VBYTE_ENCODING, output_directory="positional"
+        )
+
+        for expected_file, actual_file in zip(expected_files, actual_files):
+            self.assertTrue(filecmp.cmp(expected_file, actual_file, shallow=False))
+
+    def test_matching_documents__phrase(self):
+        parsed_query = parse_query('"term1 term2 term1" term3', self.processor)
+        expected = self.matching(lambda text: "term1 term2 term1" in text)
+
+        self.assertListEqual(expected, self.loaded_index.matching_documents(parsed_query).tolist())
+
+        results = self.loaded_index.top_k(
+            parsed_query.terms, 100, documents=self.loaded_index.matching_documents(parsed_query)
+        )
+        self.assertListEqual(expected, sorted(doc_id for doc_id, _ in results))
+
+    def test_matching_documents__proximity(self):
+        def near(text: str) -> bool:
+            words = text.split()
+            left = [i for i, word in enumerate(words) if word == "term4"]
+            right = [
+                i for i, word in enumerate(words[:-1]) if words[i : i + 2] == ["term0", "term5"]
+            ]
+
+            return any(0 < j - i <= 2 or 0 < i - (j + 1) <= 2 for i in left for j in right)
+
+        parsed_query = parse_query('term4 NEAR/2 "term0 term5"', self.processor)
+
+        self.assertListEqual(
+            self.matching(near), self.loaded_index.matching_documents(parsed_query).tolist()
+        )
+
+    def test_matching_documents__skips_blocks(self):
+        os.mkdir("skipping")
+        self.documents = [["common", "filler"] * 3 for _ in range(1000)]
+        self.documents[700] = ["filler", "rare", "common", "filler"]
+        self.documents[900] = ["common", "rare", "filler"]
+        files = self.build(PositionalInvertedIndex()).generate_file(
+            "test", encoding=VBYTE_ENCODING, output_directory="skipping"
+        )
+
+        loaded_index = LoadedIndex(*files)
+        parsed_query = parse_query('"rare common"', self.processor)
+
+        self.assertListEqual([701], loaded_index.matching_documents(parsed_query).tolist())
+
+        # Only the block of the common term holding the candidate is decoded
+        doc_ids, posting_indices = loaded_index.read_indexed_doc_ids(
+            loaded_index.term_dictionary.lookup("common"), np.array([701])
+        )
+        self.assertEqual(128, len(doc_ids))
+        np.testing.assert_array_equal(doc_ids - 1, posting_indices)
+
+    def test_matching_documents__documents_out_of_order(self):
+        index = PositionalInvertedIndex()
+
+        for document_id, text in [(5, "bird dog"), (2, "dog cat bird"), (9, "cat bird dog")]:
+            for word in text.split():
+                index.add_word(document_id, word)
+            index.num_docs += 1
+
+        for encoding in [RAW_ENCODING, VBYTE_ENCODING]:
+            os.mkdir(encoding)
+            loaded_index = LoadedIndex(
+                *index.generate_file("test", encoding=encoding, output_directory=encoding)
+            )
+
+            for query, expected in [
+                ('"bird dog"', [5, 9]),
+                ('"dog cat"', [2]),
+                ('"cat bird"', [2, 9]),
+            ]:
+                with self.subTest(encoding=encoding, query=query):
+                    parsed_query = parse_query(query, self.processor)
+                    actual = loaded_index.matching_documents(parsed_query).tolist()
+
+                    self.assertListEqual(expected, actual)
+
+    def test_matching_documents__needs_positions(self):
+        os.mkdir("compact")
+        files = self.build(CompactInvertedIndex()).generate_file("test", output_directory="compact")
+        parsed_query = parse_query('"term1 term2"', self.processor)
+
+        self.assertRaises(ValueError, LoadedIndex(*files).matching_documents, parsed_query)
+
+    def test_load_data__parallel_matches_serial(self):
+        positions = []
+
+        for workers in [1, 2]:
+            indexer = Indexer(
+                DATASET_PATH,
+                "animal",
+                self.processor,
+                PositionalInvertedIndex(),
+                workers=workers,
+                batch_size=3,
+                range_size=100,
+            )
+            indexer.load_data()
+            positions.append([list(term_positions) for term_positions in indexer.index.positions])
+
+        self.assertListEqual(positions[0], positions[1])
@@ -0,0 +1,44 @@
+import unittest
+
+import numpy as np
+
+from index.positions import (
+    decode_positions,
+    encode_positions,
+    intersect_doc_ids,
+    phrase_starts,
+    within_distance,
+)
+
+
+class TestPositions(unittest.TestCase):
+    def test_decode_positions__selected_postings(self):
+        rng = np.random.default_rng(0)
+        documents = [np.sort(rng.choice(100000, size=n, replace=False)) for n in [1, 5, 300, 2]]
+        frequencies = np.array([len(positions) for positions in documents])
+
+        for byte_order in ["big", "little"]:
+            buffer = encode_positions(np.concatenate(documents), frequencies, byte_order)
+            actual = decode_positions(buffer, np.array([3, 0, 2]), byte_order)
+
+            for expected_positions, actual_positions in zip([3, 0, 2], actual):
+                np.testing.assert_array_equal(documents[expected_positions], actual_positions)
+
+        self.assertListEqual([], decode_positions(buffer, np.array([]), "little"))
+
+    def test_intersect_doc_ids(self):
+        doc_id_lists = [np.arange(0, 1000, 2), np.array([4, 5, 6, 998]), np.arange(0, 1000, 3)]
+
+        np.testing.assert_array_equal([6], intersect_doc_ids(doc_id_lists))
+        self.assertEqual(0, len(intersect_doc_ids(doc_id_lists + [np.array([], dtype=int)])))
+
+    def test_phrase_starts(self):
+        starts = phrase_starts([np.array([1, 5, 9]), np.array([2, 7, 10]), np.array([3, 11])])
+        np.testing.assert_array_equal([1, 9], starts)
+
+    def test_within_distance__either_order(self):
+        # The second phrase spans positions 7 and 8, and the first is at 10
+        self.assertTrue(within_distance(np.array([10]), 1, np.array([7]), 2, 2))
+        self.assertFalse(within_distance(np.array([10]), 1, np.array([7]), 2, 1))
+        self.assertTrue(within_distance(np.array([3]), 1, np.array([4]), 1, 1))
+        self.assertFalse(within_distance(np.array([3]), 1, np.array([], dtype=int), 1, 5))
@@ -0,0 +1,19 @@
+import unittest
+
+import numpy as np
+
+from index.postings import decode_postings, encode_postings
+
+
+class TestPostings(unittest.TestCase):
+    def test_encode_postings__big_endian(self):
+        buffer = encode_postings(np.array([1, 258]), np.array([3, 1]), "big")
+        self.assertEqual(bytes([0, 0, 0, 1, 0, 0, 0, 3, 0, 0, 1, 2, 0, 0, 0, 1]), buffer)
+
+    def test_decode_postings__round_trip(self):
+        for byte_order in ["big", "little"]:
+            buffer = encode_postings(np.array([4, 7, 90000]), np.array([1, 12, 5]), byte_order)
+            doc_ids, frequencies = decode_postings(buffer, byte_order)
+
+            np.testing.assert_array_equal([4, 7, 90000], doc_ids)
+            np.testing.assert_array_equal([1, 12, 5], frequencies)
@@ -0,0 +1,53 @@
+import unittest
+
+import numpy as np
+
+from index.postings_cache import ENTRY_OVERHEAD, PostingsCache
+
+
+def make_postings(num_postings: int):
+    """Build arrays of the given number of postings."""
+    return np.arange(num_postings, dtype=np.int64), np.ones((num_postings,), dtype=np.int64)
+
+
+class TestPostingsCache(unittest.TestCase):
+    def setUp(self) -> None:
+        """Create a cache with room for four lists of ten postings."""
+        self.entry_size = ENTRY_OVERHEAD + 160
+        self.cache = PostingsCache(max_bytes=4 * self.entry_size, recent_share=0.5)
+
+    def test_get_or_load__loads_once(self):
+        loads = []
+
+        def load():
+            loads.append(1)
+            return make_postings(10)
+
+        self.cache.get_or_load(1, load)
+        self.cache.get_or_load(1, load)
+
+        self.assertEqual(1, len(loads))
+        self.assertEqual(
+            {"hits": 1, "misses": 1}, {k: self.cache.stats()[k] for k in ["hits", "misses"]}
+        )
+
+    def test_put__scan_does_not_evict_frequent_terms(self):
+        # Term 1 is read, evicted from the recent queue, then read again
+        self.cache.put(1, make_postings(10))
+        for key in range(2, 6):
+            self.cache.put(key, make_postings(10))
+        self.assertIsNone(self.cache.get(1))
+        self.cache.put(1, make_postings(10))
+
+        # A scan of terms read only once cycles through the recent queue
+        for key in range(100, 110):
+            self.cache.put(key, make_postings(10))
+
+        self.assertIsNotNone(self.cache.get(1))
+        self.assertLessEqual(self.cache.stats()["bytes"], 4 * self.entry_size)
+
+    def test_put__skips_lists_over_budget(self):
+        self.cache.put(1, make_postings(1000))
+
+        self.assertIsNone(self.cache.get(1))
+        self.assertEqual(0, self.cache.stats()["bytes"])
@@ -0,0 +1,43 @@
+import pickle
+import unittest
+
+from index.processor import Processor, shared_processor
+
+
+class TestProcessor(unittest.TestCase):
+    def test_process_line__simple(self):
+        processor = Processor(use_nltk=False)
+        tokens = processor.process_line(" The (quick) brown-fox, jumped/over... ")
+
+        self.assertListEqual(["the", "quick", "brown", "fox", "jumped", "over"], tokens)
+
+    def test_process_line__cache(self):
+        processor = Processor(use_nltk=False, cache_size=2)
+
+        self.assertListEqual(["a", "b", "a", "c"], processor.process_line("a b a c"))
+
+        cache_info = processor.cache_info()
+        self.assertEqual(1, cache_info["hits"])
+        self.assertEqual(3, cache_info["misses"])
+        self.assertEqual(2, cache_info["currsize"])
+
+    def test_process_lines(self):
+        processor = Processor(use_nltk=False, cache_size=10)
+        lines = ["Cat, dog", "dog (cat) bird", ""]
+
+        self.assertListEqual(
+            [processor.process_line(line) for line in lines], processor.process_lines(lines)
+        )
+
+    def test_pickle__keeps_cache_size(self):
+        processor = pickle.loads(pickle.dumps(Processor(use_nltk=False, cache_size=5)))
+
+        self.assertListEqual(["x"], processor.process_line("x"))
+        self.assertEqual(5, processor.cache_info()["maxsize"])
+
+    def test_shared_processor(self):
+        processor = shared_processor(use_nltk=False, cache_size=10)
+
+        self.assertIs(processor, shared_processor(use_nltk=False, cache_size=10))
+        self.assertIsNot(processor, shared_processor(use_nltk=False, cache_size=20))
+        self.assertEqual(["a", "b"], processor.process_line("A b"))
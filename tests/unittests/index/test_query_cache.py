@@ -0,0 +1,71 @@
+from datetime import datetime
+import unittest
+
+from index.query_cache import QueryCache, query_key
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        """Start the clock at zero."""
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestQueryCache(unittest.TestCase):
+    def setUp(self) -> None:
+        """Create a small cache with a controllable clock."""
+        self.clock = FakeClock()
+        self.cache = QueryCache(max_size=2, ttl=10, clock=self.clock)
+
+    def test_query_key__ignores_token_order(self):
+        self.assertEqual(query_key(["cat", "dog", "cat"], 10), query_key(["dog", "cat", "cat"], 10))
+        self.assertNotEqual(query_key(["cat", "dog"], 10), query_key(["cat", "dog", "dog"], 10))
+        self.assertNotEqual(query_key(["cat"], 10), query_key(["cat"], 10, 10))
+
+    def test_get__evicts_least_recently_used(self):
+        self.cache.put("a", [1])
+        self.cache.put("b", [2])
+        self.cache.get("a")
+        self.cache.put("c", [3])
+
+        self.assertEqual([1], self.cache.get("a"))
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(1, self.cache.stats()["evictions"])
+
+    def test_get__expires_entries(self):
+        self.cache.put("a", [1])
+        self.clock.now = 10
+
+        self.assertIsNone(self.cache.get("a"))
+        self.assertEqual(1, self.cache.stats()["expirations"])
+
+    def test_get__invalidates_older_index(self):
+        old, new = datetime(2023, 1, 1), datetime(2023, 1, 2)
+        self.cache.put("a", [1], old)
+
+        self.assertEqual([1], self.cache.get("a", old))
+        self.assertIsNone(self.cache.get("a", new))
+
+        # A result of the replaced index is not cached
+        self.cache.put("a", [1], old)
+        self.assertIsNone(self.cache.get("a", new))
+
+        stats = self.cache.stats()
+        self.assertEqual(1, stats["hits"])
+        self.assertEqual(2, stats["misses"])
+        self.assertEqual(1, stats["invalidations"])
+
+    def test_get__keeps_newer_index(self):
+        old, new = datetime(2023, 1, 1), datetime(2023, 1, 2)
+        self.cache.put("a", [1], new)
+
+        # A request still holding the replaced index neither hits nor invalidates the cache
+        self.assertIsNone(self.cache.get("a", old))
+        self.assertEqual([1], self.cache.get("a", new))
+
+        stats = self.cache.stats()
+        self.assertEqual(1, stats["hits"])
+        self.assertEqual(1, stats["misses"])
+        self.assertEqual(0, stats["invalidations"])
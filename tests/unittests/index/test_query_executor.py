@@ -0,0 +1,98 @@
+import asyncio
+from threading import Event
+import unittest
+from unittest import mock
+
+from index.query_executor import QueryExecutor, QueryRejected, QueryTimeout, WorkerResult
+from logging_tools.metrics import Metrics, metrics
+
+
+class TestQueryExecutor(unittest.TestCase):
+    def setUp(self) -> None:
+        """Create an executor of two threads, and an event that holds queries back."""
+        self.executor = QueryExecutor(workers=2, max_pending=2, timeout=5)
+        self.release = Event()
+        self.calls = []
+
+    def tearDown(self) -> None:
+        """Let held queries finish and stop the executor."""
+        self.release.set()
+        self.executor.shutdown()
+
+    def evaluate(self, value: int) -> int:
+        """Wait for the event before returning a value."""
+        self.calls.append(value)
+        self.release.wait(5)
+        return value * 10
+
+    def test_run__coalesces_identical_queries(self):
+        async def run():
+            queries = [self.executor.run("same", self.evaluate, 1) for _ in range(5)]
+            queries.append(self.executor.run("other", self.evaluate, 2))
+
+            await asyncio.sleep(0.05)
+            self.release.set()
+
+            return await asyncio.gather(*queries)
+
+        self.assertListEqual([10, 10, 10, 10, 10, 20], asyncio.run(run()))
+        self.assertListEqual([1, 2], sorted(self.calls))
+        self.assertEqual(4, self.executor.stats()["coalesced"])
+        self.assertEqual(0, self.executor.stats()["in_flight"])
+
+    def test_run__rejects_when_full(self):
+        async def run():
+            queries = [
+                asyncio.ensure_future(self.executor.run(key, self.evaluate, key))
+                for key in range(2)
+            ]
+            await asyncio.sleep(0)
+
+            with self.assertRaises(QueryRejected):
+                await self.executor.run(2, self.evaluate, 2)
+
+            self.release.set()
+            return await asyncio.gather(*queries)
+
+        self.assertListEqual([0, 10], asyncio.run(run()))
+        self.assertEqual(1, self.executor.stats()["rejected"])
+
+    def test_run__timeout(self):
+        async def run():
+            with self.assertRaises(QueryTimeout):
+                await self.executor.run("slow", self.evaluate, 1, timeout=0.01)
+
+            # The query keeps its place until it finishes
+            self.assertEqual(1, self.executor.stats()["in_flight"])
+            self.release.set()
+
+            return await self.executor.run("slow", self.evaluate, 1)
+
+        self.assertEqual(10, asyncio.run(run()))
+        self.assertEqual(1, self.executor.stats()["timeouts"])
+
+    def test_run__raises_errors(self):
+        def fail():
+            raise ValueError("bad query")
+
+        async def run():
+            await self.executor.run("fail", fail)
+
+        self.assertRaises(ValueError, asyncio.run, run())
+        self.assertEqual(0, self.executor.stats()["in_flight"])
+
+    def test_run__merges_worker_metrics(self):
+        worker = Metrics(enabled=True)
+        worker.increment("worker_queries")
+
+        def evaluate():
+            return WorkerResult([1, 2], worker.drain())
+
+        async def run():
+            return await asyncio.gather(*[self.executor.run("same", evaluate) for _ in range(3)])
+
+        with mock.patch.object(metrics, "enabled", True):
+            self.assertListEqual([[1, 2]] * 3, asyncio.run(run()))
+
+            # The metrics of a single evaluation are merged once, however many requests wait
+            self.assertEqual(1, metrics.counters.pop("worker_queries")[()])
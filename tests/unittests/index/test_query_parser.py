@@ -0,0 +1,54 @@
+import unittest
+
+from index.processor import Processor
+from index.query_parser import (
+    And,
+    Not,
+    Or,
+    Phrase,
+    Proximity,
+    Term,
+    parse_boolean_query,
+    parse_query,
+)
+
+
+class TestQueryParser(unittest.TestCase):
+    def setUp(self) -> None:
+        """Create a processor that does not need the nltk data."""
+        self.processor = Processor(use_nltk=False)
+
+    def test_parse_query__bag_of_words(self):
+        parsed_query = parse_query("Sea Otter eats-fish", self.processor)
+
+        self.assertListEqual(["sea", "otter", "eats", "fish"], parsed_query.terms)
+        self.assertFalse(parsed_query.positional)
+
+    def test_parse_query__phrases_and_proximity(self):
+        parsed_query = parse_query('"sea otter" NEAR/3 kelp "Fish', self.processor)
+
+        self.assertListEqual(["sea", "otter", "kelp", "fish"], parsed_query.terms)
+        self.assertListEqual([["sea", "otter"]], parsed_query.phrases)
+        self.assertListEqual([Proximity(["sea", "otter"], ["kelp"], 3)], parsed_query.proximities)
+
+    def test_parse_query__operator_without_operand(self):
+        parsed_query = parse_query("NEAR/2 otter near/2 kelp NEAR/4", self.processor)
+
+        self.assertListEqual(["otter", "near", "2", "kelp"], parsed_query.terms)
+        self.assertListEqual([], parsed_query.proximities)
+
+    def test_parse_boolean_query__precedence(self):
+        parsed_query = parse_boolean_query('otter kelp OR NOT "sea urchin"', self.processor)
+        expected = Or([And([Term("otter"), Term("kelp")]), Not(Phrase(["sea", "urchin"]))])
+
+        self.assertEqual(expected, parsed_query)
+
+    def test_parse_boolean_query__parentheses(self):
+        parsed_query = parse_boolean_query("otter AND (kelp OR fish) and", self.processor)
+        expected = And([Term("otter"), Or([Term("kelp"), Term("fish")]), Term("and")])
+
+        self.assertEqual(expected, parsed_query)
+
+    def test_parse_boolean_query__malformed(self):
+        for query_str in ["(otter", "otter)", "otter AND", "OR otter", "NOT"]:
+            self.assertRaises(ValueError, parse_boolean_query, query_str, self.processor)
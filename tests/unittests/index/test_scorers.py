@@ -0,0 +1,110 @@
+from collections import Counter
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from index.inverted_index import InvertedIndex
+from index.loaded_index import LoadedIndex
+from index.postings import IMPACT_8_ENCODING
+from index.scorers import BM25Scorer, DirichletScorer, get_scorer
+
+
+class TestScorers(unittest.TestCase):
+    def setUp(self) -> None:
+        """Build an index of random documents in a temporary working directory."""
+        self.cwd = os.getcwd()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.temp_dir.name)
+        os.mkdir("output_reports")
+
+        rng = np.random.default_rng(0)
+        vocabulary = [f"term{i}" for i in range(30)]
+        self.documents = [list(rng.choice(vocabulary, size=rng.integers(1, 40))) for _ in range(60)]
+
+        self.index = InvertedIndex()
+
+        for document_id, words in enumerate(self.documents, start=1):
+            for word in words:
+                self.index.add_word(document_id, word)
+            self.index.num_docs += 1
+
+        self.loaded_index = LoadedIndex(*self.index.generate_file("test"))
+        self.query = ["term1", "term2", "term2", "term7", "missing"]
+
+    def tearDown(self) -> None:
+        """Remove the temporary working directory."""
+        os.chdir(self.cwd)
+        self.temp_dir.cleanup()
+
+    def rank(self, score_document, k: int):
+        """Rank the documents containing a query term with a reference scoring function."""
+        scores = []
+
+        for document_id, words in enumerate(self.documents, start=1):
+            counts = Counter(words)
+
+            if any(term in counts for term in self.query):
+                scores.append((-score_document(counts, len(words)), document_id))
+
+        return [(document_id, -score) for score, document_id in sorted(scores)[:k]]
+
+    def assert_ranking(self, expected, actual):
+        """Check that two rankings hold the same documents and scores."""
+        self.assertListEqual([doc_id for doc_id, _ in expected], [doc_id for doc_id, _ in actual])
+        np.testing.assert_allclose([score for _, score in expected], [score for _, score in actual])
+
+    def test_top_k__bm25(self):
+        num_docs = len(self.documents)
+        average_length = np.mean([len(words) for words in self.documents])
+        query_counts = Counter(term for term in self.query if term != "missing")
+
+        def score_document(counts, length):
+            score = 0.0
+
+            for term, query_tf in query_counts.items():
+                doc_frequency = sum(term in words for words in self.documents)
+                idf = np.log(1 + (num_docs - doc_frequency + 0.5) / (doc_frequency + 0.5))
+                tf = counts[term]
+                score += (
+                    query_tf * idf * tf * 2.2 / (tf + 1.2 * (0.25 + 0.75 * length / average_length))
+                )
+
+            return score
+
+        expected = self.rank(score_document, 10)
+        self.assert_ranking(expected, self.loaded_index.top_k(self.query, 10, scorer=BM25Scorer()))
+
+    def test_top_k__dirichlet(self):
+        total_tokens = sum(len(words) for words in self.documents)
+        query_counts = Counter(term for term in self.query if term != "missing")
+
+        def score_document(counts, length):
+            score = 0.0
+
+            for term, query_tf in query_counts.items():
+                collection_frequency = sum(words.count(term) for words in self.documents)
+                probability = (counts[term] + 100 * collection_frequency / total_tokens) / (
+                    length + 100
+                )
+                score += query_tf * np.log(probability / (collection_frequency / total_tokens))
+
+            return score
+
+        # The reference drops the part of the score shared by every document
+        scorer = DirichletScorer(mu=100)
+        expected = self.rank(score_document, 10)
+        actual = self.loaded_index.top_k(self.query, 10, scorer=scorer)
+
+        self.assert_ranking(expected, actual)
+
+    def test_top_k__impact_postings_need_frequencies(self):
+        impact_files = self.index.generate_file("test_impact", encoding=IMPACT_8_ENCODING)
+        impact_index = LoadedIndex(*impact_files)
+
+        self.assertRaises(ValueError, impact_index.top_k, self.query, 10, scorer=BM25Scorer())
+
+    def test_get_scorer(self):
+        self.assertEqual("bm25", get_scorer("bm25").name)
+        self.assertRaises(ValueError, get_scorer, "tfidf")
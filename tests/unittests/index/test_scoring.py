@@ -0,0 +1,45 @@
+import unittest
+
+import numpy as np
+
+from index.scoring import accumulate_scores, max_score_top_k, select_top_k
+
+
+class TestScoring(unittest.TestCase):
+    def test_accumulate_scores(self):
+        doc_ids, scores = accumulate_scores(
+            [np.array([1, 5, 9]), np.array([5, 7])],
+            [np.array([1.0, 2.0, 3.0]), np.array([4.0, 5.0])],
+        )
+
+        np.testing.assert_array_equal([1, 5, 7, 9], doc_ids)
+        np.testing.assert_array_equal([1.0, 6.0, 5.0, 3.0], scores)
+
+    def test_select_top_k__ties_by_doc_id(self):
+        doc_ids, scores = select_top_k(np.array([4, 2, 3, 1]), np.array([0.5, 0.9, 0.5, 0.5]), 3)
+
+        np.testing.assert_array_equal([2, 1, 3], doc_ids)
+        np.testing.assert_array_equal([0.9, 0.5, 0.5], scores)
+
+    def test_max_score_top_k__matches_exhaustive(self):
+        rng = np.random.default_rng(0)
+        postings = []
+
+        for _ in range(6):
+            doc_ids = np.sort(rng.choice(1000, size=rng.integers(1, 300), replace=False))
+            postings.append((doc_ids, rng.random(len(doc_ids)) * rng.random()))
+
+        upper_bounds = np.array([contributions.max() for _, contributions in postings])
+        fetched = []
+
+        def fetch_contributions(position, candidates):
+            fetched.append(candidates is None)
+            return postings[position]
+
+        doc_ids, scores = accumulate_scores(*zip(*postings))
+        expected_ids, expected_scores = select_top_k(doc_ids, scores, 10)
+
+        actual_ids, actual_scores = max_score_top_k(upper_bounds, fetch_contributions, 10)
+
+        np.testing.assert_array_equal(expected_ids, actual_ids)
+        np.testing.assert_allclose(expected_scores, actual_scores)
@@ -0,0 +1,123 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from index.inverted_index import InvertedIndex
+from index.loaded_index import LoadedIndex
+from index.processor import Processor
+from index.segments import SegmentedIndex
+
+
+DOCUMENTS = [
+    (1, "bird dog dog dog"),
+    (2, "aardvark bird bird cat egret"),
+    (3, "aardvark aardvark bird"),
+    (4, "bird dog egret egret"),
+    (5, "cat cat dog"),
+    (6, "egret aardvark"),
+]
+
+
+class TestSegmentedIndex(unittest.TestCase):
+    def setUp(self) -> None:
+        """Create a temporary working directory."""
+        self.cwd = os.getcwd()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.temp_dir.name)
+        os.mkdir("output_reports")
+
+        self.processor = Processor(use_nltk=False)
+
+    def tearDown(self) -> None:
+        """Remove the temporary working directory."""
+        os.chdir(self.cwd)
+        self.temp_dir.cleanup()
+
+    def build_single_index(self, documents) -> LoadedIndex:
+        """Build a single index of a list of documents."""
+        index = InvertedIndex()
+        index.doc_ids = []
+
+        for document_id, text in documents:
+            for token in self.processor.process_line(text):
+                index.add_word(document_id, token)
+
+            index.doc_ids.append(document_id)
+            index.num_docs += 1
+
+        return LoadedIndex(*index.generate_file(f"single_{len(documents)}"))
+
+    def assert_same_ranking(self, expected, actual, query):
+        """Assert that two indexes rank every document the same way."""
+        expected_results = expected.top_k(query, 10)
+        actual_results = actual.top_k(query, 10)
+
+        self.assertListEqual(
+            [doc_id for doc_id, _ in expected_results], [doc_id for doc_id, _ in actual_results]
+        )
+        np.testing.assert_allclose(
+            [score for _, score in expected_results], [score for _, score in actual_results]
+        )
+
+    def test_top_k__matches_single_index(self):
+        segmented_index = SegmentedIndex("segments")
+        segmented_index.add_documents(DOCUMENTS[:4], self.processor)
+        segmented_index.add_documents(DOCUMENTS[4:], self.processor)
+
+        query = ["dog", "egret", "cat", "cat"]
+        self.assert_same_ranking(self.build_single_index(DOCUMENTS), segmented_index, query)
+
+        # The index can be reopened from its manifest
+        self.assert_same_ranking(
+            self.build_single_index(DOCUMENTS), SegmentedIndex("segments"), query
+        )
+
+    def test_add_documents__keeps_decoded_postings(self):
+        segmented_index = SegmentedIndex("segments")
+        first = segmented_index.add_documents(DOCUMENTS[:4], self.processor)
+
+        with mock.patch.object(
+            segmented_index.segments[first], "read_postings", side_effect=AssertionError
+        ):
+            segmented_index.add_documents(DOCUMENTS[4:], self.processor)
+
+        query = ["dog", "egret", "cat", "cat"]
+        self.assert_same_ranking(self.build_single_index(DOCUMENTS), segmented_index, query)
+
+    def test_delete_documents(self):
+        segmented_index = SegmentedIndex("segments")
+        segmented_index.add_documents(DOCUMENTS, self.processor)
+
+        self.assertEqual(1, segmented_index.delete_documents([5, 99]))
+
+        doc_ids = [doc_id for doc_id, _ in segmented_index.top_k(["cat"], 10)]
+        self.assertListEqual([2], doc_ids)
+
+        doc_ids = [doc_id for doc_id, _ in SegmentedIndex("segments").top_k(["cat"], 10)]
+        self.assertListEqual([2], doc_ids)
+
+    def test_add_documents__replaces_older_versions(self):
+        segmented_index = SegmentedIndex("segments")
+        segmented_index.add_documents(DOCUMENTS, self.processor)
+        segmented_index.add_documents([(2, "zebra")], self.processor)
+
+        self.assertListEqual([2], [doc_id for doc_id, _ in segmented_index.top_k(["zebra"], 10)])
+        self.assertListEqual([5], [doc_id for doc_id, _ in segmented_index.top_k(["cat"], 10)])
+
+    def test_maybe_merge(self):
+        segmented_index = SegmentedIndex("segments", merge_factor=3)
+
+        for document in DOCUMENTS:
+            segmented_index.add_documents([document], self.processor)
+
+        segmented_index.delete_documents([1])
+        merged = segmented_index.maybe_merge()
+
+        self.assertEqual(2, len(merged))
+        self.assertEqual(2, len(segmented_index.snapshot.segments))
+
+        query = ["dog", "egret", "cat", "cat"]
+        self.assert_same_ranking(self.build_single_index(DOCUMENTS[1:]), segmented_index, query)
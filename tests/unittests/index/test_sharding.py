@@ -0,0 +1,134 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from index.inverted_index import InvertedIndex
+from index.loaded_index import LoadedIndex
+from index.processor import Processor
+from index.shard_broker import HttpShard, LocalShard, ShardBroker, merge_results
+from index.sharding import build_shards, load_shard, read_manifest, search_shard
+from index.spimi import SpimiIndex
+
+
+QUERIES = ["term1 term4", "term2 term2 term30", "term7 term11 term12 term45", "term49 missing"]
+
+
+class TestSharding(unittest.TestCase):
+    def setUp(self) -> None:
+        """Create a temporary working directory and a collection of random documents."""
+        self.cwd = os.getcwd()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.temp_dir.name)
+        os.mkdir("output_reports")
+
+        self.processor = Processor(use_nltk=False)
+
+        rng = np.random.default_rng(0)
+        vocabulary = [f"term{i}" for i in range(50)]
+        self.documents = [
+            (document_id, " ".join(rng.choice(vocabulary, size=rng.integers(1, 30))))
+            for document_id in range(1, 61)
+        ]
+
+        self.manifest_file = build_shards(self.documents, self.processor, 3, "sharded")
+        self.broker = ShardBroker.from_manifest(self.manifest_file, self.processor)
+
+        index = InvertedIndex()
+
+        for document_id, text in self.documents:
+            for token in self.processor.process_line(text):
+                index.add_word(document_id, token)
+            index.num_docs += 1
+
+        self.single_index = LoadedIndex(*index.generate_file("single"))
+
+    def tearDown(self) -> None:
+        """Stop the broker and remove the temporary working directory."""
+        self.broker.close()
+        os.chdir(self.cwd)
+        self.temp_dir.cleanup()
+
+    def assert_same_results(self, expected, actual):
+        """Assert that two lists of documents and scores are the same."""
+        self.assertListEqual([doc_id for doc_id, _ in expected], [doc_id for doc_id, _ in actual])
+        np.testing.assert_allclose(
+            [score for _, score in expected], [score for _, score in actual], rtol=1e-9
+        )
+
+    def test_build_shards(self):
+        manifest = read_manifest(self.manifest_file)
+
+        self.assertEqual(60, manifest["num_docs"])
+        self.assertListEqual([20, 20, 20], [shard["num_docs"] for shard in manifest["shards"]])
+
+        shard = load_shard(self.manifest_file, 1)
+        self.assertListEqual(list(range(1, 61, 3)), shard.doc_ids.tolist())
+        self.assertEqual(self.single_index.statistics.num_docs, shard.statistics.num_docs)
+        self.assertEqual(self.single_index.statistics.total_tokens, shard.statistics.total_tokens)
+
+        # Every shard records the statistics of the whole collection
+        for term in self.single_index.term_dictionary.terms:
+            expected = self.single_index.term_dictionary.lookup(term)
+            actual = shard.lookup(term)
+
+            self.assertEqual(expected.document_frequency, actual.document_frequency)
+            self.assertEqual(expected.collection_frequency, actual.collection_frequency)
+            self.assertAlmostEqual(
+                expected.inverse_document_frequency, actual.inverse_document_frequency
+            )
+
+    def test_build_shards__rejects_other_index_classes(self):
+        with self.assertRaises(ValueError):
+            build_shards(self.documents, self.processor, 2, "spimi", index_class=SpimiIndex)
+
+    def test_search__matches_single_index(self):
+        for model in ["cosine", "bm25", "dirichlet"]:
+            for mode in ["ranked", "conjunctive"]:
+                for query in QUERIES:
+                    expected = search_shard(
+                        self.single_index, self.processor, query, 15, model, mode
+                    )[5:]
+                    actual = self.broker.search(query, 10, 5, model, mode)
+
+                    with self.subTest(model=model, mode=mode, query=query):
+                        self.assert_same_results(expected, actual)
+
+    def test_search__boolean(self):
+        query = "(term1 OR term4) AND NOT term2"
+
+        expected = search_shard(self.single_index, self.processor, query, 100, mode="boolean")
+        actual = self.broker.search(query, 5, 3, mode="boolean")
+
+        self.assertListEqual(expected[3:8], actual)
+
+    def test_search__http_shards(self):
+        local_shards = {
+            f"http://shard{shard_id}": LocalShard(
+                load_shard(self.manifest_file, shard_id), self.processor
+            )
+            for shard_id in range(3)
+        }
+
+        def stand_in(url, body, timeout):
+            """Answer a request as the worker holding the shard at the URL would."""
+            shard = local_shards[url.replace("/shard/search", "")]
+            documents = shard.search(body["query_str"], body["limit"], body["model"], body["mode"])
+
+            return {
+                "documents": [{"doc_id": doc_id, "score": score} for doc_id, score in documents]
+            }
+
+        broker = ShardBroker([HttpShard(url, transport=stand_in) for url in local_shards])
+
+        for query in QUERIES:
+            self.assert_same_results(self.broker.search(query), broker.search(query))
+
+        broker.close()
+
+    def test_merge_results(self):
+        results = [[(4, 0.9), (1, 0.5)], [(2, 0.9), (6, 0.7)], []]
+
+        self.assertListEqual([(2, 0.9), (4, 0.9), (6, 0.7)], merge_results(results, 3))
+        self.assertListEqual([(6, 0.7), (1, 0.5)], merge_results(results, 3, offset=2))
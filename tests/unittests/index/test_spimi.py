@@ -0,0 +1,129 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from index.inverted_index import InvertedIndex
+from index.loaded_index import LoadedIndex
+from index.spimi import SpimiIndex
+
+
+class TestSpimiIndex(unittest.TestCase):
+    def setUp(self) -> None:
+        """Create a temporary working directory."""
+        self.cwd = os.getcwd()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.temp_dir.name)
+        os.mkdir("output_reports")
+
+        rng = np.random.default_rng(0)
+        vocabulary = [f"term{i}" for i in range(50)]
+        self.documents = [list(rng.choice(vocabulary, size=rng.integers(1, 30))) for _ in range(40)]
+
+    def tearDown(self) -> None:
+        """Remove the temporary working directory."""
+        os.chdir(self.cwd)
+        self.temp_dir.cleanup()
+
+    def build(self, index, dataset_name: str, doc_ids=None, record_doc_ids: bool = True):
+        """Add every document to an index and generate its files."""
+        doc_ids = doc_ids or list(range(1, len(self.documents) + 1))
+
+        if record_doc_ids and doc_ids[-1] != len(doc_ids):
+            index.doc_ids = doc_ids
+
+        for document_id, words in zip(doc_ids, self.documents):
+            for word in words:
+                index.add_word(document_id, word)
+            index.num_docs += 1
+
+        return index.generate_file(dataset_name)
+
+    def test_generate_file__matches_in_memory_index(self):
+        spimi_index = SpimiIndex(memory_budget=2000, run_directory="runs")
+        os.mkdir("runs")
+
+        expected_files = self.build(InvertedIndex(), "memory")
+        actual_files = self.build(spimi_index, "spimi")
+
+        self.assertListEqual([], os.listdir("runs"))
+
+        expected_lengths = pd.read_csv(expected_files[2])
+        actual_lengths = pd.read_csv(actual_files[2])
+        np.testing.assert_allclose(
+            expected_lengths["euclidean_length"], actual_lengths["euclidean_length"]
+        )
+
+        expected_index = LoadedIndex(*expected_files)
+        actual_index = LoadedIndex(*actual_files)
+
+        for term in expected_index.term_dictionary.terms:
+            expected_doc_ids, expected_frequencies = expected_index.postings(term)
+            actual_doc_ids, actual_frequencies = actual_index.postings(term)
+
+            np.testing.assert_array_equal(expected_doc_ids, actual_doc_ids)
+            np.testing.assert_array_equal(expected_frequencies, actual_frequencies)
+            # Terms are written in a different order, so their offsets differ and lengths
+            # are summed in a different order
+            expected_entry = expected_index.term_dictionary.lookup(term)
+            actual_entry = actual_index.term_dictionary.lookup(term)
+            self.assertEqual(expected_entry.document_frequency, actual_entry.document_frequency)
+            self.assertEqual(
+                expected_entry.inverse_document_frequency, actual_entry.inverse_document_frequency
+            )
+            self.assertAlmostEqual(expected_entry.max_score, actual_entry.max_score)
+
+    def test_generate_file__removes_temporary_run_directory(self):
+        spimi_index = SpimiIndex(memory_budget=2000)
+        run_directory = spimi_index.run_directory
+
+        self.build(spimi_index, "spimi")
+
+        self.assertFalse(os.path.exists(run_directory))
+
+    def test_generate_file__sparse_doc_ids(self):
+        spimi_index = SpimiIndex(memory_budget=2000, run_directory="runs")
+        os.mkdir("runs")
+        doc_ids = [100 + 7 * i for i in range(len(self.documents))]
+
+        expected_lengths = pd.read_csv(self.build(InvertedIndex(), "memory", doc_ids)[2])
+        actual_lengths = pd.read_csv(self.build(spimi_index, "spimi", doc_ids)[2])
+
+        self.assertListEqual(doc_ids, actual_lengths["doc_id"].tolist())
+        np.testing.assert_allclose(
+            expected_lengths["euclidean_length"], actual_lengths["euclidean_length"]
+        )
+        np.testing.assert_array_equal(
+            expected_lengths["token_length"], actual_lengths["token_length"]
+        )
+
+        # The IDs of the documents are also found when they are not recorded
+        unrecorded_index = SpimiIndex(memory_budget=2000, run_directory="runs")
+        unrecorded_files = self.build(unrecorded_index, "unrecorded", doc_ids, False)
+        pd.testing.assert_frame_equal(actual_lengths, pd.read_csv(unrecorded_files[2]))
+
+    def test_term_statistics__before_generate_file(self):
+        spimi_index = SpimiIndex(memory_budget=2000, run_directory="runs")
+        os.mkdir("runs")
+        expected = InvertedIndex()
+
+        for document_id, words in enumerate(self.documents, start=1):
+            for word in words:
+                spimi_index.add_word(document_id, word)
+                expected.add_word(document_id, word)
+
+        self.assertGreater(len(spimi_index.runs), 0)
+        self.assertEqual(len(expected.index), spimi_index.num_terms)
+
+        terms, counts, doc_frequencies = expected.term_statistics()
+        order = np.argsort(terms)
+        self.assertTupleEqual(
+            (
+                np.array(terms)[order].tolist(),
+                np.array(counts)[order].tolist(),
+                np.array(doc_frequencies)[order].tolist(),
+            ),
+            spimi_index.term_statistics(),
+        )
@@ -0,0 +1,98 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from index.inverted_index import InvertedIndex
+from index.loaded_index import LoadedIndex
+from index.statistics_file import (
+    StatisticsFile,
+    convert_to_statistics_file,
+    read_statistics,
+    statistics_file_name,
+)
+from index.term_dictionary import TermDictionary
+
+
+class TestStatisticsFile(unittest.TestCase):
+    def setUp(self) -> None:
+        """Build an index of random documents in a temporary working directory."""
+        self.cwd = os.getcwd()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.temp_dir.name)
+        os.mkdir("output_reports")
+
+        rng = np.random.default_rng(0)
+        vocabulary = [f"term{i}" for i in range(30)] + ["café", "nan"]
+        index = InvertedIndex()
+
+        for document_id in range(1, 41):
+            for word in rng.choice(vocabulary, size=rng.integers(1, 20)):
+                index.add_word(document_id, str(word))
+            index.num_docs += 1
+
+        self.files = index.generate_file("test")
+        self.statistics_file = statistics_file_name(self.files[0])
+
+    def tearDown(self) -> None:
+        """Remove the temporary working directory."""
+        os.chdir(self.cwd)
+        self.temp_dir.cleanup()
+
+    def test_read_statistics__matches_csv_files(self):
+        expected = TermDictionary.from_files(self.files[0], self.files[1])
+        term_dictionary, documents = read_statistics(self.statistics_file, verify=True)
+
+        self.assertEqual(len(expected), len(term_dictionary))
+        self.assertListEqual(expected.terms.tolist(), term_dictionary.terms.tolist())
+
+        # The CSV parser may round the last digit of floats, which the binary file keeps
+        for term in expected.terms:
+            expected_entry, entry = expected.lookup(term), term_dictionary.lookup(term)
+            self.assertEqual(
+                expected_entry._replace(inverse_document_frequency=0, max_score=0),
+                entry._replace(inverse_document_frequency=0, max_score=0),
+            )
+            self.assertAlmostEqual(
+                expected_entry.inverse_document_frequency, entry.inverse_document_frequency
+            )
+            self.assertAlmostEqual(expected_entry.max_score, entry.max_score)
+
+        self.assertIsNone(term_dictionary.lookup("missing"))
+        self.assertNotIn("term", term_dictionary)
+        self.assertEqual(list(range(1, 41)), documents.doc_ids.tolist())
+        self.assertEqual(int(np.sum(documents.token_lengths)), documents.total_tokens)
+
+    def assert_ranking(self, expected, actual):
+        """Check that two rankings hold the same documents and scores."""
+        self.assertListEqual([doc_id for doc_id, _ in expected], [doc_id for doc_id, _ in actual])
+        np.testing.assert_allclose([score for _, score in expected], [score for _, score in actual])
+
+    def test_loaded_index__same_results_without_statistics_file(self):
+        query = ["term1", "term2", "term2", "café"]
+        expected = LoadedIndex(*self.files).top_k(query, 10)
+
+        os.remove(self.statistics_file)
+        self.assert_ranking(expected, LoadedIndex(*self.files).top_k(query, 10))
+
+        # The file can also be written for an existing index
+        convert_to_statistics_file(*self.files, byte_order="big")
+        self.assert_ranking(expected, LoadedIndex(*self.files).top_k(query, 10))
+
+    def test_statistics_file__detects_corruption(self):
+        with open(self.statistics_file, "r+b") as file:
+            file.seek(-1, os.SEEK_END)
+            last_byte = file.read(1)
+            file.seek(-1, os.SEEK_END)
+            file.write(bytes([last_byte[0] ^ 0xFF]))
+
+        # Sections are only checked on request
+        statistics_file = StatisticsFile(self.statistics_file)
+        self.assertRaises(ValueError, statistics_file.verify)
+
+        with open(self.statistics_file, "r+b") as file:
+            file.seek(20)
+            file.write(b"\xff")
+
+        self.assertRaises(ValueError, StatisticsFile, self.statistics_file)
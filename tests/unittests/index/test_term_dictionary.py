@@ -0,0 +1,35 @@
+import unittest
+
+import pandas as pd
+
+from index.term_dictionary import TermDictionary
+
+
+class TestTermDictionary(unittest.TestCase):
+    def setUp(self) -> None:
+        """Create a term dictionary from an unsorted lexicon."""
+        lexicon = pd.DataFrame(
+            zip(["dog", "bird", "nan", "cat"], [2, 3, 1, 1], [1.0, 0.4, 2.0, 2.0], [0, 16, 40, 48]),
+            columns=["term", "document_frequency", "inverse_document_frequency", "offset"],
+        )
+        self.term_dictionary = TermDictionary.from_dataframe(lexicon, 56)
+
+    def test_lookup(self):
+        entry = self.term_dictionary.lookup("bird")
+
+        self.assertEqual(1, entry.term_id)
+        self.assertEqual(3, entry.document_frequency)
+        self.assertEqual(0.4, entry.inverse_document_frequency)
+        self.assertEqual(16, entry.offset)
+        self.assertEqual(24, entry.length)
+
+    def test_lookup__last_term(self):
+        entry = self.term_dictionary.lookup("cat")
+
+        self.assertEqual(48, entry.offset)
+        self.assertEqual(8, entry.length)
+
+    def test_lookup__missing_term(self):
+        self.assertIsNone(self.term_dictionary.lookup("aardvark"))
+        self.assertIsNone(self.term_dictionary.lookup("zebra"))
+        self.assertNotIn("do", self.term_dictionary)
@@ -0,0 +1,98 @@
+import logging
+import unittest
+
+from logging_tools.metrics import NULL_TIMER, Metrics
+from logging_tools.progress import ProgressLogger
+
+
+class TestMetrics(unittest.TestCase):
+    def test_disabled(self):
+        metrics = Metrics(enabled=False)
+
+        with metrics.timer("scoring") as timer:
+            metrics.increment("queries")
+
+        self.assertIs(NULL_TIMER, metrics.timer("scoring"))
+        self.assertIsNone(timer)
+        self.assertEqual("\n", metrics.render())
+
+    def test_render__counters(self):
+        metrics = Metrics(enabled=True)
+        metrics.increment("queries", mode="ranked")
+        metrics.increment("queries", 2, mode="ranked")
+        metrics.increment("queries", mode='say "hi"')
+
+        expected = [
+            "# TYPE text_retrieval_queries_total counter",
+            'text_retrieval_queries_total{mode="ranked"} 3',
+            'text_retrieval_queries_total{mode="say \\"hi\\""} 1',
+        ]
+        self.assertListEqual(expected, metrics.render().splitlines())
+
+    def test_render__histogram(self):
+        metrics = Metrics(enabled=True)
+        metrics.observe("scoring", 0.003)
+        metrics.observe("scoring", 0.02)
+        metrics.observe("scoring", 30.0)
+
+        lines = metrics.render({"query_cache_size": 4}).splitlines()
+
+        self.assertEqual("# TYPE text_retrieval_scoring_seconds histogram", lines[0])
+        self.assertIn('text_retrieval_scoring_seconds_bucket{le="0.0025"} 0', lines)
+        self.assertIn('text_retrieval_scoring_seconds_bucket{le="0.005"} 1', lines)
+        self.assertIn('text_retrieval_scoring_seconds_bucket{le="0.025"} 2', lines)
+        self.assertIn('text_retrieval_scoring_seconds_bucket{le="10.0"} 2', lines)
+        self.assertIn('text_retrieval_scoring_seconds_bucket{le="+Inf"} 3', lines)
+        self.assertIn("text_retrieval_scoring_seconds_sum 30.023", lines)
+        self.assertIn("text_retrieval_scoring_seconds_count 3", lines)
+        self.assertListEqual(
+            ["# TYPE text_retrieval_query_cache_size gauge", "text_retrieval_query_cache_size 4"],
+            lines[-2:],
+        )
+
+    def test_timer(self):
+        metrics = Metrics(enabled=True)
+
+        with metrics.timer("tokenize", mode="boolean"):
+            pass
+
+        histogram = metrics.histograms["tokenize"][(("mode", "boolean"),)]
+        self.assertEqual(1, histogram.count)
+
+        metrics.reset()
+        self.assertDictEqual({}, metrics.histograms)
+
+    def test_merge__drained_metrics(self):
+        worker = Metrics(enabled=True)
+        worker.increment("postings_decode", 2)
+        worker.observe("scoring", 0.003)
+
+        metrics = Metrics(enabled=True)
+        metrics.increment("postings_decode")
+        metrics.observe("scoring", 0.02)
+        metrics.merge(worker.drain())
+
+        # Draining starts the worker's metrics afresh
+        self.assertEqual("\n", worker.render())
+        self.assertEqual(3, metrics.counters["postings_decode"][()])
+
+        histogram = metrics.histograms["scoring"][()]
+        self.assertEqual(2, histogram.count)
+        self.assertAlmostEqual(0.023, histogram.sum)
+
+
+class TestProgressLogger(unittest.TestCase):
+    def test_update__rate_limited(self):
+        logger = logging.getLogger("test_progress")
+
+        with self.assertLogs(logger, logging.INFO) as logs:
+            progress = ProgressLogger(logger, interval=3600, total_bytes=1024**2)
+
+            for _ in range(100):
+                progress.update(1, 10)
+
+            progress.finish()
+
+        self.assertEqual(1, len(logs.output))
+        self.assertIn("100 documents processed", logs.output[0])
+        self.assertIn("MB/s", logs.output[0])
@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+
+from utils.doc_processing import split_sgml_file, yield_sgml_text
+
+
+SGML = """<P ID=1>
+sea otter
+</P>
+
+<P ID=22>
+kelp ID=3
+a <P ID=4> within a line
+</P>
+<Q ID=5>
+urchin
+</Q>
+<P ID=6>
+never closed
+"""
+
+
+class TestDocProcessing(unittest.TestCase):
+    def setUp(self) -> None:
+        """Write a small SGML file in a temporary directory."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.file_name = os.path.join(self.temp_dir.name, "documents.txt")
+
+        with open(self.file_name, "w", encoding="utf-8") as file:
+            file.write(SGML)
+
+    def tearDown(self) -> None:
+        """Remove the temporary directory."""
+        self.temp_dir.cleanup()
+
+    def test_yield_sgml_text(self):
+        documents = list(yield_sgml_text(self.file_name))
+
+        self.assertListEqual([1, 22, 5], [document_id for document_id, _ in documents])
+        self.assertEqual("sea otter\n", documents[0][1])
+        self.assertEqual("kelp ID=3\na <P ID=4> within a line\n", documents[1][1])
+        self.assertEqual("urchin\n", documents[2][1])
+
+    def test_split_sgml_file__ranges_hold_every_document_once(self):
+        expected = list(yield_sgml_text(self.file_name))
+
+        for range_size in [1, 10, 1000]:
+            byte_ranges = split_sgml_file(self.file_name, range_size)
+            actual = [
+                document
+                for start, end in byte_ranges
+                for document in yield_sgml_text(self.file_name, start, end)
+            ]
+
+            self.assertListEqual(expected, actual)
+            self.assertEqual(0, byte_ranges[0][0])
+            self.assertEqual(len(SGML), byte_ranges[-1][1])
+
+    def test_split_sgml_file__empty_file(self):
+        open(self.file_name, "w").close()
+
+        self.assertListEqual([], split_sgml_file(self.file_name, 10))
+        self.assertListEqual([], list(yield_sgml_text(self.file_name)))
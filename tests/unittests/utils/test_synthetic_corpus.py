@@ -0,0 +1,62 @@
+import filecmp
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from utils.doc_processing import yield_sgml_text
+from utils.synthetic_corpus import (
+    generate_corpus,
+    generate_topics,
+    make_vocabulary,
+    zipf_probabilities,
+)
+
+
+class TestSyntheticCorpus(unittest.TestCase):
+    def setUp(self) -> None:
+        """Create a temporary directory for the generated files."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        """Remove the temporary directory."""
+        self.temp_dir.cleanup()
+
+    def path(self, file_name: str) -> str:
+        """Find the path of a file in the temporary directory."""
+        return os.path.join(self.temp_dir.name, file_name)
+
+    def test_make_vocabulary(self):
+        vocabulary = make_vocabulary(3000)
+
+        self.assertEqual(3000, len(set(vocabulary)))
+        self.assertTrue(all(word.isalpha() and word.islower() for word in vocabulary))
+
+    def test_zipf_probabilities(self):
+        probabilities = zipf_probabilities(100, 1.1)
+
+        self.assertAlmostEqual(1.0, probabilities.sum())
+        self.assertTrue(np.all(np.diff(probabilities) < 0))
+
+    def test_generate_corpus(self):
+        num_words = generate_corpus(self.path("corpus.txt"), 150, 500, mean_length=20)
+        documents = list(yield_sgml_text(self.path("corpus.txt")))
+
+        self.assertListEqual(list(range(1, 151)), [document_id for document_id, _ in documents])
+        self.assertEqual(num_words, sum(len(text.split()) for _, text in documents))
+
+    def test_generate_corpus__deterministic(self):
+        generate_corpus(self.path("first.txt"), 50, 500, seed=3)
+        generate_corpus(self.path("second.txt"), 50, 500, seed=3)
+        generate_corpus(self.path("other.txt"), 50, 500, seed=4)
+
+        self.assertTrue(filecmp.cmp(self.path("first.txt"), self.path("second.txt"), shallow=False))
+        self.assertFalse(filecmp.cmp(self.path("first.txt"), self.path("other.txt"), shallow=False))
+
+    def test_generate_topics(self):
+        generate_topics(self.path("topics.txt"), 20, 500, min_terms=2, max_terms=4)
+        queries = list(yield_sgml_text(self.path("topics.txt")))
+
+        self.assertListEqual(list(range(1, 21)), [query_id for query_id, _ in queries])
+        self.assertTrue(all(2 <= len(text.split()) <= 4 for _, text in queries))
@@ -1,26 +1,129 @@
-from typing import Tuple
+import mmap
+import os
+import re
+from typing import Iterator, List, Optional, Tuple
 
 
-def yield_sgml_text(file_name: str) -> Tuple[int, str]:
+# The line opening a document or a query, e.g. <P ID=12>
+OPENING_TAG_PATTERN = re.compile(rb"<([PQ]) ID=\s*(\d+)\s*>")
+
+# The part of an opening tag searched for, which is found faster than a regular expression
+OPENING_TAG_MARKER = b" ID="
+
+
+def open_sgml_file(file_name: str) -> Optional[mmap.mmap]:
+    """Memory-map an SGML file for reading.
+
+    :param file_name: The name of the file
+    :return: The memory map, or None if the file is empty, since it cannot be mapped
+    """
+    if os.path.getsize(file_name) == 0:
+        return None
+
+    with open(file_name, "rb") as file:
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def find_opening_tag(buffer, start: int = 0) -> Optional[re.Match]:
+    """Find the next opening tag that starts a line.
+
+    :param buffer: The bytes of the file, e.g. a memory map
+    :param start: The offset at or after which the tag must start
+    :return: The match of the opening tag, or None if there is none
+    """
+    position = buffer.find(OPENING_TAG_MARKER, start + 2)
+
+    while position >= 0:
+        tag_start = position - 2
+        match = OPENING_TAG_PATTERN.match(buffer, tag_start)
+
+        if match and (tag_start == 0 or buffer[tag_start - 1 : tag_start] == b"\n"):
+            return match
+
+        position = buffer.find(OPENING_TAG_MARKER, position + 1)
+
+    return None
+
+
+def yield_sgml_spans(
+    buffer, start: int = 0, end: Optional[int] = None
+) -> Iterator[Tuple[int, int, int]]:
+    """Yields the location of the text of each document within an SGML buffer.
+
+    The opening tags are found by a byte search, without splitting the buffer into lines
+    or copying it. A document's text runs from the line after its opening tag to the start
+    of the line holding its closing tag, and documents without a closing tag are skipped.
+
+    :param buffer: The bytes of the file, e.g. a memory map
+    :param start: The offset from which to look for documents
+    :param end: The offset before which a document's opening tag must start, which
+        defaults to the end of the buffer
+    :return: A tuple of the document ID and the start and end offsets of its text
+    """
+    end = len(buffer) if end is None else end
+    match = find_opening_tag(buffer, start)
+
+    while match is not None and match.start() < end:
+        text_start = buffer.find(b"\n", match.end()) + 1 or len(buffer)
+        closing_tag = buffer.find(b"</" + match.group(1) + b">", text_start)
+
+        if closing_tag >= 0:
+            text_end = max(buffer.rfind(b"\n", text_start, closing_tag) + 1, text_start)
+            yield int(match.group(2)), text_start, text_end
+
+        match = find_opening_tag(buffer, match.end())
+
+
+def yield_sgml_text(
+    file_name: str, start: int = 0, end: Optional[int] = None
+) -> Iterator[Tuple[int, str]]:
     """Yields document text from an SGML file.
 
+    The file is memory-mapped, and only the text of each document is decoded as it is
+    reached.
+
     :param file_name: The name of the file
-    :return: A tuple containing the unit of text contained within the SGML file
-        and its identifier
+    :param start: The offset from which to read documents
+    :param end: The offset before which a document's opening tag must start, which
+        defaults to the end of the file
+    :return: A tuple containing the identifier of a unit of text within the SGML file
+        and its text
     """
-    with open(file_name, "r", encoding="utf-8") as file:
-        document_id = None
-        text = ""
-
-        for line in file:
-            if not line.isspace():
-                if line.startswith("<P") or line.startswith("<Q"):
-                    document_id = int(
-                        line.replace("<P ID=", "").replace("<Q ID=", "").replace(">", "")
-                    )
-                elif "</P>" in line or "</Q>" in line:
-                    yield document_id, text
-                    document_id = None
-                    text = ""
-                else:
-                    text += line
+    buffer = open_sgml_file(file_name)
+
+    if buffer is None:
+        return
+
+    try:
+        for document_id, text_start, text_end in yield_sgml_spans(buffer, start, end):
+            yield document_id, buffer[text_start:text_end].decode("utf-8")
+    finally:
+        buffer.close()
+
+
+def split_sgml_file(file_name: str, range_size: int) -> List[Tuple[int, int]]:
+    """Split an SGML file into byte ranges that each hold whole documents.
+
+    Each boundary is moved forward to the next opening tag, so every document belongs to
+    exactly one range, the one holding its opening tag. Only the bytes around the
+    boundaries are searched.
+
+    :param file_name: The name of the file
+    :param range_size: The approximate number of bytes of each range
+    :return: A list of the start and end offsets of each range, in file order
+    """
+    buffer = open_sgml_file(file_name)
+
+    if buffer is None:
+        return []
+
+    try:
+        boundaries = [0]
+
+        while boundaries[-1] < len(buffer):
+            match = find_opening_tag(buffer, boundaries[-1] + range_size)
+            boundaries.append(match.start() if match else len(buffer))
+
+        return list(zip(boundaries[:-1], boundaries[1:]))
+    finally:
+        buffer.close()
@@ -0,0 +1,154 @@
+from itertools import product
+from string import ascii_lowercase
+from typing import List
+
+import numpy as np
+
+
+# The number of words written on each line of a generated document
+WORDS_PER_LINE = 12
+
+# The number of documents whose words are drawn at once
+CHUNK_SIZE = 1000
+
+
+def make_vocabulary(vocabulary_size: int) -> List[str]:
+    """Create distinct lowercase words of alternating consonants and vowels.
+
+    Such words are letters-only, so tokenizers keep them whole, and stemming leaves most
+    of them distinct.
+
+    :param vocabulary_size: The number of words
+    :return: The words, shortest first
+    """
+    consonants = [letter for letter in ascii_lowercase if letter not in "aeiouy"]
+    vowels = "aeiou"
+
+    words = []
+    syllables = 2
+
+    while len(words) < vocabulary_size:
+        for letters in product(*([consonants, vowels] * syllables)):
+            words.append("".join(letters))
+
+            if len(words) == vocabulary_size:
+                break
+
+        syllables += 1
+
+    return words
+
+
+def zipf_probabilities(vocabulary_size: int, skew: float) -> np.ndarray:
+    """Find the probability of each word rank under Zipf's law.
+
+    :param vocabulary_size: The number of words
+    :param skew: The exponent of the distribution, where larger values make the most
+        frequent words more dominant
+    :return: The probability of the word of each rank, most frequent first
+    """
+    weights = 1.0 / np.arange(1, vocabulary_size + 1) ** skew
+    return weights / weights.sum()
+
+
+def document_lengths(
+    rng: np.random.Generator, num_docs: int, mean_length: float, length_sigma: float
+) -> np.ndarray:
+    """Draw log-normally distributed document lengths.
+
+    :param rng: The random number generator
+    :param num_docs: The number of documents
+    :param mean_length: The mean number of words of a document
+    :param length_sigma: The standard deviation of the logarithm of the lengths, or 0 for
+        documents of equal length
+    :return: The number of words of each document, at least 1
+    """
+    mu = np.log(mean_length) - length_sigma**2 / 2
+    lengths = rng.lognormal(mu, length_sigma, size=num_docs)
+
+    return np.maximum(np.rint(lengths), 1).astype(np.int64)
+
+
+def generate_corpus(
+    corpus_file: str,
+    num_docs: int,
+    vocabulary_size: int = 50000,
+    skew: float = 1.1,
+    mean_length: float = 250.0,
+    length_sigma: float = 0.8,
+    seed: int = 0,
+) -> int:
+    """Write a synthetic SGML corpus of <P ID=...> documents with Zipf-distributed words.
+
+    The same arguments always produce the same file.
+
+    :param corpus_file: The name of the file to write
+    :param num_docs: The number of documents
+    :param vocabulary_size: The number of distinct words
+    :param skew: The exponent of the Zipf distribution of the words
+    :param mean_length: The mean number of words of a document
+    :param length_sigma: The standard deviation of the logarithm of the document lengths
+    :param seed: The seed of the random number generator
+    :return: The number of words written
+    """
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array(make_vocabulary(vocabulary_size))
+    probabilities = zipf_probabilities(vocabulary_size, skew)
+    lengths = document_lengths(rng, num_docs, mean_length, length_sigma)
+
+    with open(corpus_file, "w", encoding="utf-8") as file:
+        for chunk_start in range(0, num_docs, CHUNK_SIZE):
+            chunk_lengths = lengths[chunk_start : chunk_start + CHUNK_SIZE]
+            words = vocabulary[
+                rng.choice(vocabulary_size, size=chunk_lengths.sum(), p=probabilities)
+            ]
+            ends = np.cumsum(chunk_lengths)
+
+            for document_id, start, end in zip(
+                range(chunk_start + 1, chunk_start + len(chunk_lengths) + 1),
+                ends - chunk_lengths,
+                ends,
+            ):
+                document_words = words[start:end].tolist()
+                lines = [
+                    " ".join(document_words[i : i + WORDS_PER_LINE])
+                    for i in range(0, len(document_words), WORDS_PER_LINE)
+                ]
+                file.write(f"<P ID={document_id}>\n" + "\n".join(lines) + "\n</P>\n\n")
+
+    return int(lengths.sum())
+
+
+def generate_topics(
+    topics_file: str,
+    num_queries: int,
+    vocabulary_size: int = 50000,
+    skew: float = 1.1,
+    min_terms: int = 2,
+    max_terms: int = 5,
+    seed: int = 0,
+) -> None:
+    """Write a topics file of <Q ID=...> queries over the vocabulary of a synthetic corpus.
+
+    Query terms follow the same Zipf distribution as the corpus, so they range from very
+    common words with long postings lists to rare ones.
+
+    :param topics_file: The name of the file to write
+    :param num_queries: The number of queries
+    :param vocabulary_size: The number of distinct words of the corpus
+    :param skew: The exponent of the Zipf distribution of the corpus
+    :param min_terms: The smallest number of terms of a query
+    :param max_terms: The largest number of terms of a query
+    :param seed: The seed of the random number generator
+    :return: None
+    """
+    # A different stream than the corpus, so queries are not the first words of documents
+    rng = np.random.default_rng([seed, 1])
+    vocabulary = np.array(make_vocabulary(vocabulary_size))
+    probabilities = zipf_probabilities(vocabulary_size, skew)
+
+    with open(topics_file, "w", encoding="utf-8") as file:
+        for query_id in range(1, num_queries + 1):
+            num_terms = rng.integers(min_terms, max_terms + 1)
+            terms = rng.choice(vocabulary_size, size=num_terms, replace=False, p=probabilities)
+            file.write(f"<Q ID={query_id}>\n" + " ".join(vocabulary[terms]) + "\n</Q>\n\n")